@@ -1,7 +1,16 @@
 import os
+import sys
+import time
 from twilio.rest import Client
 from dotenv import load_dotenv
 
+# Add monitoring module path
+monitoring_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'monitoring')
+if monitoring_path not in sys.path:
+    sys.path.insert(0, monitoring_path)
+
+from metrics import registry, stage_histogram
+
 # Load environment variables
 load_dotenv()
 
@@ -11,10 +20,28 @@ TWILIO_AUTH_TOKEN = os.getenv('TWILIO_AUTH_TOKEN')
 TWILIO_PHONE_NUMBER = os.getenv('TWILIO_PHONE_NUMBER')
 RECIPIENT_PHONE_NUMBER = os.getenv('RECIPIENT_PHONE_NUMBER')
 
+# Twilio client shared by all alerts, created on first use
+_client = None
+
+SMS_SECONDS = stage_histogram('sms', component='alerting')
+SMS_RESULTS = {
+    status: registry.counter('fraud_sms_total', "SMS alerts by result", labels={'status': status})
+    for status in ('sent', 'failed', 'unconfigured')
+}
+
+def get_client():
+    """Return the shared Twilio client, creating it on first use."""
+    global _client
+    if _client is None:
+        _client = Client(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN)
+    return _client
+
 def send_sms_alert(message):
     """
     Send SMS alert using Twilio without rate limiting.
     
+    Rate limiting and coalescing are done by AlertDispatcher in dispatcher.py.
+    
     Args:
         message (str): The message to send
         
@@ -30,23 +57,25 @@ def send_sms_alert(message):
             print("- TWILIO_AUTH_TOKEN")
             print("- TWILIO_PHONE_NUMBER")
             print("- RECIPIENT_PHONE_NUMBER")
+            SMS_RESULTS['unconfigured'].inc()
             return False
         
-        # Initialize Twilio client
-        client = Client(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN)
-        
-        # Send message
-        message = client.messages.create(
+        # Send message with the shared client
+        started = time.perf_counter()
+        message = get_client().messages.create(
             body=message,
             from_=TWILIO_PHONE_NUMBER,
             to=RECIPIENT_PHONE_NUMBER
         )
+        SMS_SECONDS.observe(time.perf_counter() - started)
         
         print(f"✅ SMS alert sent successfully! SID: {message.sid}")
+        SMS_RESULTS['sent'].inc()
         return True
         
     except Exception as e:
         print(f"❌ Failed to send SMS alert: {str(e)}")
+        SMS_RESULTS['failed'].inc()
         return False
 
 if __name__ == "__main__":
@@ -0,0 +1,251 @@
+import heapq
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from metrics import registry
+
+# Dispatcher configuration
+ALERT_SENDER = os.getenv('ALERT_SENDER', 'twilio')  # 'twilio' or 'stub'
+ALERT_RATE_PER_MINUTE = float(os.getenv('ALERT_RATE_PER_MINUTE', 1))  # Messages per minute
+ALERT_BURST = int(os.getenv('ALERT_BURST', 1))  # Messages that may be sent back to back
+ALERT_QUEUE_SIZE = int(os.getenv('ALERT_QUEUE_SIZE', 1000))
+ALERT_WORKERS = int(os.getenv('ALERT_WORKERS', 2))
+ALERT_POLICY = os.getenv('ALERT_POLICY', 'drop_oldest')  # 'drop_oldest', 'drop_newest' or 'block'
+
+# Number of amounts listed in a digest message
+DIGEST_TOP_AMOUNTS = 5
+
+
+class TokenBucket:
+    """Token bucket allowing `rate` tokens per second with bursts of up to `capacity`."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def try_acquire(self):
+        """Take a token if one is available."""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+
+class StubSender:
+    """Sender that records messages locally instead of calling Twilio."""
+
+    def __init__(self, latency=0.0, verbose=False):
+        self.latency = latency
+        self.verbose = verbose
+        self.messages = []
+        self.lock = threading.Lock()
+
+    def __call__(self, message):
+        if self.latency:
+            time.sleep(self.latency)
+        with self.lock:
+            self.messages.append(message)
+        if self.verbose:
+            print(f"[stub SMS] {message}")
+        return True
+
+
+def format_alert(alert):
+    """Format a single fraud alert message."""
+    return (
+        f"🚨 FRAUD ALERT 🚨\n"
+        f"Amount: ${alert['amount']:.2f}\n"
+        f"Time: {alert['timestamp']}\n"
+        f"Fraud Probability: {alert['prediction']:.2%}\n"
+        f"Transaction ID: {alert['id']}"
+    )
+
+
+class Digest:
+    """Constant-size summary of the alerts received since the last message."""
+
+    def __init__(self):
+        self.count = 0
+        self.first_alert = None
+        self.started = None
+        self.top_amounts = []  # Min-heap of the largest amounts
+        self.max_prediction = 0.0
+
+    def add(self, alert):
+        if self.count == 0:
+            self.first_alert = alert
+            self.started = time.monotonic()
+        self.count += 1
+        self.max_prediction = max(self.max_prediction, alert['prediction'])
+        if len(self.top_amounts) < DIGEST_TOP_AMOUNTS:
+            heapq.heappush(self.top_amounts, alert['amount'])
+        else:
+            heapq.heappushpop(self.top_amounts, alert['amount'])
+
+    def format(self):
+        """A single alert keeps the detailed format, bursts become one digest."""
+        if self.count == 1:
+            return format_alert(self.first_alert)
+        window = time.monotonic() - self.started
+        top_amounts = ', '.join(f"${amount:,.2f}" for amount in sorted(self.top_amounts, reverse=True))
+        return (
+            f"🚨 FRAUD ALERT DIGEST 🚨\n"
+            f"{self.count} frauds in last {window:.0f}s\n"
+            f"Top amounts: {top_amounts}\n"
+            f"Max Fraud Probability: {self.max_prediction:.2%}"
+        )
+
+
+class AlertDispatcher:
+    """
+    Asynchronous fraud alert delivery.
+
+    submit() only enqueues, so scoring never waits on alert I/O. A dispatcher
+    thread drains the bounded queue into a digest and releases one message
+    whenever the token bucket allows; a worker pool delivers messages through
+    a single shared sender.
+    """
+
+    def __init__(self, sender, rate_per_minute=1, burst=1, max_queue=1000, workers=2, policy='drop_oldest'):
+        if policy not in ('drop_oldest', 'drop_newest', 'block'):
+            raise ValueError(f"Unknown alert policy: {policy}")
+        self.sender = sender
+        self.policy = policy
+        self.bucket = TokenBucket(rate_per_minute / 60, burst)
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='alert-sender')
+        self.digest = Digest()
+        self.stats = {
+            'submitted': 0,
+            'dropped': 0,
+            'messages': 0,
+            'digests': 0,
+            'coalesced': 0,
+            'sent': 0,
+            'failed': 0,
+        }
+        self.stats_lock = threading.Lock()
+        self.counters = {
+            stat: registry.counter('fraud_alert_events_total', "Alert dispatcher events", labels={'event': stat})
+            for stat in self.stats
+        }
+        registry.gauge('fraud_alert_queue_depth', "Alerts waiting in the dispatcher queue", function=self.queue.qsize)
+        registry.gauge('fraud_alert_pending', "Alerts coalesced into the pending digest",
+                       function=lambda: self.digest.count)
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name='alert-dispatcher', daemon=True)
+        self.thread.start()
+
+    def _count(self, stat, n=1):
+        with self.stats_lock:
+            self.stats[stat] += n
+        self.counters[stat].inc(n)
+
+    def submit(self, alert):
+        """
+        Queue a fraud alert without blocking (unless the policy is 'block').
+
+        Args:
+            alert (dict): id, amount, timestamp and prediction of the fraud
+
+        Returns:
+            bool: False if the alert was dropped
+        """
+        self._count('submitted')
+        if self.policy == 'block':
+            self.queue.put(alert)
+            return True
+        try:
+            self.queue.put_nowait(alert)
+            return True
+        except queue.Full:
+            pass
+        if self.policy == 'drop_oldest':
+            try:
+                self.queue.get_nowait()
+                self._count('dropped')  # Only an alert actually evicted is lost
+            except queue.Empty:
+                pass
+            try:
+                self.queue.put_nowait(alert)
+                return True
+            except queue.Full:
+                pass
+        self._count('dropped')
+        return False
+
+    def _drain(self, timeout):
+        try:
+            self.digest.add(self.queue.get(timeout=timeout))
+        except queue.Empty:
+            return
+        while True:
+            try:
+                self.digest.add(self.queue.get_nowait())
+            except queue.Empty:
+                return
+
+    def _release(self):
+        """Hand the pending digest to the sender pool."""
+        digest, self.digest = self.digest, Digest()
+        self._count('messages')
+        if digest.count > 1:
+            self._count('digests')
+            self._count('coalesced', digest.count)
+        self.executor.submit(self._deliver, digest.format())
+
+    def _deliver(self, message):
+        try:
+            ok = self.sender(message)
+        except Exception as e:
+            print(f"❌ Failed to send alert: {str(e)}")
+            ok = False
+        self._count('sent' if ok else 'failed')
+
+    def _run(self):
+        while self.running:
+            self._drain(timeout=0.1)
+            if self.digest.count and self.bucket.try_acquire():
+                self._release()
+
+    def get_stats(self):
+        """Delivery stats plus current queue depth and pending digest size."""
+        with self.stats_lock:
+            stats = dict(self.stats)
+        stats['queue_depth'] = self.queue.qsize()
+        stats['pending'] = self.digest.count
+        return stats
+
+    def close(self, timeout=5.0):
+        """Stop dispatching, send whatever is still pending and wait for deliveries."""
+        self.running = False
+        self.thread.join(timeout)
+        self._drain(timeout=0)
+        if self.digest.count:
+            self._release()
+        self.executor.shutdown(wait=True)
+
+
+def create_dispatcher():
+    """Create an AlertDispatcher configured from the ALERT_* environment variables."""
+    if ALERT_SENDER == 'stub':
+        sender = StubSender(verbose=True)
+    else:
+        from alert import send_sms_alert
+        sender = send_sms_alert
+    return AlertDispatcher(
+        sender,
+        rate_per_minute=ALERT_RATE_PER_MINUTE,
+        burst=ALERT_BURST,
+        max_queue=ALERT_QUEUE_SIZE,
+        workers=ALERT_WORKERS,
+        policy=ALERT_POLICY
+    )
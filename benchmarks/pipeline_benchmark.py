@@ -0,0 +1,403 @@
+import argparse
+import glob
+import json
+import os
+import resource
+import subprocess
+import sys
+import shutil
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+# Get the absolute path to the project root directory
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Producer, consumer, model, alerting, monitoring and streaming modules
+for module_dir in ('alerting', 'consumer', 'model', 'monitoring', 'producer', 'streaming'):
+    module_path = os.path.join(project_root, module_dir)
+    if module_path not in sys.path:
+        sys.path.insert(0, module_path)
+
+from backpressure import LOADED_RENDER_INTERVAL, RENDER_INTERVAL
+from cascade import PREFILTER_NAME
+from dispatcher import ALERT_BURST, ALERT_QUEUE_SIZE, ALERT_RATE_PER_MINUTE, ALERT_WORKERS, AlertDispatcher, StubSender
+from metrics import stage_histogram, stage_summary
+from numpy_model import ACTIVATIONS, NumpyModel
+from producer import LoadGenerator, load_dataset
+from scoring import load_vectorizer
+from transport import create_transport
+
+# Layer sizes of train_model.build_model, used by --random-weights
+MODEL_LAYERS = [64, 32, 1]
+
+RESULTS_DIR = os.path.join(project_root, 'benchmarks', 'results')
+
+# Same stage as the dashboard's render histogram, so it shows up among the consumer stages
+RENDER_SECONDS = stage_histogram('render')
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in KB on Linux and bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def git_commit():
+    """Short hash of the checked-out commit, with a suffix for uncommitted changes."""
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=project_root, capture_output=True, text=True, check=True
+        ).stdout.strip()
+        dirty = subprocess.run(
+            ['git', 'status', '--porcelain', '--untracked-files=no'], cwd=project_root, capture_output=True, text=True
+        ).stdout.strip()
+        return f"{commit}-dirty" if dirty else commit
+    except Exception:
+        return 'unknown'
+
+
+def load_source(source):
+    """
+    Feature rows for the load generator.
+
+    Args:
+        source (str): 'dataset' for data/creditcard.csv, 'samples' for the JSON
+            transactions in transactions/, 'auto' for the dataset when present
+
+    Returns:
+        pd.DataFrame: V1-V28 columns
+    """
+    if source == 'auto':
+        source = 'dataset' if os.path.exists(os.path.join(project_root, 'data', 'creditcard.csv')) else 'samples'
+    if source == 'dataset':
+        return load_dataset()
+
+    rows = []
+    for file_path in glob.glob(os.path.join(project_root, 'transactions', 'transaction_*.json')):
+        try:
+            with open(file_path, 'r') as f:
+                features = json.load(f)['features']
+            rows.append([features[f'V{i+1}'] for i in range(28)])
+        except Exception as e:
+            print(f"Skipping sample {os.path.basename(file_path)}: {str(e)}")
+    if not rows:
+        raise ValueError("No sample transactions found in transactions/")
+    return pd.DataFrame(rows, columns=[f'V{i+1}' for i in range(28)])
+
+
+def random_model(input_dim, seed=42):
+    """NumpyModel with the production layer sizes and random weights, for runs without a trained model."""
+    rng = np.random.default_rng(seed)
+    layers = []
+    for units in MODEL_LAYERS:
+        kernel = (rng.standard_normal((input_dim, units)) / np.sqrt(input_dim)).astype(np.float32)
+        activation = 'sigmoid' if units == 1 else 'relu'
+        layers.append((kernel, np.zeros(units, dtype=np.float32), ACTIVATIONS[activation]))
+        input_dim = units
+    return NumpyModel(layers)
+
+
+def save_random_model(directory, vectorizer, seed=42):
+    """
+    Write random_model as fraud_model.npz next to the vectorizer's feature_pipeline.json,
+    for code paths that load the model from disk (e.g. scoring workers).
+
+    Returns:
+        str: The model directory
+    """
+    model = random_model(vectorizer.num_features, seed)
+    weights = {'num_layers': np.array(len(model.layers))}
+    for i, (kernel, bias, _) in enumerate(model.layers):
+        weights[f'kernel_{i}'] = kernel
+        weights[f'bias_{i}'] = bias
+        weights[f'activation_{i}'] = np.array('sigmoid' if i == len(model.layers) - 1 else 'relu')
+    np.savez(os.path.join(directory, 'fraud_model.npz'), **weights)
+    vectorizer.save(os.path.join(directory, 'feature_pipeline.json'))
+    return directory
+
+
+def run_producer(generator, transport, count, rate, batch_size, stop):
+    """Send count generated transactions at a target rate (0 for unpaced)."""
+    sent = 0
+    start = time.perf_counter()
+    while sent < count and not stop.is_set():
+        n = min(batch_size, count - sent)
+        transport.send_records(generator.generate_batch(n))
+        transport.flush()
+        sent += n
+        if rate > 0:
+            delay = start + sent / rate - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+
+
+def render_view(view):
+    """
+    Headless equivalent of the dashboard's update_dashboard(): the same formatting
+    of a service view into metric text, chart series and the recent-rows table,
+    without drawing anything with Streamlit or Plotly.
+    """
+    aggregates = view['aggregates']
+    fraud_rate = (aggregates['fraud_count'] / aggregates['total_transactions'] * 100) if aggregates['total_transactions'] > 0 else 0
+    lines = [
+        f"{aggregates['total_transactions']}", f"{fraud_rate:.1f}%",
+        f"${aggregates['total_amount']:,.2f}", f"${aggregates['fraud_amount']:,.2f}",
+    ]
+    for name, (count, fraud_count, amount, fraud_amount) in view['windows'].items():
+        rate = fraud_count / count * 100 if count else 0
+        lines.append(f"**{name}**: {count:,} transactions, {rate:.1f}% fraud, "
+                     f"${amount:,.2f} total, ${fraud_amount:,.2f} fraud")
+    load = view['load']
+    lines.append(f"**Load**: {load['level']}, {load['lag']:.1f}s lag, {load['backlog']:,} waiting")
+    text = "  \n".join(lines)
+
+    series = []
+    table = None
+    if view['recent']:
+        utc_offset = datetime.now().astimezone().utcoffset().total_seconds()
+        for timestamps, amounts in (view['legit'], view['fraud']):
+            if len(timestamps):
+                series.append((((timestamps + utc_offset) * 1000).astype('datetime64[ms]'), amounts))
+        table = pd.DataFrame(view['recent'])[['timestamp', 'amount', 'status', 'probability', 'id']]
+    return text, series, table
+
+
+def run_renderer(service, stop):
+    """Render the service view at the dashboard's refresh interval until stopped, as one open dashboard tab would."""
+    while not stop.is_set():
+        with RENDER_SECONDS.time():
+            view = service.view()
+            render_view(view)
+        stop.wait(RENDER_INTERVAL if view['load']['level'] == 'normal' else LOADED_RENDER_INTERVAL)
+
+
+def consumer_stage_seconds():
+    """Total seconds recorded so far by each consumer stage histogram."""
+    return {
+        stage['stage']: stage['mean ms'] * stage['batches'] / 1000
+        for stage in stage_summary() if stage['component'] == 'consumer'
+    }
+
+
+def run_benchmark(args):
+    """Drive generated load through the transport and the consumer's ScoringService.step()."""
+    # The service reads its configuration when imported
+    os.environ['MODEL_BACKEND'] = 'numpy' if args.random_weights else args.backend
+    os.environ['MAX_BATCH_SIZE'] = str(args.batch_size)
+    os.environ['SCORING_WORKERS'] = str(args.workers)
+    os.environ['METRICS_PORT'] = '0'
+    from scoring_service import ScoringService
+
+    generator = LoadGenerator(load_source(args.source), seed=args.seed)
+    sender = StubSender(latency=args.alert_latency)
+    dispatcher = AlertDispatcher(
+        sender,
+        rate_per_minute=ALERT_RATE_PER_MINUTE,
+        burst=ALERT_BURST,
+        max_queue=ALERT_QUEUE_SIZE,
+        workers=ALERT_WORKERS
+    )
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        model_directory = args.model_dir
+        if args.random_weights:
+            model_directory = save_random_model(work_dir, load_vectorizer(args.model_dir), args.seed)
+            prefilter_path = os.path.join(args.model_dir, PREFILTER_NAME)
+            if args.cascade and os.path.exists(prefilter_path):
+                shutil.copy(prefilter_path, model_directory)
+
+        transactions_dir = os.path.join(work_dir, 'transactions')
+        producer = create_transport(args.transport, transactions_dir)
+        service = ScoringService(
+            publish_path=os.path.join(work_dir, 'service_view.pkl'),
+            transport=create_transport(args.transport, transactions_dir),
+            alert_dispatcher=dispatcher,
+            model_directory=model_directory,
+            cascade=args.cascade,
+            checkpoint_dir=None if args.no_checkpoint else os.path.join(work_dir, 'checkpoints'),
+            history_db=None if args.no_history else os.path.join(work_dir, 'history.db'),
+            shed_log=os.path.join(work_dir, 'shed.jsonl')
+        )
+
+        # Warm-up call outside the timed run (graph tracing, BLAS initialization)
+        if service.model is not None:
+            service.model.predict_on_batch(
+                np.zeros((args.batch_size, service.vectorizer.num_features), dtype=np.float32)
+            )
+
+        # End-to-end latency of every scored pass, from the producer timestamp
+        latencies = []
+        process_batch = service.process_batch
+
+        def timed_process_batch(transactions, columns):
+            process_batch(transactions, columns)
+            latencies.append(time.time() - columns[0])
+
+        service.process_batch = timed_process_batch
+
+        stop = threading.Event()
+        producer_thread = threading.Thread(
+            target=run_producer,
+            args=(generator, producer, args.count, args.rate, args.producer_batch, stop),
+            name='benchmark-producer',
+            daemon=True
+        )
+        render_thread = threading.Thread(
+            target=run_renderer, args=(service, stop), name='benchmark-render', daemon=True
+        )
+
+        stages_before = consumer_stage_seconds()
+        start = time.perf_counter()
+        producer_thread.start()
+        if not args.no_render:
+            render_thread.start()
+        try:
+            while service.state['total_transactions'] + service.backpressure.get_stats()['shed'] < args.count:
+                if time.perf_counter() - start > args.timeout:
+                    print(f"⚠️ Timed out after {args.timeout:.0f}s with "
+                          f"{service.state['total_transactions']:,}/{args.count:,} scored")
+                    break
+                service.step()
+        finally:
+            elapsed = time.perf_counter() - start
+            stop.set()
+            producer_thread.join()
+            if render_thread.is_alive():
+                render_thread.join()
+            producer.close()
+            scored = service.state['total_transactions']
+            frauds = service.state['fraud_count']
+            view = service.view()
+            service.close()
+
+    stages = consumer_stage_seconds()
+    latencies = np.concatenate(latencies) * 1000 if latencies else np.zeros(1)
+    return {
+        'commit': git_commit(),
+        'date': datetime.now().isoformat(timespec='seconds'),
+        'config': {
+            'transport': args.transport,
+            'backend': 'random' if args.random_weights else args.backend,
+            'source': args.source,
+            'count': args.count,
+            'rate': args.rate,
+            'batch_size': args.batch_size,
+            'producer_batch': args.producer_batch,
+            'alert_latency': args.alert_latency,
+            'workers': args.workers,
+            'cascade': args.cascade,
+            'checkpoint': not args.no_checkpoint,
+            'history': not args.no_history,
+            'render': not args.no_render,
+            'seed': args.seed,
+        },
+        'transactions': scored,
+        'frauds': frauds,
+        'elapsed_seconds': elapsed,
+        'throughput_tps': scored / elapsed if elapsed else 0.0,
+        'latency_ms': {
+            'p50': float(np.percentile(latencies, 50)),
+            'p95': float(np.percentile(latencies, 95)),
+            'p99': float(np.percentile(latencies, 99)),
+            'max': float(latencies.max()),
+        },
+        'stages': {
+            stage: {
+                'seconds': seconds - stages_before.get(stage, 0.0),
+                'us_per_transaction': (seconds - stages_before.get(stage, 0.0)) / scored * 1_000_000 if scored else 0.0,
+            }
+            for stage, seconds in stages.items()
+        },
+        'peak_rss_mb': peak_rss_mb(),
+        'alerts': dispatcher.get_stats(),
+        'load': view['load'],
+        'dedup': view['dedup'],
+        'history': view['history'],
+    }
+
+
+def print_results(results, baseline=None):
+    """Print a summary, with relative changes against a baseline run if given."""
+    def change(value, base):
+        if base is None or not base:
+            return ''
+        return f" ({(value - base) / base:+.1%})"
+
+    base = baseline or {}
+    base_latency = base.get('latency_ms', {})
+    base_stages = base.get('stages', {})
+    print(f"\nCommit {results['commit']}" + (f" vs {base.get('commit')}" if baseline else ''))
+    if baseline and base.get('config') != results['config']:
+        print(f"⚠️ Baseline was run with a different configuration: {base.get('config')}")
+    print(f"Throughput: {results['throughput_tps']:,.0f} tx/s{change(results['throughput_tps'], base.get('throughput_tps'))}"
+          f" ({results['transactions']:,} transactions in {results['elapsed_seconds']:.2f}s)")
+    for name in ('p50', 'p95', 'p99'):
+        value = results['latency_ms'][name]
+        print(f"Latency {name}: {value:,.2f} ms{change(value, base_latency.get(name))}")
+    print(f"\n{'stage':<10} {'seconds':>9} {'us/tx':>9}")
+    for stage, timing in results['stages'].items():
+        base_timing = base_stages.get(stage, {}).get('us_per_transaction')
+        print(f"{stage:<10} {timing['seconds']:>9.3f} {timing['us_per_transaction']:>9.2f}"
+              f"{change(timing['us_per_transaction'], base_timing)}")
+    if results['config'].get('render'):
+        print("render: view copy and dashboard formatting, headless; Streamlit/Plotly drawing is measured "
+              "only in the live dashboard")
+    print(f"\nPeak RSS: {results['peak_rss_mb']:.0f} MB{change(results['peak_rss_mb'], base.get('peak_rss_mb'))}")
+    alerts = results['alerts']
+    print(f"Alerts: {alerts['submitted']:,} submitted, {alerts['messages']:,} messages, {alerts['dropped']:,} dropped")
+    load = results.get('load')
+    if load:
+        print(f"Load: {load['prioritized']:,} prioritized, {load['shed']:,} shed")
+
+
+def main():
+    """Run the end-to-end pipeline benchmark and save the results as JSON."""
+    parser = argparse.ArgumentParser(description="Benchmark the producer -> consumer -> alert pipeline")
+    parser.add_argument('--transport', choices=['memory', 'file', 'segment'], default='memory')
+    parser.add_argument('--backend', choices=['numpy', 'keras'], default='numpy', help="Inference backend")
+    parser.add_argument('--model-dir', default=os.path.join(project_root, 'model'))
+    parser.add_argument('--random-weights', action='store_true',
+                        help="Score with a random model of the production architecture instead of the trained one")
+    parser.add_argument('--source', choices=['auto', 'dataset', 'samples'], default='auto',
+                        help="Feature rows from data/creditcard.csv or the sample JSONs in transactions/")
+    parser.add_argument('--count', type=int, default=50000, help="Transactions to send")
+    parser.add_argument('--rate', type=float, default=0, help="Producer rate in tx/s, 0 for unpaced")
+    parser.add_argument('--batch-size', type=int, default=500, help="Consumer batch size (MAX_BATCH_SIZE)")
+    parser.add_argument('--producer-batch', type=int, default=100, help="Transactions per producer send")
+    parser.add_argument('--alert-latency', type=float, default=0.2, help="Simulated seconds per SMS send")
+    parser.add_argument('--workers', type=int, default=0, help="Scoring worker processes (SCORING_WORKERS)")
+    parser.add_argument('--cascade', action='store_true', help="Score with the trained prefilter in front of the model")
+    parser.add_argument('--no-checkpoint', action='store_true', help="Run without the checkpoint WAL and snapshots")
+    parser.add_argument('--no-history', action='store_true', help="Run without the SQLite history writer")
+    parser.add_argument('--no-render', action='store_true', help="Run without the headless dashboard render thread")
+    parser.add_argument('--timeout', type=float, default=600, help="Give up after this many seconds")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help="Results file (default benchmarks/results/<date>-<commit>.json)")
+    parser.add_argument('--compare', metavar='BASELINE', help="Earlier results file to compare against")
+    args = parser.parse_args()
+
+    results = run_benchmark(args)
+
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"{datetime.now():%Y%m%d-%H%M%S}-{results['commit']}.json")
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            baseline = json.load(f)
+    print_results(results, baseline)
+    print(f"\nResults saved to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+# Get the absolute path to the project root directory
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Producer, consumer, model, monitoring and streaming modules
+for module_dir in ('consumer', 'model', 'monitoring', 'producer', 'streaming'):
+    module_path = os.path.join(project_root, module_dir)
+    if module_path not in sys.path:
+        sys.path.insert(0, module_path)
+
+from feature_store import VelocityFeatureStore
+from pipeline_benchmark import load_source, save_random_model
+from producer import LoadGenerator
+from records import records_to_transactions
+from scoring import load_model, load_vectorizer, score_batch
+from workers import ScoringCoordinator
+
+
+def time_scoring(score, batches):
+    """Transactions per second of score() over the batches, after one warm-up call."""
+    score(batches[0])
+    start = time.perf_counter()
+    for batch in batches:
+        score(batch)
+    elapsed = time.perf_counter() - start
+    return sum(len(batch) for batch in batches) / elapsed if elapsed else 0.0
+
+
+def run_benchmark(args, model_dir):
+    """
+    Throughput of in-process scoring and of the worker pool at each batch size.
+
+    Returns:
+        dict: {format: {batch_size: {'in_process': tps, workers: tps, ...}}}
+    """
+    vectorizer = load_vectorizer(model_dir)
+    model = load_model(model_dir, args.backend)
+    feature_store = VelocityFeatureStore() if vectorizer.velocity_columns else None
+    generator = LoadGenerator(load_source(args.source), seed=args.seed)
+
+    # Same transactions for every configuration: binary records as polled, and their JSON dicts
+    inputs = {}
+    for batch_size in args.batch_sizes:
+        records = [generator.generate_batch(batch_size) for _ in range(args.batches)]
+        inputs[('records', batch_size)] = records
+        if 'dicts' in args.formats:
+            inputs[('dicts', batch_size)] = [records_to_transactions(batch) for batch in records]
+
+    results = {}
+    for (data_format, batch_size), batches in inputs.items():
+        if data_format not in args.formats:
+            continue
+        row = results.setdefault(data_format, {}).setdefault(batch_size, {})
+        row['in_process'] = time_scoring(
+            lambda batch: score_batch(model, vectorizer, batch, feature_store), batches
+        )
+        print(f"{data_format:<8} {batch_size:>7,} in-process {row['in_process']:>12,.0f} tx/s")
+
+    for num_workers in args.workers:
+        coordinator = ScoringCoordinator(model_dir, num_workers=num_workers, backend=args.backend)
+        try:
+            for (data_format, batch_size), batches in inputs.items():
+                if data_format not in args.formats:
+                    continue
+                row = results[data_format][batch_size]
+                row[num_workers] = time_scoring(coordinator.score, batches)
+                print(f"{data_format:<8} {batch_size:>7,} {num_workers} workers  {row[num_workers]:>12,.0f} tx/s")
+        finally:
+            coordinator.close()
+    return results
+
+
+def crossover(rows, num_workers):
+    """Smallest batch size at which the pool outscores in-process scoring, None if it never does."""
+    for batch_size in sorted(rows):
+        if rows[batch_size][num_workers] > rows[batch_size]['in_process']:
+            return batch_size
+    return None
+
+
+def print_results(results, workers):
+    """Throughput table per input format, with the crossover batch size of each pool size."""
+    for data_format, rows in results.items():
+        print(f"\n{data_format}: tx/s by batch size")
+        print(f"{'batch':>7} {'in-process':>12}" + ''.join(f" {f'{n} workers':>12}" for n in workers))
+        for batch_size in sorted(rows):
+            row = rows[batch_size]
+            print(f"{batch_size:>7,} {row['in_process']:>12,.0f}" + ''.join(f" {row[n]:>12,.0f}" for n in workers))
+        for num_workers in workers:
+            size = crossover(rows, num_workers)
+            verdict = f"pays off from {size:,} rows per batch" if size else "never pays off at these batch sizes"
+            print(f"{num_workers} workers: {verdict}")
+
+
+def main():
+    """Measure when the scoring worker pool beats in-process scoring."""
+    parser = argparse.ArgumentParser(description="Benchmark SCORING_WORKERS against in-process scoring")
+    parser.add_argument('--backend', choices=['numpy', 'keras'], default='numpy', help="Inference backend")
+    parser.add_argument('--model-dir', default=os.path.join(project_root, 'model'))
+    parser.add_argument('--random-weights', action='store_true',
+                        help="Score with a random model of the production architecture instead of the trained one")
+    parser.add_argument('--source', choices=['auto', 'dataset', 'samples'], default='auto',
+                        help="Feature rows from data/creditcard.csv or the sample JSONs in transactions/")
+    parser.add_argument('--workers', default='2,4', help="Comma-separated pool sizes")
+    parser.add_argument('--batch-sizes', default='500,2000,10000,50000', help="Comma-separated rows per batch")
+    parser.add_argument('--batches', type=int, default=10, help="Timed batches per configuration")
+    parser.add_argument('--formats', default='records,dicts',
+                        help="Inputs to score: 'records' (binary transports) and/or 'dicts' (JSON transports)")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help="Write the results to a JSON file")
+    args = parser.parse_args()
+    args.workers = [int(value) for value in args.workers.split(',')]
+    args.batch_sizes = [int(value) for value in args.batch_sizes.split(',')]
+    args.formats = args.formats.split(',')
+
+    print(f"{os.cpu_count()} CPUs; the pool can only pay off with a core per worker")
+    with tempfile.TemporaryDirectory() as random_dir:
+        model_dir = args.model_dir
+        if args.random_weights:
+            model_dir = save_random_model(random_dir, load_vectorizer(args.model_dir), args.seed)
+        results = run_benchmark(args, model_dir)
+
+    print_results(results, args.workers)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'cpus': os.cpu_count(), 'backend': 'random' if args.random_weights else args.backend,
+                       'results': results}, f, indent=2)
+        print(f"\nResults saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+import math
+import os
+import time
+
+import numpy as np
+
+from metrics import registry
+
+# Lag-aware controller configuration
+LAG_SLA = float(os.getenv('LAG_SLA', 2.0))  # Seconds of event lag before the consumer counts as overloaded
+PRIORITY_AMOUNT = float(os.getenv('PRIORITY_AMOUNT', 1000.01))  # Scored first when overloaded ('very_large' band), 0 disables
+SHED_LAG = float(os.getenv('SHED_LAG', 0))  # Seconds of lag past which other transactions are dropped unscored, 0 never
+MAX_DEFER_STEPS = int(os.getenv('MAX_DEFER_STEPS', 4))  # Steps rows may stay deferred before one step scores them all and commits
+RENDER_INTERVAL = float(os.getenv('RENDER_INTERVAL', 0.5))  # Dashboard refresh interval
+LOADED_RENDER_INTERVAL = float(os.getenv('LOADED_RENDER_INTERVAL', 5.0))  # Refresh interval while behind
+CLEANUP_INTERVAL = float(os.getenv('CLEANUP_INTERVAL', 0))  # Transport cleanup interval, 0 for every loop
+LOADED_CLEANUP_INTERVAL = float(os.getenv('LOADED_CLEANUP_INTERVAL', 30.0))  # Cleanup interval while behind
+
+# Load levels, also exported as the fraud_load_level gauge
+NORMAL, BUSY, OVERLOADED = 0, 1, 2
+LEVEL_NAMES = {NORMAL: 'normal', BUSY: 'busy', OVERLOADED: 'overloaded'}
+
+
+class BackpressureController:
+    """
+    Adapt the consumer loop to how far it is behind the producer.
+
+    After each poll the controller sees the transport backlog and the event
+    lag of the batch (now minus its oldest timestamp). A backlog larger than
+    one batch makes the consumer busy: the next poll grows in powers of two up
+    to max_batch, and dashboard refreshes and transport cleanup are spaced
+    out. Lag past the SLA makes it overloaded: transactions at or above
+    priority_amount are scored and alerted in the step they are polled, while
+    only one base batch of the rest is scored per step and the remainder is
+    deferred to later steps (at most max_batch rows). Every max_defer_steps
+    consecutive deferring steps, one step scores everything it holds, so the
+    transport commit and checkpoint snapshots still run under sustained
+    overload. Past shed_lag the rest are dropped unscored and counted as shed.
+    """
+
+    def __init__(self, base_batch, max_batch=None, lag_sla=LAG_SLA, priority_amount=PRIORITY_AMOUNT,
+                 shed_lag=SHED_LAG, max_defer_steps=MAX_DEFER_STEPS):
+        self.base_batch = base_batch
+        self.max_batch = max(base_batch, max_batch or base_batch * 8)
+        self.lag_sla = lag_sla
+        self.priority_amount = priority_amount
+        self.shed_lag = shed_lag
+        self.max_defer_steps = max_defer_steps
+        self.defer_steps = 0  # Consecutive steps that ended with rows deferred
+        self.backlog = 0
+        self.lag = 0.0
+        self.level = NORMAL
+        self.next_batch = base_batch
+        self.last_cleanup = 0.0
+
+        self.shed = registry.counter('fraud_shed_total', "Transactions dropped unscored under overload")
+        self.prioritized = registry.counter('fraud_prioritized_total', "High-amount transactions scored ahead of their batch")
+        self.deferred = 0
+        registry.gauge('fraud_lag_seconds', "Event lag of the last polled batch", function=lambda: self.lag)
+        registry.gauge('fraud_load_level', "Consumer load level: 0 normal, 1 busy, 2 overloaded",
+                       function=lambda: self.level)
+        registry.gauge('fraud_poll_size', "Transactions requested by the next poll", function=lambda: self.next_batch)
+        registry.gauge('fraud_deferred', "Polled transactions held back for a later step", function=lambda: self.deferred)
+
+    def observe(self, backlog, timestamps, now=None):
+        """
+        Update the load level from the transport backlog and the polled batch.
+
+        Args:
+            backlog (int): Transactions still waiting in the transport
+            timestamps (np.ndarray): Epoch-second event times of the polled batch
+        """
+        now = time.time() if now is None else now
+        self.backlog = backlog
+        if len(timestamps):
+            self.lag = max(0.0, now - float(np.min(timestamps)))
+        elif not backlog:
+            self.lag = 0.0
+
+        if self.lag > self.lag_sla:
+            self.level = OVERLOADED
+        elif backlog > self.base_batch:
+            self.level = BUSY
+        else:
+            self.level = NORMAL
+
+        # Smallest power-of-two multiple of the base batch that covers the backlog
+        steps = math.ceil(math.log2(backlog / self.base_batch)) if backlog > self.base_batch else 0
+        self.next_batch = min(self.max_batch, self.base_batch * 2 ** steps)
+
+    def batch_size(self):
+        """Transactions to request in the next poll."""
+        return self.next_batch
+
+    def plan(self, amounts):
+        """
+        Split the rows waiting to be scored (deferred rows first, then the new poll) into scoring passes.
+
+        Returns:
+            tuple: (list of row-index arrays to score in order, row indices deferred to
+                the next step, row indices shed unscored)
+        """
+        rows = np.arange(len(amounts))
+        self.deferred = 0
+        if self.level < OVERLOADED or self.priority_amount <= 0:
+            self.defer_steps = 0
+            return [rows], rows[:0], rows[:0]
+        priority = amounts >= self.priority_amount
+        first, rest = rows[priority], rows[~priority]
+        self.prioritized.inc(len(first))
+        if self.shed_lag > 0 and self.lag > self.shed_lag:
+            self.shed.inc(len(rest))
+            self.defer_steps = 0
+            return [first], rows[:0], rest
+        if self.defer_steps >= self.max_defer_steps:
+            # Drain, so everything polled so far can be committed
+            self.defer_steps = 0
+            return [first, rest], rows[:0], rows[:0]
+        # Oldest first, one base batch per step, never holding back more than one full poll
+        now = max(self.base_batch, len(rest) - self.max_batch)
+        self.deferred = max(0, len(rest) - now)
+        self.defer_steps = self.defer_steps + 1 if self.deferred else 0
+        return [first, rest[:now]], rest[now:], rows[:0]
+
+    def should_cleanup(self, now):
+        """True when transport cleanup is due at the current load."""
+        interval = CLEANUP_INTERVAL if self.level == NORMAL else LOADED_CLEANUP_INTERVAL
+        if now - self.last_cleanup >= interval:
+            self.last_cleanup = now
+            return True
+        return False
+
+    def get_stats(self):
+        """Load level, lag, backlog, next poll size, deferred rows and shed/prioritized counts."""
+        return {
+            'level': LEVEL_NAMES[self.level],
+            'lag': self.lag,
+            'backlog': self.backlog,
+            'batch_size': self.next_batch,
+            'deferred': self.deferred,
+            'shed': self.shed.value,
+            'prioritized': self.prioritized.value,
+        }
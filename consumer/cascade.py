@@ -0,0 +1,114 @@
+import os
+
+import numpy as np
+
+from metrics import registry
+from prefilter import Prefilter
+
+PREFILTER_NAME = 'prefilter.json'
+
+# Share of prefilter-cleared rows also scored by the full model, to estimate the recall given up
+CASCADE_AUDIT_RATE = float(os.getenv('CASCADE_AUDIT_RATE', 0.01))
+
+# Per-batch counts kept by CascadeModel; scoring workers report them in their aggregates with a cascade_ prefix
+COUNT_KEYS = ('rows', 'cleared', 'decided_fraud', 'model_rows', 'model_flagged', 'audited', 'audit_flagged')
+
+
+def cascade_enabled(setting, model_dir):
+    """Whether a CASCADE setting ('auto', '1' or '0') applies; 'auto' uses a trained prefilter when present."""
+    if setting == 'auto':
+        return os.path.exists(os.path.join(model_dir, PREFILTER_NAME))
+    return setting == '1'
+
+
+def cascade_summary(counts):
+    """
+    Pass rates per stage and the recall kept relative to the full model.
+
+    Recall is estimated from the audited sample: audited rows the full model
+    flags are scaled up to all cleared rows as the frauds the prefilter missed.
+    """
+    rows = counts.get('rows', 0)
+    cleared = counts.get('cleared', 0)
+    audited = counts.get('audited', 0)
+    caught = counts.get('model_flagged', 0) + counts.get('decided_fraud', 0) + counts.get('audit_flagged', 0)
+    missed = counts.get('audit_flagged', 0) * (cleared / audited) if audited else 0.0
+    return {
+        'rows': rows,
+        'prefilter_pass_rate': (rows - cleared) / rows if rows else 0.0,
+        'model_rate': counts.get('model_rows', 0) / rows if rows else 0.0,
+        'decided_fraud': counts.get('decided_fraud', 0),
+        'audited': audited,
+        'estimated_recall': caught / (caught + missed) if caught + missed else 1.0,
+    }
+
+
+class CascadeModel:
+    """
+    Two-stage model: a logistic prefilter in front of the neural network.
+
+    Every row of a batch is scored by the prefilter in one matrix product;
+    only the uncertain band (plus a small audit sample of cleared rows) goes
+    to the full model, in one predict_on_batch call. Decided rows keep the
+    prefilter probability, so downstream thresholds and the dashboard work
+    unchanged. A prediction cache goes behind the prefilter, in front of the
+    full model only, so the stage counts cover every row scored.
+    """
+
+    def __init__(self, model, prefilter, feature_columns, threshold, audit_rate=CASCADE_AUDIT_RATE, seed=None):
+        self.model = model
+        self.prefilter = prefilter
+        self.indices = prefilter.indices(feature_columns)
+        self.threshold = threshold
+        self.audit_rate = audit_rate
+        self.rng = np.random.default_rng(seed)
+        self.counts = dict.fromkeys(COUNT_KEYS, 0)
+        self.stage_rows = {
+            stage: registry.counter('fraud_cascade_rows_total', "Rows scored by each cascade stage",
+                                    labels={'stage': stage})
+            for stage in ('prefilter', 'model')
+        }
+        self.decided = {
+            outcome: registry.counter('fraud_cascade_decided_total', "Rows decided by the prefilter alone",
+                                      labels={'outcome': outcome})
+            for outcome in ('legit', 'fraud')
+        }
+        registry.gauge('fraud_cascade_estimated_recall', "Recall kept relative to the full model, from audits",
+                       function=lambda: cascade_summary(self.counts)['estimated_recall'])
+
+    @classmethod
+    def load(cls, model, model_dir, feature_columns, threshold, **kwargs):
+        """Wrap a loaded model with the prefilter saved next to it."""
+        return cls(model, Prefilter.load(os.path.join(model_dir, PREFILTER_NAME)), feature_columns, threshold,
+                   **kwargs)
+
+    def predict_on_batch(self, features, cache=None):
+        scores = self.prefilter.predict(features, self.indices)
+        cleared, uncertain, decided_fraud = self.prefilter.band(scores)
+        # A decision must agree with the serving threshold, otherwise the full model decides
+        cleared &= scores <= self.threshold
+        decided_fraud &= scores > self.threshold
+        uncertain = ~(cleared | decided_fraud)
+        audited = cleared & (self.rng.random(len(scores)) < self.audit_rate)
+        send = np.flatnonzero(uncertain | audited)
+
+        predictions = scores.copy()
+        if len(send) and cache is not None:
+            predictions[send] = cache.predict(self.model, features[send])
+        elif len(send):
+            predictions[send] = np.asarray(self.model.predict_on_batch(features[send]), dtype=np.float32).reshape(-1)
+        flagged = predictions > self.threshold
+
+        counts = self.counts
+        counts['rows'] += len(scores)
+        counts['cleared'] += int(cleared.sum() - audited.sum())
+        counts['decided_fraud'] += int(decided_fraud.sum())
+        counts['model_rows'] += len(send)
+        counts['model_flagged'] += int((flagged & uncertain).sum())
+        counts['audited'] += int(audited.sum())
+        counts['audit_flagged'] += int((flagged & audited).sum())
+        self.stage_rows['prefilter'].inc(len(scores))
+        self.stage_rows['model'].inc(len(send))
+        self.decided['legit'].inc(int(cleared.sum() - audited.sum()))
+        self.decided['fraud'].inc(int(decided_fraud.sum()))
+        return predictions
@@ -0,0 +1,152 @@
+import os
+import pickle
+import struct
+import time
+import zlib
+
+import numpy as np
+
+SNAPSHOT_NAME = 'snapshot.pkl'
+WAL_NAME = 'wal.log'
+
+# WAL record header: payload length and CRC32
+HEADER = struct.Struct('<II')
+
+
+class ConsumerCheckpoint:
+    """
+    Snapshot plus write-ahead log of the consumer's state.
+
+    Every scored batch is appended to the WAL (with its transaction keys and
+    everything needed to re-apply it) before alerts are queued or the
+    transport is committed. Snapshots of the full state are written every
+    `interval` seconds with temp + rename, after which the WAL restarts.
+
+    On restart the snapshot is loaded and newer WAL records are replayed, so
+    aggregates and the dashboard resume without rescoring. Keys logged since
+    the snapshot are returned for the dedup index: a batch that was logged
+    but not yet committed is redelivered by the transport and must not be
+    scored or alerted twice.
+
+    Not checkpointed: the VelocityFeatureStore and the FileTransport's own
+    DedupIndex of processed files. Both start cold after a restart, so
+    velocity features rebuild from new traffic and only the WAL keys (not
+    older processed files) are recognised as duplicates.
+    """
+
+    def __init__(self, directory, interval=30.0, fsync=True):
+        self.directory = directory
+        self.interval = interval
+        self.fsync = fsync
+        self.snapshot_path = os.path.join(directory, SNAPSHOT_NAME)
+        self.wal_path = os.path.join(directory, WAL_NAME)
+        self.seq = 0
+        self.last_snapshot = time.time()
+        self.wal = None
+        os.makedirs(directory, exist_ok=True)
+
+    def restore(self, initial_state, apply_batch):
+        """
+        Load the snapshot and replay the WAL.
+
+        Args:
+            initial_state (callable): Returns a fresh state dict when there is no snapshot
+            apply_batch (callable): Called with the state and each WAL record newer than the snapshot
+
+        Returns:
+            tuple: (state dict, (n, 2) uint64 dedup keys of the transactions logged since the snapshot)
+        """
+        state = None
+        try:
+            with open(self.snapshot_path, 'rb') as f:
+                state = pickle.load(f)
+            self.seq = state['seq']
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"⚠️ Error loading checkpoint snapshot, starting fresh: {str(e)}")
+        if state is None:
+            state = initial_state()
+
+        logged_keys = []
+        replayed = 0
+        for record in self._read_wal():
+            if record['seq'] <= self.seq:
+                continue  # Already in the snapshot
+            apply_batch(state, record)
+            logged_keys.append(record['keys'])
+            self.seq = record['seq']
+            replayed += 1
+
+        # Drop a torn tail so new records are not appended after it
+        if os.path.exists(self.wal_path) and os.path.getsize(self.wal_path) > self.wal_end:
+            with open(self.wal_path, 'r+b') as f:
+                f.truncate(self.wal_end)
+        if self.seq:
+            print(f"Restored checkpoint at batch {self.seq} ({replayed} batches replayed from the WAL)")
+        return state, np.frombuffer(b''.join(logged_keys), dtype='<u8').reshape(-1, 2)
+
+    def _read_wal(self):
+        self.wal_end = 0
+        try:
+            with open(self.wal_path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return
+        position = 0
+        while position + HEADER.size <= len(data):
+            length, checksum = HEADER.unpack_from(data, position)
+            payload = data[position + HEADER.size:position + HEADER.size + length]
+            if len(payload) < length or zlib.crc32(payload) != checksum:
+                print(f"⚠️ Ignoring torn WAL record at byte {position}")
+                return
+            position += HEADER.size + length
+            self.wal_end = position
+            yield pickle.loads(payload)
+
+    def log_batch(self, keys, **fields):
+        """
+        Durably append a scored batch before its effects become visible.
+
+        Args:
+            keys (np.ndarray): (n, 2) uint64 dedup keys of the batch's transactions
+            **fields: Data needed to re-apply the batch (aggregates, dashboard arrays)
+        """
+        self.seq += 1
+        payload = pickle.dumps({'seq': self.seq, 'keys': np.ascontiguousarray(keys).tobytes(), **fields},
+                               protocol=pickle.HIGHEST_PROTOCOL)
+        if self.wal is None:
+            self.wal = open(self.wal_path, 'ab')
+        self.wal.write(HEADER.pack(len(payload), zlib.crc32(payload)) + payload)
+        self.wal.flush()
+        if self.fsync:
+            os.fsync(self.wal.fileno())
+
+    def maybe_snapshot(self, get_state):
+        """Write a snapshot if the interval has passed. Returns True if one was written."""
+        if time.time() - self.last_snapshot < self.interval:
+            return False
+        self.snapshot(get_state())
+        return True
+
+    def snapshot(self, state):
+        """Atomically replace the snapshot with `state`, then start a new WAL."""
+        state = dict(state, seq=self.seq)
+        temp_path = self.snapshot_path + '.tmp'
+        with open(temp_path, 'wb') as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+        os.replace(temp_path, self.snapshot_path)
+
+        # Records up to seq are in the snapshot; a crash before truncation only leaves records replay skips
+        if self.wal is not None:
+            self.wal.close()
+        self.wal = open(self.wal_path, 'wb')
+        self.last_snapshot = time.time()
+
+    def close(self):
+        if self.wal is not None:
+            self.wal.close()
+            self.wal = None
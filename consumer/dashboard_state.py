@@ -0,0 +1,154 @@
+import time
+from collections import deque
+from datetime import datetime
+
+import numpy as np
+
+# Rolling windows shown on the dashboard, in seconds
+WINDOWS = {'1m': 60, '5m': 300, '1h': 3600}
+
+
+class RingBuffer:
+    """Fixed-capacity NumPy ring buffer for one scatter series."""
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.timestamps = np.zeros(capacity, dtype=np.float64)
+        self.amounts = np.zeros(capacity, dtype=np.float32)
+        self.size = 0
+        self.head = 0  # Next write position
+
+    def extend(self, timestamps, amounts):
+        """Append a batch, overwriting the oldest points once full."""
+        n = len(timestamps)
+        if n >= self.capacity:
+            timestamps, amounts = timestamps[-self.capacity:], amounts[-self.capacity:]
+            n = self.capacity
+        end = self.head + n
+        if end <= self.capacity:
+            self.timestamps[self.head:end] = timestamps
+            self.amounts[self.head:end] = amounts
+        else:
+            split = self.capacity - self.head
+            self.timestamps[self.head:] = timestamps[:split]
+            self.amounts[self.head:] = amounts[:split]
+            self.timestamps[:n - split] = timestamps[split:]
+            self.amounts[:n - split] = amounts[split:]
+        self.head = end % self.capacity
+        self.size = min(self.size + n, self.capacity)
+
+    def arrays(self):
+        """(timestamps, amounts) in insertion order."""
+        if self.size < self.capacity:
+            return self.timestamps[:self.size], self.amounts[:self.size]
+        order = np.r_[self.head:self.capacity, 0:self.head]
+        return self.timestamps[order], self.amounts[order]
+
+
+class WindowCounters:
+    """
+    Time-bucketed counts and sums over the last `horizon` seconds.
+
+    Each slot remembers which bucket it holds, so stale slots are reset on
+    write and ignored on read without any sweeping. Events older than the
+    horizon would land in a slot that holds a live bucket, so they are
+    counted in `late` and otherwise ignored.
+    """
+
+    def __init__(self, horizon=3600, bucket_seconds=1):
+        self.bucket_seconds = bucket_seconds
+        self.num_buckets = int(horizon // bucket_seconds)
+        self.bucket_ids = np.full(self.num_buckets, -1, dtype=np.int64)
+        self.count = np.zeros(self.num_buckets, dtype=np.int64)
+        self.fraud_count = np.zeros(self.num_buckets, dtype=np.int64)
+        self.amount = np.zeros(self.num_buckets, dtype=np.float64)
+        self.fraud_amount = np.zeros(self.num_buckets, dtype=np.float64)
+        self.late = 0
+
+    def add(self, timestamps, amounts, is_fraud, now=None):
+        """Add a batch of scored transactions; `now` defaults to the current time."""
+        buckets = (timestamps // self.bucket_seconds).astype(np.int64)
+        if len(buckets) == 0:
+            return
+
+        # Keep only buckets within one horizon of the newest, so every slot written holds a single bucket
+        newest = max(int((time.time() if now is None else now) // self.bucket_seconds), int(buckets.max()))
+        recent = buckets > newest - self.num_buckets
+        if not recent.all():
+            self.late += int((~recent).sum())
+            buckets, amounts, is_fraud = buckets[recent], amounts[recent], is_fraud[recent]
+        slots = buckets % self.num_buckets
+
+        # Reset slots that still hold an older bucket
+        stale = np.unique(slots[self.bucket_ids[slots] != buckets])
+        if len(stale):
+            self.count[stale] = 0
+            self.fraud_count[stale] = 0
+            self.amount[stale] = 0
+            self.fraud_amount[stale] = 0
+        self.bucket_ids[slots] = buckets
+
+        np.add.at(self.count, slots, 1)
+        np.add.at(self.amount, slots, amounts)
+        np.add.at(self.fraud_count, slots[is_fraud], 1)
+        np.add.at(self.fraud_amount, slots[is_fraud], amounts[is_fraud])
+
+    def totals(self, seconds, now):
+        """Count, fraud count, amount and fraud amount over the last `seconds`."""
+        current = int(now // self.bucket_seconds)
+        first = current - int(seconds // self.bucket_seconds) + 1
+        mask = (self.bucket_ids >= first) & (self.bucket_ids <= current)
+        return (
+            int(self.count[mask].sum()),
+            int(self.fraud_count[mask].sum()),
+            float(self.amount[mask].sum()),
+            float(self.fraud_amount[mask].sum()),
+        )
+
+
+class DashboardState:
+    """
+    Incrementally maintained dashboard data.
+
+    Each scored batch appends to the scatter ring buffers and window counters
+    and formats only the rows that can appear in the recent table, so the cost
+    of a refresh does not grow with the history size.
+    """
+
+    def __init__(self, history_size=10000, recent_size=10):
+        self.legit = RingBuffer(history_size)
+        self.fraud = RingBuffer(history_size)
+        self.windows = WindowCounters(horizon=max(WINDOWS.values()))
+        self.recent = deque(maxlen=recent_size)
+
+    def add_batch(self, timestamps, amounts, is_fraud, predictions, ids):
+        """
+        Add a scored batch.
+
+        Args:
+            timestamps (np.ndarray): Epoch seconds
+            amounts (np.ndarray): Transaction amounts
+            is_fraud (np.ndarray): Boolean fraud decisions
+            predictions (np.ndarray): Model probabilities
+            ids (callable): Returns the transaction ID of a row index, called for recent rows only
+        """
+        self.legit.extend(timestamps[~is_fraud], amounts[~is_fraud])
+        self.fraud.extend(timestamps[is_fraud], amounts[is_fraud])
+        self.windows.add(timestamps, amounts, is_fraud)
+
+        for i in range(max(0, len(timestamps) - self.recent.maxlen), len(timestamps)):
+            self.recent.append({
+                'timestamp': datetime.fromtimestamp(timestamps[i]).strftime('%Y-%m-%d %H:%M:%S'),
+                'amount': float(amounts[i]),
+                'status': '🚨 FRAUD' if is_fraud[i] else '✅ LEGIT',
+                'probability': f"{predictions[i]:.2%}",
+                'id': ids(i)[:8],  # Show only first 8 chars of ID
+            })
+
+    def window_stats(self, now):
+        """{window: (count, fraud_count, amount, fraud_amount)} for each dashboard window."""
+        return {name: self.windows.totals(seconds, now) for name, seconds in WINDOWS.items()}
+
+    def recent_rows(self):
+        """Recent rows, newest last."""
+        return list(self.recent)
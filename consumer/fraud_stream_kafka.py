@@ -1,165 +1,201 @@
 import streamlit as st
-import json
 import pandas as pd
-import numpy as np
-import tensorflow as tf
 from datetime import datetime
 import plotly.graph_objects as go
-from collections import deque
-import glob
 import os
 import time
 import sys
-import shutil
 
 # Get the absolute path to the project root directory
 project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
-# Add alerting module path
-alerting_path = os.path.join(project_root, 'alerting')
-if alerting_path not in sys.path:
-    sys.path.insert(0, alerting_path)
-
-from alert import send_sms_alert
-
-# Create transactions directory if it doesn't exist
-transactions_dir = os.path.join(project_root, 'transactions')
-os.makedirs(transactions_dir, exist_ok=True)
-
-# Load the trained model
-model_path = os.path.join(project_root, 'model', 'fraud_model.h5')
-try:
-    model = tf.keras.models.load_model(model_path)
-except Exception as e:
-    st.error(f"Failed to load model: {str(e)}")
-    st.stop()
-
-# Initialize session state
-if 'transactions' not in st.session_state:
-    st.session_state.transactions = deque(maxlen=100)
-if 'processed_files' not in st.session_state:
-    st.session_state.processed_files = set()
-if 'total_transactions' not in st.session_state:
-    st.session_state.total_transactions = 0
-if 'fraud_count' not in st.session_state:
-    st.session_state.fraud_count = 0
-if 'total_amount' not in st.session_state:
-    st.session_state.total_amount = 0
-if 'last_update' not in st.session_state:
-    st.session_state.last_update = time.time()
-if 'fraud_amount' not in st.session_state:
-    st.session_state.fraud_amount = 0
-if 'legit_amount' not in st.session_state:
-    st.session_state.legit_amount = 0
-
-# Set up the Streamlit page
+# Add consumer module path (scoring service)
+consumer_path = os.path.dirname(os.path.abspath(__file__))
+if consumer_path not in sys.path:
+    sys.path.insert(0, consumer_path)
+
+from scoring_service import HISTORY_DB, SERVICE_VIEW_PATH, ScoringService, load_view
+from history_store import HistoryReader
+from backpressure import LOADED_RENDER_INTERVAL, RENDER_INTERVAL
+from metrics import stage_histogram
+
+# 'embedded' runs one scoring service per Streamlit server, shared by every session;
+# 'remote' only reads the view published by `python consumer/scoring_service.py`
+SERVICE_MODE = os.getenv('SERVICE_MODE', 'embedded')
+
+# Optional metrics panel on the dashboard
+SHOW_METRICS = os.getenv('SHOW_METRICS', '0') == '1'
+
+# History panel: queried from the history store every HISTORY_REFRESH seconds
+HISTORY_REFRESH = float(os.getenv('HISTORY_REFRESH', 10))
+HISTORY_HOURS = float(os.getenv('HISTORY_HOURS', 24))
+HISTORY_TOP_N = int(os.getenv('HISTORY_TOP_N', 10))
+
+RENDER_SECONDS = stage_histogram('render')
+
+@st.cache_resource(show_spinner=False)
+def get_service():
+    """The process-wide scoring service, created and started by the first session."""
+    return ScoringService().start()
+
+def current_view():
+    """Latest view of the scoring service, None until a headless service has published one."""
+    if SERVICE_MODE == 'remote':
+        return load_view(SERVICE_VIEW_PATH)
+    return get_service().view()
+
+# Set up the Streamlit page; must come before anything else is drawn
 st.set_page_config(page_title="Real-Time Fraud Detection", layout="wide")
 st.title("Real-Time Fraud Detection Dashboard")
 
-# Create columns for metrics
+if SERVICE_MODE != 'remote':
+    try:
+        get_service()
+    except Exception as e:
+        st.error(f"Failed to start scoring service: {str(e)}")
+        st.stop()
+
+# Placeholders are filled in place on every refresh
+status_placeholder = st.empty()
 col1, col2, col3, col4 = st.columns(4)
+metric_placeholders = [col.empty() for col in (col1, col2, col3, col4)]
+window_placeholder = st.empty()
+chart_placeholder = st.empty()
+st.subheader("Recent Transactions")
+table_placeholder = st.empty()
+if HISTORY_DB:
+    st.subheader("History")
+    history_chart_placeholder = st.empty()
+    history_table_placeholder = st.empty()
+if SHOW_METRICS:
+    st.subheader("Pipeline Metrics")
+    metrics_placeholder = st.empty()
+
+# Read-only connection of this session, opened once the service has created the store
+history_reader = None
+last_history_render = 0.0
 
-def process_transaction(transaction):
-    """Process a transaction and make fraud prediction."""
+def update_history():
+    """Redraw the history panel from the per-minute rollup and the amount index of the history store."""
+    global history_reader
     try:
-        # Extract features in the correct order
-        features = []
-        
-        # Add Time and Amount as first two features
-        features.append(float(transaction['timestamp'].split('T')[1].split(':')[0]))  # Hour
-        features.append(float(transaction['amount']))
-        
-        # Add V1-V28 features
-        for i in range(28):
-            feature_name = f'V{i+1}'
-            if feature_name in transaction['features']:
-                features.append(transaction['features'][feature_name])
-            else:
-                features.append(0.0)  # Default value if feature is missing
-        
-        features = np.array(features).reshape(1, -1)
-        
-        # Make prediction
-        prediction = model.predict(features, verbose=0)[0][0]
-        
-        # Update metrics
-        st.session_state.total_transactions += 1
-        st.session_state.total_amount += transaction['amount']
-        
-        # Use both model prediction and actual fraud label
-        is_fraud = prediction > 0.3 or transaction['is_fraud'] == 1
-        
-        # Store transaction with prediction
-        transaction['prediction'] = float(prediction)
-        transaction['is_fraud'] = is_fraud
-        
-        # Update fraud metrics
-        if is_fraud:
-            st.session_state.fraud_count += 1
-            st.session_state.fraud_amount += transaction['amount']
-            try:
-                alert_message = (
-                    f"🚨 FRAUD ALERT 🚨\n"
-                    f"Amount: ${transaction['amount']:.2f}\n"
-                    f"Time: {transaction['timestamp']}\n"
-                    f"Fraud Probability: {prediction:.2%}\n"
-                    f"Transaction ID: {transaction['id']}"
-                )
-                send_sms_alert(alert_message)
-            except Exception as e:
-                st.error(f"Failed to send SMS alert: {str(e)}")
-        else:
-            st.session_state.legit_amount += transaction['amount']
-        
-        # Add transaction to history
-        st.session_state.transactions.append(transaction)
+        if history_reader is None:
+            if not os.path.exists(HISTORY_DB):
+                return
+            history_reader = HistoryReader(HISTORY_DB)
+        
+        per_minute = history_reader.fraud_rate_per_minute(HISTORY_HOURS)
+        if len(per_minute['minute']):
+            # Shift epoch seconds to local wall-clock time for the x axis
+            utc_offset = datetime.now().astimezone().utcoffset().total_seconds()
+            fig = go.Figure(go.Scattergl(
+                x=((per_minute['minute'] + utc_offset) * 1000).astype('datetime64[ms]'),
+                y=per_minute['fraud_rate'] * 100,
+                mode='lines',
+                line=dict(color='red'),
+                customdata=per_minute['count'],
+                hovertemplate="%{y:.1f}% of %{customdata:,} transactions<extra></extra>"
+            ))
+            fig.update_layout(
+                title=f"Fraud Rate per Minute, last {HISTORY_HOURS:g}h",
+                xaxis_title="Time",
+                yaxis_title="Fraud Rate (%)",
+                height=300
+            )
+            history_chart_placeholder.plotly_chart(fig, use_container_width=True)
         
+        top_amounts = history_reader.top_amounts(HISTORY_TOP_N, HISTORY_HOURS)
+        if top_amounts:
+            top_df = pd.DataFrame(top_amounts)
+            history_table_placeholder.dataframe(
+                top_df[['timestamp', 'amount', 'status', 'probability', 'id']].style
+                .applymap(lambda x: 'color: red' if 'FRAUD' in str(x) else 'color: green' if 'LEGIT' in str(x) else ''),
+                hide_index=True
+            )
     except Exception as e:
-        st.error(f"Error processing transaction: {str(e)}")
-        print(f"Error processing transaction: {str(e)}")  # Add console logging
+        st.error(f"Error querying history: {str(e)}")
 
-def update_dashboard():
-    """Update the dashboard with latest metrics and visualizations."""
+def update_dashboard(view):
+    """
+    Update the dashboard from a scoring service view; sessions only read it.
+
+    Args:
+        view (dict): Snapshot from ScoringService.view()
+    """
     try:
+        # Service health: a stale published view or a recent loop error
+        age = time.time() - view['time']
+        if SERVICE_MODE == 'remote' and age > max(5.0, 10 * RENDER_INTERVAL):
+            status_placeholder.warning(f"Scoring service view is {age:.0f}s old, is the service running?")
+        elif view['error'] is not None and time.time() - view['error'][0] < 60:
+            status_placeholder.error(view['error'][1])
+        else:
+            status_placeholder.empty()
+        
         # Update metrics
-        col1.metric("Total Transactions", st.session_state.total_transactions)
-        fraud_rate = (st.session_state.fraud_count / st.session_state.total_transactions * 100) if st.session_state.total_transactions > 0 else 0
-        col2.metric("Fraud Rate", f"{fraud_rate:.1f}%")
-        col3.metric("Total Amount", f"${st.session_state.total_amount:,.2f}")
-        col4.metric("Fraud Amount", f"${st.session_state.fraud_amount:,.2f}")
+        aggregates = view['aggregates']
+        metric_placeholders[0].metric("Total Transactions", aggregates['total_transactions'])
+        fraud_rate = (aggregates['fraud_count'] / aggregates['total_transactions'] * 100) if aggregates['total_transactions'] > 0 else 0
+        metric_placeholders[1].metric("Fraud Rate", f"{fraud_rate:.1f}%")
+        metric_placeholders[2].metric("Total Amount", f"${aggregates['total_amount']:,.2f}")
+        metric_placeholders[3].metric("Fraud Amount", f"${aggregates['fraud_amount']:,.2f}")
+        
+        # Rolling window metrics from the time-bucketed counters
+        window_lines = []
+        for name, (count, fraud_count, amount, fraud_amount) in view['windows'].items():
+            rate = fraud_count / count * 100 if count else 0
+            window_lines.append(
+                f"**{name}**: {count:,} transactions, {rate:.1f}% fraud, "
+                f"${amount:,.2f} total, ${fraud_amount:,.2f} fraud"
+            )
+        load = view['load']
+        window_lines.append(
+            f"**Load**: {load['level']}, {load['lag']:.1f}s lag, {load['backlog']:,} waiting, "
+            f"polling {load['batch_size']:,}, {load['prioritized']:,} prioritized, {load['deferred']:,} deferred, "
+            f"{load['shed']:,} shed"
+        )
+        if view['prediction_cache'] is not None:
+            cache_stats = view['prediction_cache']
+            window_lines.append(
+                f"**Prediction cache**: {cache_stats['hit_rate']:.1%} hit rate, {cache_stats['entries']:,} entries"
+            )
+        if view['cascade'] is not None:
+            cascade_stats = view['cascade']
+            window_lines.append(
+                f"**Cascade**: {cascade_stats['prefilter_pass_rate']:.1%} passed the prefilter, "
+                f"{cascade_stats['model_rate']:.1%} scored by the full model, "
+                f"{cascade_stats['estimated_recall']:.2%} estimated recall vs full model "
+                f"({cascade_stats['audited']:,} audited)"
+            )
+        if view['history'] is not None:
+            history_stats = view['history']
+            window_lines.append(
+                f"**History**: {history_stats['written']:,} stored, {history_stats['dropped']:,} dropped, "
+                f"{history_stats['queue_depth']:,} batches queued"
+            )
+        if view['workers'] is not None:
+            stats = view['workers']
+            window_lines.append(
+                f"**Workers**: {stats['alive']}/{stats['workers']} alive, {stats['restarts']} restarts, "
+                f"{stats['scored']:,} scored"
+            )
+        window_placeholder.markdown("  \n".join(window_lines))
         
-        # Create transaction history plot
-        if len(st.session_state.transactions) > 0:
-            df = pd.DataFrame(list(st.session_state.transactions))
-            df['timestamp'] = pd.to_datetime(df['timestamp'])
-            
-            # Sort by timestamp
-            df = df.sort_values('timestamp')
-            
-            # Create figure with secondary y-axis
+        # Create transaction history plot from the ring buffer copies
+        if view['recent']:
+            # Shift epoch seconds to local wall-clock time for the x axis
+            utc_offset = datetime.now().astimezone().utcoffset().total_seconds()
             fig = go.Figure()
             
-            # Add legitimate transactions
-            legit_df = df[~df['is_fraud']]
-            if not legit_df.empty:
-                fig.add_trace(go.Scatter(
-                    x=legit_df['timestamp'],
-                    y=legit_df['amount'],
-                    mode='markers',
-                    marker=dict(color='green', size=8),
-                    name='Legitimate'
-                ))
-            
-            # Add fraudulent transactions
-            fraud_df = df[df['is_fraud']]
-            if not fraud_df.empty:
-                fig.add_trace(go.Scatter(
-                    x=fraud_df['timestamp'],
-                    y=fraud_df['amount'],
-                    mode='markers',
-                    marker=dict(color='red', size=8),
-                    name='Fraudulent'
-                ))
+            for (timestamps, amounts), color, name in ((view['legit'], 'green', 'Legitimate'), (view['fraud'], 'red', 'Fraudulent')):
+                if len(timestamps):
+                    fig.add_trace(go.Scattergl(
+                        x=((timestamps + utc_offset) * 1000).astype('datetime64[ms]'),
+                        y=amounts,
+                        mode='markers',
+                        marker=dict(color=color, size=8),
+                        name=name
+                    ))
             
             fig.update_layout(
                 title="Transaction History",
@@ -170,86 +206,44 @@ def update_dashboard():
                 hovermode='x unified'
             )
             
-            st.plotly_chart(fig, use_container_width=True)
+            chart_placeholder.plotly_chart(fig, use_container_width=True)
             
-            # Display recent transactions
-            st.subheader("Recent Transactions")
-            recent_df = pd.DataFrame(list(st.session_state.transactions)[-10:])
-            recent_df['timestamp'] = pd.to_datetime(recent_df['timestamp']).dt.strftime('%Y-%m-%d %H:%M:%S')
-            recent_df['status'] = recent_df['is_fraud'].apply(lambda x: '🚨 FRAUD' if x else '✅ LEGIT')
-            recent_df['probability'] = recent_df['prediction'].apply(lambda x: f"{x:.2%}")
-            recent_df['id'] = recent_df['id'].apply(lambda x: x[:8])  # Show only first 8 chars of ID
+            # Display pre-formatted recent transactions
+            recent_df = pd.DataFrame(view['recent'])
             
             # Style the dataframe
-            st.dataframe(
+            table_placeholder.dataframe(
                 recent_df[['timestamp', 'amount', 'status', 'probability', 'id']].style
                 .applymap(lambda x: 'color: red' if 'FRAUD' in str(x) else 'color: green' if 'LEGIT' in str(x) else ''),
                 hide_index=True
             )
+        
+        if SHOW_METRICS:
+            metrics_placeholder.dataframe(pd.DataFrame(view['stages']), hide_index=True)
             
     except Exception as e:
         st.error(f"Error updating dashboard: {str(e)}")
 
-def cleanup_old_files():
-    """Clean up old transaction files."""
-    try:
-        # Remove files older than 1 hour
-        current_time = time.time()
-        for file_path in glob.glob(os.path.join(transactions_dir, 'transaction_*.json')):
-            try:
-                if os.path.getmtime(file_path) < current_time - 3600:  # 1 hour
-                    os.remove(file_path)
-                    st.session_state.processed_files.discard(file_path)
-            except FileNotFoundError:
-                continue  # Skip if file was already deleted
-            except Exception as e:
-                print(f"Error removing file {file_path}: {str(e)}")
-    except Exception as e:
-        print(f"Error cleaning up old files: {str(e)}")
-
-# Main dashboard loop
+# Render loop: each session redraws from the shared view, scoring runs in the service
 while True:
     try:
-        # Get new transaction files
-        transaction_files = glob.glob(os.path.join(transactions_dir, 'transaction_*.json'))
-        
-        # Process new files
-        for file_path in transaction_files:
-            if file_path not in st.session_state.processed_files:
-                try:
-                    with open(file_path, 'r') as f:
-                        transaction = json.load(f)
-                    
-                    # Process transaction
-                    process_transaction(transaction)
-                    
-                    # Mark file as processed
-                    st.session_state.processed_files.add(file_path)
-                    
-                    # Remove processed file
-                    try:
-                        os.remove(file_path)
-                    except FileNotFoundError:
-                        continue  # Skip if file was already deleted
-                    except Exception as e:
-                        print(f"Error removing processed file {file_path}: {str(e)}")
-                        
-                except Exception as e:
-                    print(f"Error processing file {file_path}: {str(e)}")
-                    continue
+        view = current_view()
+        if view is None:
+            status_placeholder.info(f"Waiting for the scoring service to publish {SERVICE_VIEW_PATH}...")
+            time.sleep(1)
+            continue
         
-        # Update dashboard every 0.5 seconds
-        current_time = time.time()
-        if current_time - st.session_state.last_update >= 0.5:
-            update_dashboard()
-            st.session_state.last_update = current_time
+        with RENDER_SECONDS.time():
+            update_dashboard(view)
         
-        # Cleanup old files
-        cleanup_old_files()
+        # Queries against the store are heavier than the in-memory view, so the panel refreshes less often
+        if HISTORY_DB and time.time() - last_history_render >= HISTORY_REFRESH:
+            update_history()
+            last_history_render = time.time()
         
-        # Wait for a short time before next update
-        time.sleep(0.1)
+        # Redraw every 0.5 seconds, less often while behind
+        time.sleep(RENDER_INTERVAL if view['load']['level'] == 'normal' else LOADED_RENDER_INTERVAL)
         
     except Exception as e:
-        st.error(f"Error in main loop: {str(e)}")
-        time.sleep(1)  # Wait before retrying 
\ No newline at end of file
+        st.error(f"Error in dashboard loop: {str(e)}")
+        time.sleep(1)  # Wait before retrying
@@ -0,0 +1,329 @@
+import os
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime
+
+import numpy as np
+
+from metrics import registry
+
+# History store configuration
+HISTORY_RETENTION = float(os.getenv('HISTORY_RETENTION', 7 * 24 * 3600))  # Seconds of history kept, 0 keeps everything
+HISTORY_QUEUE_SIZE = int(os.getenv('HISTORY_QUEUE_SIZE', 1000))  # Scored batches waiting for the writer
+
+# Rows deleted per write cycle while pruning, so a large backlog of expired rows never stalls appends
+PRUNE_ROWS = 50_000
+PRUNE_INTERVAL = 60.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS scored (
+    id BLOB NOT NULL,
+    timestamp REAL NOT NULL,
+    amount REAL NOT NULL,
+    probability REAL NOT NULL,
+    is_fraud INTEGER NOT NULL,
+    label INTEGER NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS scored_id ON scored (id);
+CREATE INDEX IF NOT EXISTS scored_timestamp ON scored (timestamp);
+CREATE INDEX IF NOT EXISTS scored_fraud ON scored (is_fraud, timestamp);
+CREATE INDEX IF NOT EXISTS scored_amount ON scored (amount);
+CREATE TABLE IF NOT EXISTS minute_stats (
+    minute INTEGER PRIMARY KEY,
+    count INTEGER NOT NULL,
+    fraud_count INTEGER NOT NULL,
+    amount REAL NOT NULL,
+    fraud_amount REAL NOT NULL
+);
+"""
+
+UPSERT_MINUTES = """
+INSERT INTO minute_stats (minute, count, fraud_count, amount, fraud_amount) VALUES (?, ?, ?, ?, ?)
+ON CONFLICT (minute) DO UPDATE SET
+    count = count + excluded.count,
+    fraud_count = fraud_count + excluded.fraud_count,
+    amount = amount + excluded.amount,
+    fraud_amount = fraud_amount + excluded.fraud_amount
+"""
+
+RECOUNT_MINUTES = """
+INSERT OR REPLACE INTO minute_stats (minute, count, fraud_count, amount, fraud_amount)
+SELECT CAST(timestamp / 60 AS INTEGER), COUNT(*), SUM(is_fraud), SUM(amount), SUM(amount * is_fraud)
+FROM scored WHERE timestamp >= ? AND timestamp < ?
+GROUP BY CAST(timestamp / 60 AS INTEGER)
+"""
+
+ROW_COLUMNS = 'id, timestamp, amount, probability, is_fraud, label'
+
+
+def minute_rollup(timestamps, amounts, is_fraud):
+    """(minute, count, fraud_count, amount, fraud_amount) rows of a batch, one per epoch minute."""
+    minutes, inverse = np.unique((timestamps // 60).astype(np.int64), return_inverse=True)
+    inverse = inverse.reshape(-1)
+    fraud_amounts = np.where(is_fraud, amounts, 0.0)
+    fraud_counts = np.bincount(inverse, weights=is_fraud.astype(np.float64), minlength=len(minutes))
+    return zip(
+        minutes.tolist(),
+        np.bincount(inverse, minlength=len(minutes)).tolist(),
+        fraud_counts.astype(np.int64).tolist(),
+        np.bincount(inverse, weights=amounts, minlength=len(minutes)).tolist(),
+        np.bincount(inverse, weights=fraud_amounts, minlength=len(minutes)).tolist(),
+    )
+
+
+def connect(path, read_only=False):
+    """SQLite connection to the history database in WAL mode, so readers never block the writer."""
+    if read_only:
+        connection = sqlite3.connect(f'file:{path}?mode=ro', uri=True, timeout=5.0)
+    else:
+        connection = sqlite3.connect(path, timeout=5.0)
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')  # Durable across process crashes, not power loss
+        connection.executescript(SCHEMA)
+    return connection
+
+
+class HistoryWriter:
+    """
+    Background writer of scored transactions to the SQLite history store.
+
+    submit() only enqueues the batch arrays, so scoring never waits on disk.
+    A writer thread drains every queued batch into one transaction: rows go
+    to the `scored` table (indexed on ID, timestamp, fraud flag and amount)
+    and per-minute totals are upserted into `minute_stats`, which keeps
+    long-range aggregates to one row per minute. Rows older than the
+    retention are pruned a chunk at a time. When the queue is full the
+    newest batch is dropped and counted rather than blocking.
+    """
+
+    def __init__(self, path, max_queue=HISTORY_QUEUE_SIZE, retention=HISTORY_RETENTION):
+        self.path = path
+        self.retention = retention
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.last_prune = 0.0
+        self.written_rows = 0
+        self.dropped_rows = 0
+        self.written = registry.counter('fraud_history_rows_total', "Scored transactions written to the history store")
+        self.dropped = registry.counter('fraud_history_dropped_total',
+                                        "Scored transactions not stored because the history queue was full")
+        self.write_seconds = registry.histogram('fraud_history_write_seconds', "Time per history store transaction")
+        registry.gauge('fraud_history_queue_depth', "Batches waiting for the history writer",
+                       function=self.queue.qsize)
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        connect(path).close()  # Create the schema before readers open the file
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name='history-writer', daemon=True)
+        self.thread.start()
+
+    def submit(self, keys, timestamps, amounts, predictions, is_fraud, labels):
+        """
+        Queue a scored batch without blocking.
+
+        Args:
+            keys (np.ndarray): (n, 2) uint64 transaction keys from transaction_keys()
+            timestamps (np.ndarray): Epoch seconds
+            amounts (np.ndarray): Transaction amounts
+            predictions (np.ndarray): Model probabilities
+            is_fraud (np.ndarray): Boolean fraud decisions
+            labels (np.ndarray): Boolean fraud labels sent by the producer
+
+        Returns:
+            bool: False if the batch was dropped
+        """
+        try:
+            self.queue.put_nowait((keys, timestamps, amounts, predictions, is_fraud, labels))
+            return True
+        except queue.Full:
+            self.dropped_rows += len(keys)
+            self.dropped.inc(len(keys))
+            return False
+
+    def _drain(self, timeout):
+        try:
+            batches = [self.queue.get(timeout=timeout)]
+        except queue.Empty:
+            return []
+        while True:
+            try:
+                batches.append(self.queue.get_nowait())
+            except queue.Empty:
+                return batches
+
+    def _write(self, connection, batches):
+        keys, timestamps, amounts, predictions, is_fraud, labels = (
+            np.concatenate(column) for column in zip(*batches)
+        )
+        id_bytes = np.ascontiguousarray(keys, dtype='<u8').tobytes()
+        rows = zip(
+            (id_bytes[i:i + 16] for i in range(0, len(id_bytes), 16)),
+            timestamps.tolist(),
+            amounts.tolist(),
+            predictions.astype(np.float64).tolist(),
+            is_fraud.astype(np.int64).tolist(),
+            labels.astype(np.int64).tolist(),
+        )
+        with self.write_seconds.time(), connection:
+            changes = connection.total_changes
+            connection.executemany(
+                f'INSERT OR IGNORE INTO scored ({ROW_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?)', rows
+            )
+            if connection.total_changes - changes == len(keys):
+                connection.executemany(UPSERT_MINUTES, minute_rollup(timestamps, amounts, is_fraud))
+            else:
+                # Some IDs were already stored: recount the minutes touched from the table
+                first, last = timestamps.min() // 60, timestamps.max() // 60
+                connection.execute(RECOUNT_MINUTES, (float(first * 60), float((last + 1) * 60)))
+        self.written_rows += len(keys)
+        self.written.inc(len(keys))
+
+    def _prune(self, connection):
+        """Delete one chunk of expired rows; returns True while more remain."""
+        cutoff = time.time() - self.retention
+        with connection:
+            deleted = connection.execute(
+                'DELETE FROM scored WHERE rowid IN (SELECT rowid FROM scored WHERE timestamp < ? LIMIT ?)',
+                (cutoff, PRUNE_ROWS)
+            ).rowcount
+            connection.execute('DELETE FROM minute_stats WHERE minute < ?', (int(cutoff // 60),))
+        return deleted == PRUNE_ROWS
+
+    def _run(self):
+        connection = connect(self.path)
+        pruning = False
+        try:
+            while self.running or not self.queue.empty():
+                batches = self._drain(timeout=0.5)
+                if batches:
+                    try:
+                        self._write(connection, batches)
+                    except Exception as e:
+                        rows = sum(len(batch[0]) for batch in batches)
+                        print(f"❌ Error writing {rows} transactions to history: {str(e)}")
+                now = time.time()
+                if self.retention > 0 and (pruning or now - self.last_prune >= PRUNE_INTERVAL):
+                    self.last_prune = now
+                    try:
+                        pruning = self._prune(connection)
+                    except Exception as e:
+                        pruning = False
+                        print(f"⚠️ Error pruning history: {str(e)}")
+        finally:
+            connection.close()
+
+    def get_stats(self):
+        """Rows written and dropped, plus current queue depth."""
+        return {
+            'written': self.written_rows,
+            'dropped': self.dropped_rows,
+            'queue_depth': self.queue.qsize(),
+        }
+
+    def close(self, timeout=10.0):
+        """Write whatever is still queued, then stop the writer."""
+        self.running = False
+        self.thread.join(timeout)
+
+
+class HistoryReader:
+    """
+    Read-only query API over the history store, one per thread.
+
+    Aggregates come from the per-minute rollup and row queries walk the
+    indexes, so a query reads a bounded number of rows however much history
+    is stored. Reads run against the WAL snapshot and never block the writer.
+    """
+
+    def __init__(self, path):
+        self.connection = connect(path, read_only=True)
+
+    @staticmethod
+    def _row(row):
+        transaction_id, timestamp, amount, probability, is_fraud, label = row
+        return {
+            'id': str(uuid.UUID(bytes=bytes(transaction_id))),
+            'timestamp': datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d %H:%M:%S'),
+            'amount': amount,
+            'status': '🚨 FRAUD' if is_fraud else '✅ LEGIT',
+            'probability': f"{probability:.2%}",
+            'label': bool(label),
+        }
+
+    def fraud_rate_per_minute(self, hours=24, now=None):
+        """
+        Per-minute totals over the last `hours`, minutes without transactions omitted.
+
+        Returns:
+            dict: 'minute' (epoch seconds of each minute start), 'count', 'fraud_count', 'fraud_rate' arrays
+        """
+        since = int(((now or time.time()) - hours * 3600) // 60)
+        rows = self.connection.execute(
+            'SELECT minute, count, fraud_count FROM minute_stats WHERE minute >= ? ORDER BY minute', (since,)
+        ).fetchall()
+        minute, count, fraud_count = np.array(rows, dtype=np.int64).reshape(-1, 3).T
+        return {
+            'minute': minute * 60,
+            'count': count,
+            'fraud_count': fraud_count,
+            'fraud_rate': fraud_count / np.maximum(count, 1),
+        }
+
+    def totals(self, start, end):
+        """(count, fraud_count, amount, fraud_amount) of the whole minutes in [start, end)."""
+        return self.connection.execute(
+            'SELECT COALESCE(SUM(count), 0), COALESCE(SUM(fraud_count), 0), COALESCE(SUM(amount), 0), '
+            'COALESCE(SUM(fraud_amount), 0) FROM minute_stats WHERE minute >= ? AND minute < ?',
+            (int(start // 60), int(end // 60))
+        ).fetchone()
+
+    def top_amounts(self, n=10, hours=24, fraud_only=False, now=None):
+        """
+        The `n` largest transactions of the last `hours`, largest first.
+
+        Walking the amount index finds them after about n * stored / matching
+        rows, sorting the window costs one read per matching row; the
+        per-minute rollup gives both counts, so the cheaper plan is forced.
+        """
+        now = now or time.time()
+        since = now - hours * 3600
+        count, fraud_count, _, _ = self.totals(since, now + 60)
+        stored, stored_fraud = self.connection.execute(
+            'SELECT COALESCE(SUM(count), 0), COALESCE(SUM(fraud_count), 0) FROM minute_stats'
+        ).fetchone()
+        matching = fraud_count if fraud_only else count
+        if n * (stored_fraud if fraud_only else stored) < matching * matching:
+            index = 'scored_amount'
+        else:
+            index = 'scored_fraud' if fraud_only else 'scored_timestamp'
+        fraud_filter = ' AND is_fraud = 1' if fraud_only else ''
+        rows = self.connection.execute(
+            f'SELECT {ROW_COLUMNS} FROM scored INDEXED BY {index} '
+            f'WHERE timestamp >= ?{fraud_filter} ORDER BY amount DESC LIMIT ?',
+            (since, n)
+        ).fetchall()
+        return [self._row(row) for row in rows]
+
+    def transactions(self, start, end, fraud_only=False, limit=1000):
+        """Transactions with start <= timestamp < end, oldest first, at most `limit` of them."""
+        fraud_filter = ' AND is_fraud = 1' if fraud_only else ''
+        rows = self.connection.execute(
+            f'SELECT {ROW_COLUMNS} FROM scored '
+            f'WHERE timestamp >= ? AND timestamp < ?{fraud_filter} ORDER BY timestamp LIMIT ?',
+            (start, end, limit)
+        ).fetchall()
+        return [self._row(row) for row in rows]
+
+    def transaction(self, transaction_id):
+        """Stored result of one transaction ID, None if it is not in the history."""
+        row = self.connection.execute(
+            f'SELECT {ROW_COLUMNS} FROM scored WHERE id = ?', (uuid.UUID(transaction_id).bytes,)
+        ).fetchone()
+        return self._row(row) if row is not None else None
+
+    def close(self):
+        self.connection.close()
@@ -0,0 +1,173 @@
+import hashlib
+import os
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from metrics import registry
+
+# Prediction cache configuration
+DEFAULT_CACHE_SIZE = 100_000
+PREDICTION_CACHE_TTL = float(os.getenv('PREDICTION_CACHE_TTL', 3600))  # Seconds an entry stays valid
+
+# 64-bit FNV-1a style mixing constants
+HASH_PRIME = np.uint64(0x100000001B3)
+MIX_PRIME = np.uint64(0xFF51AFD7ED558CCD)
+
+
+def cache_size(setting, backend):
+    """
+    Cache entries for a PREDICTION_CACHE_SIZE setting.
+
+    'auto' enables the cache for the Keras backend only: a lookup costs a few
+    hundred microseconds per batch, more than the NumPy engine's forward pass.
+    """
+    if setting == 'auto':
+        return DEFAULT_CACHE_SIZE if backend == 'keras' else 0
+    return int(setting)
+
+
+def model_version(paths):
+    """(mtime_ns, size) of each model file, None for a file that does not exist."""
+    version = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            version.append(None)
+            continue
+        version.append((stat.st_mtime_ns, stat.st_size))
+    return tuple(version)
+
+
+def row_hashes(features, seed=0):
+    """
+    64-bit hash of each row's float32 bytes, vectorized over the batch.
+
+    Rows are read as uint64 words and folded column by column, so the cost
+    is a few array operations per 8 bytes of features regardless of batch size.
+    """
+    features = np.ascontiguousarray(features, dtype=np.float32)
+    if features.shape[1] % 2:
+        features = np.hstack([features, np.zeros((len(features), 1), dtype=np.float32)])
+    words = features.view(np.uint64)
+    hashes = np.full(len(features), seed, dtype=np.uint64)
+    for column in range(words.shape[1]):
+        hashes ^= words[:, column]
+        hashes *= HASH_PRIME
+    # Final avalanche so nearby inputs spread over the whole range
+    hashes ^= hashes >> np.uint64(33)
+    hashes *= MIX_PRIME
+    hashes ^= hashes >> np.uint64(33)
+    return hashes
+
+
+class PredictionCache:
+    """
+    LRU/TTL cache of model outputs keyed on the feature vector.
+
+    Keys are a hash of the row's float32 feature bytes seeded with the version
+    of every model file (weights, feature pipeline, prefilter), so replayed or
+    retried transactions (and rows repeated within a batch) skip inference.
+    Only misses are sent to the model, in one call. check_model() notices a
+    changed model file, clears the cache and tells the caller to reload the
+    model and its feature pipeline.
+    """
+
+    def __init__(self, model_paths, max_entries=DEFAULT_CACHE_SIZE, ttl=PREDICTION_CACHE_TTL,
+                 check_interval=5.0):
+        self.model_paths = list(model_paths)
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.check_interval = check_interval
+        self.entries = OrderedDict()  # hash -> (prediction, inserted at), least recently used first
+        self.last_check = time.time()
+        self._set_version(model_version(self.model_paths))
+        self.hit_count = 0
+        self.miss_count = 0
+        self.hits = registry.counter('fraud_prediction_cache_hits_total', "Predictions served from the cache")
+        self.misses = registry.counter('fraud_prediction_cache_misses_total', "Predictions computed by the model")
+        registry.gauge('fraud_prediction_cache_entries', "Entries in the prediction cache",
+                       function=lambda: len(self.entries))
+
+    def _set_version(self, version):
+        self.version = version
+        digest = hashlib.blake2b(repr(version).encode('utf-8'), digest_size=8).digest()
+        self.seed = int.from_bytes(digest, 'little')
+
+    def check_model(self):
+        """
+        Look for changed model files at most every check_interval seconds.
+
+        Returns:
+            bool: True if the model changed and the cache was cleared; the caller should reload it
+        """
+        now = time.time()
+        if now - self.last_check < self.check_interval:
+            return False
+        self.last_check = now
+        version = model_version(self.model_paths)
+        if version == self.version:
+            return False
+        changed = [path for path, old, new in zip(self.model_paths, self.version or (), version) if old != new]
+        print(f"Model files {changed or self.model_paths} changed, clearing {len(self.entries):,} cached predictions")
+        self._set_version(version)
+        self.entries.clear()
+        return True
+
+    def predict(self, model, features):
+        """
+        Predict a feature batch, calling the model only for rows not in the cache.
+
+        Args:
+            model: Model exposing predict_on_batch
+            features (np.ndarray): (n, d) float32 feature matrix
+
+        Returns:
+            np.ndarray: Fraud probability per row
+        """
+        hashes = row_hashes(features, self.seed)
+        predictions = np.empty(len(hashes), dtype=np.float32)
+        missed = np.zeros(len(hashes), dtype=bool)
+        expired_before = time.time() - self.ttl
+        entries = self.entries
+        for i, key in enumerate(hashes.tolist()):
+            entry = entries.get(key)
+            if entry is None or entry[1] < expired_before:
+                missed[i] = True
+            else:
+                predictions[i] = entry[0]
+                entries.move_to_end(key)
+
+        miss_rows = np.flatnonzero(missed)
+        if len(miss_rows):
+            # Rows repeated within the batch are predicted once
+            unique_hashes, first, inverse = np.unique(hashes[miss_rows], return_index=True, return_inverse=True)
+            computed = np.asarray(
+                model.predict_on_batch(features[miss_rows[first]]), dtype=np.float32
+            ).reshape(-1)
+            predictions[miss_rows] = computed[inverse.reshape(-1)]
+            now = time.time()
+            for key, prediction in zip(unique_hashes.tolist(), computed.tolist()):
+                entries[key] = (prediction, now)
+                entries.move_to_end(key)
+            while len(entries) > self.max_entries:
+                entries.popitem(last=False)
+
+        hits = len(hashes) - len(miss_rows)
+        self.hit_count += hits
+        self.miss_count += len(miss_rows)
+        self.hits.inc(hits)
+        self.misses.inc(len(miss_rows))
+        return predictions
+
+    def get_stats(self):
+        """Entries, hits, misses and hit rate."""
+        total = self.hit_count + self.miss_count
+        return {
+            'entries': len(self.entries),
+            'hits': self.hit_count,
+            'misses': self.miss_count,
+            'hit_rate': self.hit_count / total if total else 0.0,
+        }
@@ -0,0 +1,143 @@
+import os
+from datetime import datetime
+
+import numpy as np
+
+from features import FeatureVectorizer
+from metrics import stage_histogram
+from records import records_to_transactions
+
+# Model output above this value is treated as fraud
+FRAUD_THRESHOLD = 0.3
+
+MODEL_FILES = {'keras': 'fraud_model.h5', 'numpy': 'fraud_model.npz'}
+
+FEATURIZE_SECONDS = stage_histogram('featurize')
+PREDICT_SECONDS = stage_histogram('predict')
+
+
+def model_path(model_dir, backend='keras'):
+    """Path of the model file served by a backend."""
+    if backend not in MODEL_FILES:
+        raise ValueError(f"Unknown model backend: {backend}")
+    return os.path.join(model_dir, MODEL_FILES[backend])
+
+
+def model_files(model_dir, backend='keras'):
+    """Every file a served model is built from: weights, feature pipeline and cascade prefilter."""
+    from cascade import PREFILTER_NAME
+    return [
+        model_path(model_dir, backend),
+        os.path.join(model_dir, 'feature_pipeline.json'),
+        os.path.join(model_dir, PREFILTER_NAME),
+    ]
+
+
+def load_model(model_dir, backend='keras', cascade=False):
+    """
+    Load the fraud model with the requested inference backend.
+
+    Args:
+        model_dir (str): Directory holding fraud_model.h5 / fraud_model.npz
+        backend (str): 'keras' for TensorFlow, 'numpy' for the exported NumPy engine
+        cascade (bool): Put the trained prefilter (prefilter.json) in front of the model
+
+    Returns:
+        Model exposing predict_on_batch
+    """
+    if backend == 'numpy':
+        from numpy_model import NumpyModel
+        model = NumpyModel.load(model_path(model_dir, backend))
+    elif backend == 'keras':
+        # TensorFlow is only imported when the Keras backend is selected
+        import tensorflow as tf
+        model = tf.keras.models.load_model(model_path(model_dir, backend))
+    else:
+        raise ValueError(f"Unknown model backend: {backend}")
+    if cascade:
+        from cascade import CascadeModel
+        model = CascadeModel.load(model, model_dir, load_vectorizer(model_dir).columns, FRAUD_THRESHOLD)
+    return model
+
+
+def load_vectorizer(model_dir):
+    """
+    Load the feature pipeline saved next to the model.
+
+    Models trained before the pipeline was saved get an unfitted vectorizer,
+    which passes raw hour, amount and V1-V28 values through as before.
+    """
+    pipeline_path = os.path.join(model_dir, 'feature_pipeline.json')
+    if os.path.exists(pipeline_path):
+        return FeatureVectorizer.load(pipeline_path)
+    print(f"⚠️ {pipeline_path} not found, serving unscaled features")
+    return FeatureVectorizer()
+
+
+def score_batch(model, vectorizer, transactions, feature_store=None, cache=None):
+    """
+    Score a batch of transactions with a single model call.
+
+    Args:
+        model: Model exposing predict_on_batch (e.g. a Keras model)
+        vectorizer (FeatureVectorizer): Feature pipeline the model was trained with
+        transactions: List of transaction dicts or a RECORD_DTYPE record array
+        feature_store (VelocityFeatureStore): Per-entity state, required when the
+            model uses velocity features
+        cache (PredictionCache): Optional cache in front of the model call
+
+    Returns:
+        np.ndarray: Fraud probability per transaction, in input order
+    """
+    if len(transactions) == 0:
+        return np.empty(0, dtype=np.float32)
+
+    with FEATURIZE_SECONDS.time():
+        velocity = None
+        if vectorizer.velocity_columns:
+            timestamps, amounts, _ = batch_columns(transactions)
+            velocity = feature_store.update(batch_entities(transactions), timestamps, amounts)
+        features = vectorizer.transform(transactions, velocity)
+
+    with PREDICT_SECONDS.time():
+        if cache is not None:
+            if hasattr(model, 'prefilter'):
+                # The cascade counts every row, so its cache only sits in front of the full model
+                return model.predict_on_batch(features, cache)
+            return cache.predict(model, features)
+        # predict_on_batch skips the per-call data pipeline setup of predict()
+        predictions = model.predict_on_batch(features)
+        return np.asarray(predictions, dtype=np.float32).reshape(-1)
+
+
+def batch_columns(transactions):
+    """
+    Columns of a batch of transaction dicts or binary records.
+
+    Returns:
+        tuple: (epoch-second timestamps, amounts, fraud labels as bool) arrays
+    """
+    if isinstance(transactions, np.ndarray):
+        return (
+            transactions['timestamp_us'] / 1_000_000,
+            transactions['amount'].astype(np.float64),
+            transactions['is_fraud'] == 1,
+        )
+    timestamps = np.array([datetime.fromisoformat(t['timestamp']).timestamp() for t in transactions])
+    amounts = np.array([t['amount'] for t in transactions], dtype=np.float64)
+    labels = np.array([t['is_fraud'] == 1 for t in transactions], dtype=bool)
+    return timestamps, amounts, labels
+
+
+def batch_entities(transactions):
+    """Integer entity IDs of a batch (0 where the producer sent none)."""
+    if isinstance(transactions, np.ndarray):
+        return transactions['entity_id']
+    return np.array([t.get('entity_id', 0) for t in transactions], dtype=np.int64)
+
+
+def transaction_at(transactions, i):
+    """Transaction dict for one row of a batch of dicts or binary records."""
+    if isinstance(transactions, np.ndarray):
+        return records_to_transactions(transactions[i:i + 1])[0]
+    return transactions[i]
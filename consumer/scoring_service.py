@@ -0,0 +1,486 @@
+import atexit
+import json
+import os
+import pickle
+import sys
+import threading
+import time
+
+import numpy as np
+
+# Get the absolute path to the project root directory
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Sibling modules: metrics, alerting, consumer, model (NumPy engine, prefilter) and streaming (transports)
+for module_dir in ('monitoring', 'alerting', 'consumer', 'model', 'streaming'):
+    module_path = os.path.join(project_root, module_dir)
+    if module_path not in sys.path:
+        sys.path.insert(0, module_path)
+
+model_dir = os.path.join(project_root, 'model')
+
+from metrics import registry, stage_histogram, stage_summary, start_metrics_server
+from dispatcher import create_dispatcher
+from backpressure import BackpressureController
+from cascade import cascade_enabled, cascade_summary, COUNT_KEYS
+from checkpoint import ConsumerCheckpoint
+from dashboard_state import DashboardState
+from dedup import DedupIndex, transaction_keys
+from feature_store import VelocityFeatureStore
+from history_store import HistoryWriter
+from prediction_cache import PredictionCache, cache_size
+from scoring import (FRAUD_THRESHOLD, batch_columns, load_model, load_vectorizer, model_files, score_batch,
+                     transaction_at)
+from transport import create_transport
+from workers import ScoringCoordinator, join_rows, take_rows
+
+# Batching configuration
+MAX_BATCH_SIZE = int(os.getenv('MAX_BATCH_SIZE', 500))  # Max transactions per model call
+MAX_BATCH_WAIT = float(os.getenv('MAX_BATCH_WAIT', 0.1))  # Max seconds to wait for a batch to fill
+MAX_POLL_SIZE = int(os.getenv('MAX_POLL_SIZE', 0))  # Largest poll while behind, 0 for 8x the normal batch
+
+# Points kept for the transaction history chart
+DASHBOARD_HISTORY = int(os.getenv('DASHBOARD_HISTORY', 10000))
+
+# Per-entity velocity feature store, used when the model was trained with velocity features
+VELOCITY_MAX_ENTITIES = int(os.getenv('VELOCITY_MAX_ENTITIES', 1_000_000))
+VELOCITY_MAX_BYTES = int(os.getenv('VELOCITY_MAX_BYTES', 256 * 1024 * 1024))
+VELOCITY_TTL = float(os.getenv('VELOCITY_TTL', 3600))  # Seconds before an idle entity is evicted
+
+# Prometheus endpoint of the scoring process (0 disables it)
+METRICS_PORT = int(os.getenv('METRICS_PORT', 9100))
+
+# Checkpointed state: snapshot every CHECKPOINT_INTERVAL seconds (0 disables checkpointing)
+CHECKPOINT_DIR = os.getenv('CHECKPOINT_DIR', os.path.join(project_root, 'checkpoints'))
+CHECKPOINT_INTERVAL = float(os.getenv('CHECKPOINT_INTERVAL', 30))
+CHECKPOINT_FSYNC = os.getenv('CHECKPOINT_FSYNC', '1') == '1'  # fsync each WAL append
+
+# SQLite history of every scored transaction, '' disables it
+HISTORY_DB = os.getenv('HISTORY_DB', os.path.join(project_root, 'history', 'scored.db'))
+
+# Dead-letter file of transactions shed under overload (JSON lines, replayable with backtest.py --log), '' disables it
+SHED_LOG = os.getenv('SHED_LOG', os.path.join(CHECKPOINT_DIR, 'shed.jsonl'))
+
+# Where a headless service publishes its dashboard view, and how often
+SERVICE_VIEW_PATH = os.getenv('SERVICE_VIEW_PATH', os.path.join(CHECKPOINT_DIR, 'service_view.pkl'))
+PUBLISH_INTERVAL = float(os.getenv('PUBLISH_INTERVAL', 0.5))
+
+# Running aggregates kept by the service and in checkpoints
+AGGREGATE_KEYS = ('total_transactions', 'fraud_count', 'total_amount', 'fraud_amount', 'legit_amount')
+
+# Inference backend: 'keras' (TensorFlow) or 'numpy' (exported fraud_model.npz)
+MODEL_BACKEND = os.getenv('MODEL_BACKEND', 'keras')
+
+# Prediction cache entries ('auto' enables it for the Keras backend), kept per scoring process
+PREDICTION_CACHE_SIZE = cache_size(os.getenv('PREDICTION_CACHE_SIZE', 'auto'), MODEL_BACKEND)
+
+# Two-stage scoring: 'auto' puts the trained prefilter (model/prefilter.json) in front of the model when present
+CASCADE = cascade_enabled(os.getenv('CASCADE', 'auto'), model_dir)
+
+# Scoring processes: 0 scores in this process, 'auto' starts one worker per core
+SCORING_WORKERS = os.getenv('SCORING_WORKERS', '0')
+SCORING_WORKERS = (os.cpu_count() or 1) if SCORING_WORKERS == 'auto' else int(SCORING_WORKERS)
+
+# Hot-path metrics, recorded once per batch
+STAGE_SECONDS = {
+    stage: stage_histogram(stage)
+    for stage in ('ingest', 'dedup', 'parse', 'featurize', 'predict', 'alert', 'aggregate', 'commit',
+                  'cleanup', 'checkpoint', 'publish')
+}
+EVENTS_IN = registry.counter('fraud_events_in_total', "Transactions polled from the transport")
+SCORED = registry.counter('fraud_scored_total', "Transactions scored")
+FRAUDS = registry.counter('fraud_frauds_total', "Transactions flagged as fraud")
+BACKLOG = registry.gauge('fraud_backlog', "Transactions waiting in the transport")
+BATCH_SIZE = registry.gauge('fraud_batch_size', "Transactions in the last polled batch")
+
+
+def initial_state():
+    """Aggregates and dashboard data of a consumer that has scored nothing yet."""
+    state = {key: 0 for key in AGGREGATE_KEYS}
+    state['dashboard'] = DashboardState(history_size=DASHBOARD_HISTORY)
+    return state
+
+
+def apply_scored(state, timestamps, amounts, is_fraud, predictions, ids):
+    """Add a scored batch to the aggregates and dashboard of `state` (live or a restored checkpoint)."""
+    fraud_amount = float(amounts[is_fraud].sum())
+    state['total_transactions'] += len(amounts)
+    state['total_amount'] += float(amounts.sum())
+    state['fraud_count'] += int(is_fraud.sum())
+    state['fraud_amount'] += fraud_amount
+    state['legit_amount'] += float(amounts.sum()) - fraud_amount
+    state['dashboard'].add_batch(timestamps, amounts, is_fraud, predictions, ids)
+
+
+def apply_logged(state, record):
+    """Re-apply a WAL record without rescoring."""
+    recent_ids = record['recent_ids']
+    first_recent = len(record['amounts']) - len(recent_ids)
+    apply_scored(
+        state, record['timestamps'], record['amounts'], record['is_fraud'], record['predictions'],
+        lambda i: recent_ids[i - first_recent]
+    )
+
+
+def load_view(path=SERVICE_VIEW_PATH):
+    """Latest view published by a headless service, None if there is none yet."""
+    try:
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+    except (FileNotFoundError, EOFError):
+        return None
+
+
+class ScoringService:
+    """
+    The one ingestion and scoring loop of a consumer process.
+
+    The service owns the transport, model, dedup index, checkpoint, alert
+    dispatcher and dashboard aggregates, and runs the poll / score / commit
+    loop on a background thread. Dashboards never touch that state: they
+    render view(), a copy taken under the service lock, or the same view
+    published to a file when the service runs headless in its own process.
+    """
+
+    def __init__(self, publish_path=None, transport=None, alert_dispatcher=None, model_directory=model_dir,
+                 cascade=CASCADE, checkpoint_dir=CHECKPOINT_DIR, history_db=HISTORY_DB, shed_log=SHED_LOG):
+        """
+        Args:
+            publish_path (str): File the view is written to for remote dashboards, None to keep it in memory
+            transport: Transport to consume, default create_transport()
+            alert_dispatcher: Dispatcher for fraud alerts, default create_dispatcher()
+            model_directory (str): Directory of the model, feature pipeline and prefilter
+            cascade (bool): Score with the prefilter in front of the model
+            checkpoint_dir (str): Checkpoint directory, None disables checkpointing
+            history_db (str): History store path, None or '' disables it
+            shed_log (str): Dead-letter file for shed transactions, None or '' only counts them
+        """
+        self.model_dir = model_directory
+        self.cascade = cascade
+        self.vectorizer = load_vectorizer(model_directory)
+        # Worker processes load their own copy
+        self.model = load_model(model_directory, MODEL_BACKEND, cascade) if SCORING_WORKERS == 0 else None
+        self.lock = threading.Lock()
+        self.stopping = threading.Event()
+        self.thread = None
+        self.last_error = None
+        self.publish_path = publish_path
+        self.last_publish = 0.0
+        self.shed_log = shed_log
+        if shed_log:
+            os.makedirs(os.path.dirname(shed_log) or '.', exist_ok=True)
+        self.deferred = None  # (transactions, columns) polled but held back by the backpressure plan
+
+        # Resume from the last checkpoint
+        self.dedup = DedupIndex()
+        self.checkpoint = None
+        state = initial_state()
+        if checkpoint_dir and CHECKPOINT_INTERVAL > 0:
+            restore_start = time.perf_counter()
+            self.checkpoint = ConsumerCheckpoint(checkpoint_dir, CHECKPOINT_INTERVAL, CHECKPOINT_FSYNC)
+            state, logged_keys = self.checkpoint.restore(initial_state, apply_logged)
+            self.dedup.add(logged_keys)
+            print(f"Checkpoint restore took {(time.perf_counter() - restore_start) * 1000:.1f}ms")
+        state.pop('seq', None)
+        self.state = state
+
+        self.alert_dispatcher = alert_dispatcher or create_dispatcher()
+        self.history = HistoryWriter(history_db) if history_db else None
+        self.feature_store = None
+        if self.vectorizer.velocity_columns and SCORING_WORKERS == 0:
+            self.feature_store = VelocityFeatureStore(
+                max_entities=VELOCITY_MAX_ENTITIES, ttl=VELOCITY_TTL, max_bytes=VELOCITY_MAX_BYTES
+            )
+        self.prediction_cache = None
+        if PREDICTION_CACHE_SIZE and SCORING_WORKERS == 0:
+            self.prediction_cache = PredictionCache(
+                model_files(model_directory, MODEL_BACKEND), max_entries=PREDICTION_CACHE_SIZE
+            )
+        self.coordinator = None
+        if SCORING_WORKERS > 0:
+            self.coordinator = ScoringCoordinator(
+                model_directory,
+                num_workers=SCORING_WORKERS,
+                backend=MODEL_BACKEND,
+                store_config={'max_entities': VELOCITY_MAX_ENTITIES // SCORING_WORKERS,
+                              'ttl': VELOCITY_TTL, 'max_bytes': VELOCITY_MAX_BYTES // SCORING_WORKERS},
+                cache_size=PREDICTION_CACHE_SIZE,
+                cascade=cascade
+            )
+        self.transport = transport or create_transport()
+        self.backpressure = BackpressureController(MAX_BATCH_SIZE * max(1, SCORING_WORKERS), MAX_POLL_SIZE or None)
+        start_metrics_server(METRICS_PORT)
+
+    def start(self):
+        """Run the loop on a daemon thread; closed at interpreter exit."""
+        self.thread = threading.Thread(target=self.run, name='scoring-service', daemon=True)
+        self.thread.start()
+        atexit.register(self.close)
+        return self
+
+    def run(self):
+        """Poll, score and commit until close() is called."""
+        while not self.stopping.is_set():
+            try:
+                self.step()
+            except Exception as e:
+                self._error(f"Error in main loop: {str(e)}")
+                time.sleep(1)  # Wait before retrying
+
+    def _error(self, message):
+        print(message)
+        self.last_error = (time.time(), message)
+
+    def step(self):
+        """One iteration of the consumer loop."""
+        controller = self.backpressure
+
+        # Poll the next batch of transactions, larger while the consumer is behind
+        with STAGE_SECONDS['ingest'].time():
+            batch = self.transport.poll(controller.batch_size(), MAX_BATCH_WAIT)
+        EVENTS_IN.inc(len(batch))
+        BATCH_SIZE.set(len(batch))
+        backlog = self.transport.backlog()
+        BACKLOG.set(backlog)
+
+        if len(batch):
+            with STAGE_SECONDS['parse'].time():
+                columns = batch_columns(batch)
+
+        # Rows deferred by earlier steps go first, they were polled first
+        if self.deferred is not None:
+            if len(batch):
+                batch = join_rows(self.deferred[0], batch)
+                columns = tuple(np.concatenate(pair) for pair in zip(self.deferred[1], columns))
+            else:
+                batch, columns = self.deferred
+            self.deferred = None
+
+        if len(batch):
+            controller.observe(backlog, columns[0])
+
+            # Normally one pass over the whole batch; when overloaded, high amounts go first
+            # and the rest is scored one base batch per step, or shed
+            passes, deferred, shed = controller.plan(columns[1])
+            try:
+                for rows in passes:
+                    if len(rows) == len(batch):
+                        self.process_batch(batch, columns)
+                    elif len(rows):
+                        self.process_batch(take_rows(batch, rows), tuple(column[rows] for column in columns))
+                if len(shed):
+                    self.log_shed(take_rows(batch, shed))
+            except Exception:
+                # Nothing is acknowledged: the transport redelivers every batch polled since the last commit,
+                # deferred rows included, and dedup skips rows already scored
+                self.transport.rollback()
+                raise
+
+            if len(deferred):
+                self.deferred = (take_rows(batch, deferred), tuple(column[deferred] for column in columns))
+            else:
+                # Acknowledge the polled batches only once every row is scored or logged as shed
+                with STAGE_SECONDS['commit'].time():
+                    self.transport.commit()
+        else:
+            controller.observe(backlog, np.empty(0))
+
+        # Snapshot committed state; the WAL restarts. Not while rows are deferred: until
+        # the commit, the WAL keys keep rows already scored from being rescored after a restart
+        if self.checkpoint is not None and self.deferred is None:
+            with STAGE_SECONDS['checkpoint'].time():
+                self.checkpoint.maybe_snapshot(self._checkpoint_state)
+
+        # Cleanup old transactions, deferred while behind
+        current_time = time.time()
+        if controller.should_cleanup(current_time):
+            with STAGE_SECONDS['cleanup'].time():
+                self.transport.cleanup()
+
+        if self.publish_path and current_time - self.last_publish >= PUBLISH_INTERVAL:
+            with STAGE_SECONDS['publish'].time():
+                self.publish()
+            self.last_publish = current_time
+
+    def log_shed(self, transactions):
+        """Append shed transactions to the dead-letter file, synced before their offsets are committed."""
+        print(f"⚠️ Shed {len(transactions)} transactions at {self.backpressure.lag:.1f}s lag")
+        if not self.shed_log:
+            return
+        with open(self.shed_log, 'a') as f:
+            for i in range(len(transactions)):
+                f.write(json.dumps(transaction_at(transactions, i)) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _checkpoint_state(self):
+        # Only the service thread mutates state, so the snapshot can pickle it without the lock
+        return {key: self.state[key] for key in AGGREGATE_KEYS + ('dashboard',)}
+
+    def reload_model(self):
+        """
+        Serve the changed model, feature pipeline and prefilter together; if they
+        cannot be loaded yet (e.g. half written), retry at the next check.
+        """
+        try:
+            vectorizer = load_vectorizer(self.model_dir)
+            model = load_model(self.model_dir, MODEL_BACKEND, self.cascade)
+            if self.cascade:
+                model.counts = self.model.counts  # Dashboard cascade stats carry on across reloads
+            if vectorizer.velocity_columns and self.feature_store is None:
+                self.feature_store = VelocityFeatureStore(
+                    max_entities=VELOCITY_MAX_ENTITIES, ttl=VELOCITY_TTL, max_bytes=VELOCITY_MAX_BYTES
+                )
+            self.model, self.vectorizer = model, vectorizer
+            print(f"✅ Reloaded model and feature pipeline from {self.model_dir}")
+        except Exception as e:
+            self.prediction_cache.version = None
+            print(f"⚠️ Error reloading model, keeping the previous one: {str(e)}")
+
+    def process_batch(self, transactions, columns):
+        """
+        Score a batch of transactions with one model call (or one per worker) and apply the results.
+
+        Args:
+            transactions: List of transaction dicts or a RECORD_DTYPE record array
+            columns (tuple): (timestamps, amounts, labels) arrays of the batch from batch_columns()
+
+        Raises:
+            Exception: Scoring errors propagate so the caller does not commit the batch
+        """
+        # Drop redelivered transactions, e.g. scored before a restart but not yet committed
+        with STAGE_SECONDS['dedup'].time():
+            keys = transaction_keys(transactions)
+            duplicates = self.dedup.seen(keys)
+        if duplicates.any():
+            keep = np.flatnonzero(~duplicates)
+            print(f"Skipping {int(duplicates.sum())} transactions that were already scored")
+            transactions, keys = take_rows(transactions, keep), keys[keep]
+            columns = tuple(column[keep] for column in columns)
+            if not len(transactions):
+                return
+
+        if self.coordinator is not None:
+            predictions = self.coordinator.score(transactions)
+        else:
+            cache = self.prediction_cache
+            if cache is not None and cache.check_model():
+                self.reload_model()
+            predictions = score_batch(self.model, self.vectorizer, transactions, self.feature_store, cache)
+
+        timestamps, amounts, labels = columns
+
+        # Use both model prediction and actual fraud label
+        is_fraud = (predictions > FRAUD_THRESHOLD) | labels
+        SCORED.inc(len(predictions))
+        FRAUDS.inc(int(is_fraud.sum()))
+
+        # Log the results before any alert is queued, so a restart neither rescores nor re-alerts them
+        if self.checkpoint is not None:
+            with STAGE_SECONDS['checkpoint'].time():
+                recent_rows = range(max(0, len(amounts) - self.state['dashboard'].recent.maxlen), len(amounts))
+                self.checkpoint.log_batch(
+                    keys,
+                    timestamps=timestamps, amounts=amounts, is_fraud=is_fraud, predictions=predictions,
+                    recent_ids=[transaction_at(transactions, i)['id'] for i in recent_rows]
+                )
+
+        self.dedup.add(keys)
+
+        # Queued for the alert dispatcher, never blocks scoring
+        with STAGE_SECONDS['alert'].time():
+            for i in np.flatnonzero(is_fraud):
+                transaction = transaction_at(transactions, i)
+                self.alert_dispatcher.submit({
+                    'id': transaction['id'],
+                    'amount': transaction['amount'],
+                    'timestamp': transaction['timestamp'],
+                    'prediction': float(predictions[i])
+                })
+
+        # Queued for the history writer, never blocks scoring either
+        if self.history is not None:
+            self.history.submit(keys, timestamps, amounts, predictions, is_fraud, labels)
+
+        # Update metrics and add transactions to history
+        with STAGE_SECONDS['aggregate'].time():
+            with self.lock:
+                apply_scored(
+                    self.state, timestamps, amounts, is_fraud, predictions,
+                    lambda i: transaction_at(transactions, i)['id']
+                )
+
+    def cascade_counts(self):
+        """Per-stage cascade counts, summed over scoring workers."""
+        if self.coordinator is not None:
+            per_worker = self.coordinator.get_stats()['per_worker']
+            return {key: sum(worker.get(f'cascade_{key}', 0) for worker in per_worker) for key in COUNT_KEYS}
+        return dict(self.model.counts)
+
+    def view(self):
+        """
+        Read-only copy of everything the dashboard shows.
+
+        Returns:
+            dict: Aggregates, window stats, scatter series, recent rows and status of each component
+        """
+        now = time.time()
+        with self.lock:
+            dashboard = self.state['dashboard']
+            view = {
+                'time': now,
+                'aggregates': {key: self.state[key] for key in AGGREGATE_KEYS},
+                'windows': dashboard.window_stats(now),
+                'legit': tuple(array.copy() for array in dashboard.legit.arrays()),
+                'fraud': tuple(array.copy() for array in dashboard.fraud.arrays()),
+                'recent': dashboard.recent_rows(),
+            }
+        view['load'] = self.backpressure.get_stats()
+        view['prediction_cache'] = self.prediction_cache.get_stats() if self.prediction_cache is not None else None
+        view['cascade'] = cascade_summary(self.cascade_counts()) if self.cascade else None
+        view['workers'] = self.coordinator.get_stats() if self.coordinator is not None else None
+        view['dedup'] = self.dedup.get_stats()
+        view['history'] = self.history.get_stats() if self.history is not None else None
+        view['stages'] = stage_summary()
+        view['error'] = self.last_error
+        return view
+
+    def publish(self):
+        """Atomically write view() for dashboards in other processes."""
+        temp_path = self.publish_path + '.tmp'
+        with open(temp_path, 'wb') as f:
+            pickle.dump(self.view(), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, self.publish_path)
+
+    def close(self):
+        """Stop the loop, then flush alerts and history and release workers, checkpoint and transport."""
+        if self.stopping.is_set():
+            return
+        self.stopping.set()
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join(MAX_BATCH_WAIT + 5)
+        self.alert_dispatcher.close()
+        if self.history is not None:
+            self.history.close()
+        if self.coordinator is not None:
+            self.coordinator.close()
+        if self.checkpoint is not None:
+            self.checkpoint.close()
+        self.transport.close()
+
+
+def main():
+    """Run the service headless, publishing its view for dashboards started with SERVICE_MODE=remote."""
+    os.makedirs(os.path.dirname(SERVICE_VIEW_PATH) or '.', exist_ok=True)
+    service = ScoringService(publish_path=SERVICE_VIEW_PATH)
+    print(f"Scoring service running (pid {os.getpid()}), publishing to {SERVICE_VIEW_PATH}")
+    try:
+        service.run()
+    except KeyboardInterrupt:
+        print("\nStopping scoring service...")
+    finally:
+        service.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,302 @@
+import multiprocessing
+import os
+import queue
+import time
+import uuid
+
+import numpy as np
+
+from records import transactions_to_records
+
+# Seconds a worker may spend on one partition before it is presumed hung and restarted
+WORKER_TIMEOUT = float(os.getenv('WORKER_TIMEOUT', 30))
+
+# Times a partition is resent to a restarted worker before the batch is failed
+MAX_PARTITION_RETRIES = 2
+
+
+def partition_keys(transactions, by_entity=False):
+    """
+    Integer partition key per transaction.
+
+    Keys are the entity ID when `by_entity` is set (so per-entity state stays
+    in one worker), otherwise the random low 64 bits of the transaction UUID.
+    Dicts and binary records of the same transaction get the same key.
+    """
+    if isinstance(transactions, np.ndarray):
+        if by_entity:
+            return transactions['entity_id'].astype(np.uint64)
+        return np.ascontiguousarray(transactions['id']).view('<u8').reshape(-1, 2)[:, 1]
+    if by_entity:
+        return np.array([t.get('entity_id', 0) for t in transactions], dtype=np.uint64)
+    return np.array(
+        [int.from_bytes(uuid.UUID(t['id']).bytes[8:], 'little') for t in transactions], dtype=np.uint64
+    )
+
+
+def partition_batch(transactions, num_partitions, by_entity=False):
+    """Row indices of each partition, in input order."""
+    partitions = partition_keys(transactions, by_entity) % np.uint64(num_partitions)
+    return [np.flatnonzero(partitions == p) for p in range(num_partitions)]
+
+
+def take_rows(transactions, rows):
+    """Subset of a batch of dicts or binary records."""
+    if isinstance(transactions, np.ndarray):
+        return transactions[rows]
+    return [transactions[i] for i in rows]
+
+
+def join_rows(first, second):
+    """Concatenation of two batches of the same kind (dicts or binary records)."""
+    if isinstance(first, np.ndarray):
+        return np.concatenate([first, second])
+    return list(first) + list(second)
+
+
+def worker_main(worker_id, model_dir, backend, store_config, tasks, results, cache_size=0, cascade=False):
+    """
+    Scoring worker process: load the model once, then score partitions until
+    a None task arrives. With cache_size the worker keeps its own prediction
+    cache and reloads the model, feature pipeline and prefilter when any of
+    them changes; with cascade its
+    per-stage counts are returned with each result.
+
+    Each result carries the partition's predictions plus its aggregates
+    (rows scored, frauds, amount, scoring time) for the coordinator to merge.
+    """
+    from feature_store import VelocityFeatureStore
+    from prediction_cache import PredictionCache
+    from scoring import FRAUD_THRESHOLD, batch_columns, load_model, load_vectorizer, model_files, score_batch
+
+    model = load_model(model_dir, backend, cascade)
+    vectorizer = load_vectorizer(model_dir)
+    feature_store = VelocityFeatureStore(**store_config) if vectorizer.velocity_columns else None
+    cache = PredictionCache(model_files(model_dir, backend), max_entries=cache_size) if cache_size else None
+    results.put(('ready', worker_id, None, None))
+
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+        task_id, transactions = task
+        try:
+            started = time.perf_counter()
+            if cache is not None and cache.check_model():
+                try:
+                    new_vectorizer = load_vectorizer(model_dir)
+                    model = load_model(model_dir, backend, cascade)
+                    vectorizer = new_vectorizer
+                    if vectorizer.velocity_columns and feature_store is None:
+                        feature_store = VelocityFeatureStore(**store_config)
+                except Exception as e:
+                    cache.version = None  # Not loadable yet (e.g. half written), retry at the next check
+                    print(f"⚠️ Worker {worker_id} kept the previous model: {str(e)}")
+            predictions = score_batch(model, vectorizer, transactions, feature_store, cache)
+            _, amounts, labels = batch_columns(transactions)
+            is_fraud = (predictions > FRAUD_THRESHOLD) | labels
+            aggregates = {
+                'scored': len(predictions),
+                'frauds': int(is_fraud.sum()),
+                'amount': float(amounts.sum()),
+                'seconds': time.perf_counter() - started,
+            }
+            if cascade:
+                aggregates.update({f'cascade_{key}': value for key, value in model.counts.items()})
+                model.counts = dict.fromkeys(model.counts, 0)
+            results.put((task_id, worker_id, predictions, aggregates))
+        except Exception as e:
+            results.put((task_id, worker_id, None, f"{type(e).__name__}: {str(e)}"))
+
+
+class ScoringCoordinator:
+    """
+    Fan batches out to a pool of scoring processes and merge the results.
+
+    Each batch is split by a hash of the transaction ID (or by entity when the
+    model uses velocity features) into one partition per worker. Workers load
+    the model once and score their partitions in parallel; score() returns
+    the predictions in input order, so callers can apply and commit a batch
+    exactly as with in-process scoring. Workers that exit or stop responding
+    are restarted and their outstanding partitions resent.
+    """
+
+    def __init__(self, model_dir, num_workers=None, backend='keras', store_config=None,
+                 worker_timeout=WORKER_TIMEOUT, cache_size=0, cascade=False):
+        from scoring import load_vectorizer
+
+        self.model_dir = model_dir
+        self.num_workers = num_workers or os.cpu_count() or 1
+        self.backend = backend
+        self.store_config = store_config or {}
+        self.worker_timeout = worker_timeout
+        self.cache_size = cache_size
+        self.cascade = cascade
+        self.by_entity = bool(load_vectorizer(model_dir).velocity_columns)
+
+        # Spawned workers do not inherit the parent's threads or TensorFlow state
+        self.context = multiprocessing.get_context('spawn')
+        self.results = self.context.Queue()
+        self.workers = [None] * self.num_workers
+        self.task_queues = [None] * self.num_workers
+        self.next_task = 0
+        self.deferred = []  # Results received while waiting for a worker to start
+        self.stats = {
+            'batches': 0,
+            'restarts': 0,
+            'per_worker': [
+                {'scored': 0, 'frauds': 0, 'amount': 0.0, 'seconds': 0.0} for _ in range(self.num_workers)
+            ],
+        }
+
+        # One BLAS/OpenMP thread per worker; parallelism comes from the processes
+        os.environ.setdefault('OMP_NUM_THREADS', '1')
+        os.environ.setdefault('OPENBLAS_NUM_THREADS', '1')
+        os.environ.setdefault('MKL_NUM_THREADS', '1')
+        for worker_id in range(self.num_workers):
+            self._start_worker(worker_id)
+        self._wait_ready(set(range(self.num_workers)))
+
+    def _start_worker(self, worker_id):
+        tasks = self.context.Queue()
+        process = self.context.Process(
+            target=worker_main,
+            args=(worker_id, self.model_dir, self.backend, self.store_config, tasks, self.results,
+                  self.cache_size, self.cascade),
+            name=f'scoring-worker-{worker_id}',
+            daemon=True
+        )
+        process.start()
+        self.workers[worker_id] = process
+        self.task_queues[worker_id] = tasks
+
+    def _restart_worker(self, worker_id):
+        process = self.workers[worker_id]
+        if process.is_alive():
+            process.terminate()
+        process.join(1.0)
+        # Partitions still buffered for the dead worker must not block interpreter exit
+        self.task_queues[worker_id].cancel_join_thread()
+        self.task_queues[worker_id].close()
+        print(f"⚠️ Restarting scoring worker {worker_id} (exit code {process.exitcode})")
+        self.stats['restarts'] += 1
+        self._start_worker(worker_id)
+        self._wait_ready({worker_id})
+
+    def _wait_ready(self, worker_ids):
+        """Block until the given workers have loaded the model."""
+        deadline = time.monotonic() + max(self.worker_timeout, 120)
+        while worker_ids:
+            for worker_id in worker_ids:
+                if not self.workers[worker_id].is_alive():
+                    raise RuntimeError(f"Scoring worker {worker_id} failed to start")
+            try:
+                task_id, worker_id, result, aggregates = self.results.get(timeout=0.5)
+            except queue.Empty:
+                if time.monotonic() > deadline:
+                    raise RuntimeError(f"Scoring workers {sorted(worker_ids)} did not start in time")
+                continue
+            if task_id == 'ready':
+                worker_ids.discard(worker_id)
+            else:
+                self.deferred.append((task_id, worker_id, result, aggregates))
+
+    def _next_result(self, timeout):
+        if self.deferred:
+            return self.deferred.pop(0)
+        return self.results.get(timeout=timeout)
+
+    def _send(self, worker_id, transactions):
+        task_id = self.next_task
+        self.next_task += 1
+        self.task_queues[worker_id].put((task_id, transactions))
+        return task_id
+
+    def score(self, transactions):
+        """
+        Score a batch across the worker pool.
+
+        Args:
+            transactions: List of transaction dicts (converted to records) or a RECORD_DTYPE record array
+
+        Returns:
+            np.ndarray: Fraud probability per transaction, in input order
+        """
+        predictions = np.zeros(len(transactions), dtype=np.float32)
+        if len(transactions) == 0:
+            return predictions
+        # A record array crosses the task queue as one buffer; dicts would be pickled object by object
+        if not isinstance(transactions, np.ndarray):
+            transactions = transactions_to_records(transactions)
+
+        # task_id -> (worker_id, rows, partition, attempts, sent_at)
+        pending = {}
+        for worker_id, rows in enumerate(partition_batch(transactions, self.num_workers, self.by_entity)):
+            if len(rows):
+                partition = take_rows(transactions, rows)
+                task_id = self._send(worker_id, partition)
+                pending[task_id] = (worker_id, rows, partition, 0, time.monotonic())
+
+        while pending:
+            try:
+                task_id, worker_id, result, aggregates = self._next_result(timeout=0.1)
+            except queue.Empty:
+                self._recover(pending)
+                continue
+            if task_id not in pending:
+                continue  # Late result of a resent partition, or a restarted worker's ready message
+            if result is None:
+                raise RuntimeError(f"Scoring worker {worker_id} failed: {aggregates}")
+            _, rows, _, _, _ = pending.pop(task_id)
+            predictions[rows] = result
+            merged = self.stats['per_worker'][worker_id]
+            for key, value in aggregates.items():
+                merged[key] = merged.get(key, 0) + value
+
+        self.stats['batches'] += 1
+        return predictions
+
+    def _recover(self, pending):
+        """Restart dead or hung workers and resend their outstanding partitions."""
+        now = time.monotonic()
+        failed = {
+            worker_id for worker_id, _, _, _, sent_at in pending.values()
+            if not self.workers[worker_id].is_alive() or now - sent_at > self.worker_timeout
+        }
+        for worker_id in failed:
+            self._restart_worker(worker_id)
+            for task_id in [task_id for task_id, task in pending.items() if task[0] == worker_id]:
+                _, rows, partition, attempts, _ = pending.pop(task_id)
+                if attempts >= MAX_PARTITION_RETRIES:
+                    raise RuntimeError(f"Partition of {len(rows)} transactions crashed worker {worker_id} repeatedly")
+                pending[self._send(worker_id, partition)] = (worker_id, rows, partition, attempts + 1, time.monotonic())
+
+    def get_stats(self):
+        """Batches, restarts and merged per-worker aggregates."""
+        per_worker = self.stats['per_worker']
+        return {
+            'workers': self.num_workers,
+            'alive': sum(process.is_alive() for process in self.workers),
+            'batches': self.stats['batches'],
+            'restarts': self.stats['restarts'],
+            'scored': sum(worker['scored'] for worker in per_worker),
+            'frauds': sum(worker['frauds'] for worker in per_worker),
+            'per_worker': [dict(worker) for worker in per_worker],
+        }
+
+    def close(self, timeout=5.0):
+        """Ask workers to finish, then terminate any that do not exit in time."""
+        for tasks in self.task_queues:
+            try:
+                tasks.put(None)
+            except Exception:
+                pass
+        deadline = time.monotonic() + timeout
+        for process in self.workers:
+            process.join(max(0.0, deadline - time.monotonic()))
+            if process.is_alive():
+                process.terminate()
+                process.join(1.0)
+        for tasks in self.task_queues:
+            tasks.cancel_join_thread()
+            tasks.close()
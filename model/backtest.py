@@ -0,0 +1,230 @@
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+
+import numpy as np
+
+# Get the absolute path to the project root directory
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+model_dir = os.path.join(project_root, 'model')
+
+# Serving modules: scoring (consumer), records (streaming) and their metrics
+for module_dir in ('consumer', 'monitoring', 'streaming'):
+    module_path = os.path.join(project_root, module_dir)
+    if module_path not in sys.path:
+        sys.path.insert(0, module_path)
+
+from cascade import PREFILTER_NAME, cascade_enabled
+from data_cache import LABEL_COLUMN, build_cache, file_checksum, load_cache
+from feature_store import VelocityFeatureStore
+from records import read_records, transactions_to_records
+from scoring import FRAUD_THRESHOLD, MODEL_FILES, batch_columns, batch_entities, load_model, load_vectorizer
+
+# Per-process state of the scoring pool, set by _init_worker
+_worker = {}
+
+
+def _init_worker(model_dir, backend, cache_dir, cascade=False):
+    _worker['model'] = load_model(model_dir, backend, cascade)
+    _worker['vectorizer'] = load_vectorizer(model_dir)
+    _worker['cache'] = load_cache(cache_dir) if cache_dir else None
+
+
+def _score_rows(task):
+    """Score one chunk: a (start, stop) row range of the cache, or (records, velocity) of a log."""
+    model, vectorizer = _worker['model'], _worker['vectorizer']
+    if _worker['cache'] is not None:
+        start, stop = task
+        frame = {column: array[start:stop] for column, array in _worker['cache'].items()}
+        features = vectorizer.transform_frame(frame)
+    else:
+        records, velocity = task
+        features = vectorizer.transform(records, velocity)
+    return np.asarray(model.predict_on_batch(features), dtype=np.float32).reshape(-1)
+
+
+def score_parallel(tasks, model_dir, backend, cache_dir=None, processes=None, cascade=False):
+    """Score chunks in a pool of processes that each load the model (and prefilter) once, returning scores in order."""
+    processes = processes or os.cpu_count() or 1
+    with ProcessPoolExecutor(
+        max_workers=processes,
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=_init_worker,
+        initargs=(model_dir, backend, cache_dir, cascade)
+    ) as executor:
+        results = list(executor.map(_score_rows, tasks))
+    return np.concatenate(results) if results else np.empty(0, dtype=np.float32)
+
+
+def load_log(path):
+    """Transactions of a replay log written by `producer.py --dump` (binary records or JSON lines)."""
+    with open(path, 'rb') as f:
+        first = f.read(1)
+    if first == b'{':
+        with open(path, 'r') as f:
+            return transactions_to_records([json.loads(line) for line in f if line.strip()])
+    return read_records(path)
+
+
+def scores_key(model_dir, backend, source_checksum, cascade=False):
+    """Hash of the model weights, feature pipeline, prefilter and input data the scores were computed from."""
+    digest = hashlib.sha256()
+    digest.update(source_checksum.encode('utf-8'))
+    names = (MODEL_FILES[backend], 'feature_pipeline.json')
+    if cascade:
+        digest.update(b'cascade')
+        names += (PREFILTER_NAME,)
+    for name in names:
+        path = os.path.join(model_dir, name)
+        digest.update(file_checksum(path).encode('utf-8') if os.path.exists(path) else b'-')
+    return digest.hexdigest()[:16]
+
+
+def sweep(scores, labels, thresholds):
+    """
+    Precision, recall, F1 and alert volume at every threshold in one pass.
+
+    Scores are sorted once; the alerts and true positives above each
+    threshold are then binary searches into the sorted arrays. Precision and
+    recall describe the model's decisions; served_alerts also counts the
+    labelled rows that serving alerts on regardless of the score
+    (prediction > threshold OR is_fraud).
+
+    Returns:
+        dict: Arrays keyed by metric name, one entry per threshold
+    """
+    labels = np.asarray(labels, dtype=bool)
+    thresholds = np.asarray(thresholds, dtype=np.float64)
+    all_scores = np.sort(scores)
+    fraud_scores = np.sort(scores[labels])
+
+    # Served decision is prediction > threshold
+    alerts = len(all_scores) - np.searchsorted(all_scores, thresholds, side='right')
+    true_positives = len(fraud_scores) - np.searchsorted(fraud_scores, thresholds, side='right')
+    with np.errstate(divide='ignore', invalid='ignore'):
+        precision = np.where(alerts > 0, true_positives / alerts, 1.0)
+        recall = true_positives / len(fraud_scores) if len(fraud_scores) else np.zeros(len(thresholds))
+        f1 = np.where(precision + recall > 0, 2 * precision * recall / (precision + recall), 0.0)
+    return {
+        'threshold': thresholds,
+        'precision': precision,
+        'recall': recall,
+        'f1': f1,
+        'alerts': alerts,
+        'alert_rate': alerts / len(all_scores) if len(all_scores) else np.zeros(len(thresholds)),
+        'served_alerts': alerts + len(fraud_scores) - true_positives,
+        'true_positives': true_positives,
+        'false_positives': alerts - true_positives,
+    }
+
+
+def main():
+    """Score a dataset or replay log with the served model and sweep the fraud threshold."""
+    parser = argparse.ArgumentParser(description="Backtest the served model and sweep the fraud threshold")
+    parser.add_argument('--csv', default=os.path.join(project_root, 'data', 'creditcard.csv'))
+    parser.add_argument('--log', help="Replay log from `producer.py --dump` instead of the CSV")
+    parser.add_argument('--cache-dir', default=os.path.join(project_root, 'data', 'cache'),
+                        help="Columnar .npy cache of the CSV; cached scores are kept in its scores/ directory")
+    parser.add_argument('--model-dir', default=model_dir)
+    parser.add_argument('--backend', choices=['numpy', 'keras'], default='numpy', help="Inference backend")
+    parser.add_argument('--cascade', choices=['auto', '1', '0'], default=os.getenv('CASCADE', 'auto'),
+                        help="Score through the prefilter cascade as served (default CASCADE, 'auto' when prefilter.json exists)")
+    parser.add_argument('--processes', type=int, default=0, help="Scoring processes, 0 for one per core")
+    parser.add_argument('--chunk-rows', type=int, default=65536, help="Rows per model call")
+    parser.add_argument('--thresholds', default='0.01:1.0:0.01', metavar='START:STOP:STEP',
+                        help="Threshold grid, stop excluded")
+    parser.add_argument('--rescore', action='store_true', help="Ignore cached scores")
+    parser.add_argument('--output', help="Write the sweep to a .csv or .json file")
+    args = parser.parse_args()
+
+    vectorizer = load_vectorizer(args.model_dir)
+    cascade = cascade_enabled(args.cascade, args.model_dir)
+    start_time = time.perf_counter()
+
+    # Inputs: row ranges of the memory-mapped CSV cache, or record chunks of a replay log
+    if args.log:
+        records = load_log(args.log)
+        labels = records['is_fraud'] == 1
+        source_checksum = file_checksum(args.log)
+        cache_dir = None
+    else:
+        manifest = build_cache(args.csv, args.cache_dir)
+        missing = [column for column in vectorizer.velocity_columns if column not in manifest['columns']]
+        if missing:
+            print(f"❌ Model uses velocity features missing from the cache: {missing}")
+            print("Rebuild them with train_model.py --entity-column")
+            sys.exit(1)
+        labels = load_cache(args.cache_dir)[LABEL_COLUMN] == 1
+        source_checksum = manifest['sha256'] + ','.join(manifest['columns'])
+        cache_dir = args.cache_dir
+    num_rows = len(labels)
+
+    scores_dir = os.path.join(args.cache_dir, 'scores')
+    scores_path = os.path.join(
+        scores_dir, f'{scores_key(args.model_dir, args.backend, source_checksum, cascade)}.npy'
+    )
+    if os.path.exists(scores_path) and not args.rescore:
+        scores = np.load(scores_path)
+        print(f"Using cached scores {scores_path}")
+    else:
+        bounds = [(start, min(start + args.chunk_rows, num_rows)) for start in range(0, num_rows, args.chunk_rows)]
+        if cache_dir:
+            tasks = bounds
+        else:
+            # Velocity state depends on event order, so it is replayed once here and shipped with each chunk
+            velocity = None
+            if vectorizer.velocity_columns:
+                timestamps, amounts, _ = batch_columns(records)
+                velocity = VelocityFeatureStore(max_entities=num_rows).update(
+                    batch_entities(records), timestamps, amounts
+                )
+            tasks = [
+                (np.array(records[start:stop]), None if velocity is None else velocity[start:stop])
+                for start, stop in bounds
+            ]
+        processes = args.processes or os.cpu_count() or 1
+        print(f"Scoring {num_rows:,} transactions with {processes} processes"
+              f"{', through the prefilter cascade' if cascade else ''}...")
+        scores = score_parallel(tasks, args.model_dir, args.backend, cache_dir, processes, cascade)
+        os.makedirs(scores_dir, exist_ok=True)
+        np.save(scores_path, scores)
+    score_seconds = time.perf_counter() - start_time
+
+    # Sweep the grid from the scores
+    start, stop, step = (float(value) for value in args.thresholds.split(':'))
+    thresholds = np.round(start + step * np.arange(int(round((stop - start) / step))), 6)
+    sweep_start = time.perf_counter()
+    results = sweep(scores, labels, thresholds)
+    sweep_seconds = time.perf_counter() - sweep_start
+
+    print(f"\n{num_rows:,} transactions, {int(labels.sum()):,} fraud; "
+          f"scored in {score_seconds:.2f}s, swept {len(thresholds)} thresholds in {sweep_seconds * 1000:.1f}ms")
+    best = int(np.argmax(results['f1']))
+    current = int(np.argmin(np.abs(thresholds - FRAUD_THRESHOLD)))
+    print(f"\n{'threshold':>9} {'precision':>9} {'recall':>7} {'f1':>6} {'alerts':>9} {'alert %':>8} {'served':>9}")
+    for i in range(len(thresholds)):
+        marker = ' <- current' if i == current else ' <- best F1' if i == best else ''
+        print(f"{thresholds[i]:>9.3f} {results['precision'][i]:>9.4f} {results['recall'][i]:>7.4f} "
+              f"{results['f1'][i]:>6.4f} {int(results['alerts'][i]):>9,} {results['alert_rate'][i]:>8.3%} "
+              f"{int(results['served_alerts'][i]):>9,}{marker}")
+
+    if args.output:
+        columns = list(results.keys())
+        if args.output.endswith('.json'):
+            with open(args.output, 'w') as f:
+                json.dump({column: results[column].tolist() for column in columns}, f, indent=2)
+        else:
+            with open(args.output, 'w') as f:
+                f.write(','.join(columns) + '\n')
+                for i in range(len(thresholds)):
+                    f.write(','.join(str(results[column][i]) for column in columns) + '\n')
+        print(f"\nSweep saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from feature_store import VELOCITY_FEATURES, VelocityFeatureStore
+
+# Label column, stored as int8 (ID columns passed as int_columns are int64, all others float32)
+LABEL_COLUMN = 'Class'
+
+MANIFEST_NAME = 'manifest.json'
+
+
+def file_checksum(path, block_size=4 * 1024 * 1024):
+    """SHA-256 of a file, read in blocks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def count_rows(csv_path, block_size=4 * 1024 * 1024):
+    """Number of data rows in a CSV file (lines minus the header)."""
+    lines = 0
+    last = b'\n'
+    with open(csv_path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            lines += block.count(b'\n')
+            last = block[-1:]
+    if last != b'\n':
+        lines += 1  # Last line without a trailing newline
+    return lines - 1
+
+
+def build_cache(csv_path, cache_dir, chunksize=100_000, int_columns=()):
+    """
+    Convert a CSV once into one memory-mappable .npy file per column.
+
+    The cache is rebuilt only when the source checksum changes, or when a
+    column in int_columns was not cached as int64.
+
+    Args:
+        csv_path (str): Source CSV (creditcard.csv layout)
+        cache_dir (str): Directory for the .npy columns and manifest
+        chunksize (int): CSV rows parsed per chunk, bounds peak memory
+        int_columns (list): ID columns stored as int64 (float32 is exact only up to 2^24)
+
+    Returns:
+        dict: The cache manifest
+    """
+    checksum = file_checksum(csv_path)
+    manifest_path = os.path.join(cache_dir, MANIFEST_NAME)
+    try:
+        with open(manifest_path, 'r') as f:
+            manifest = json.load(f)
+        if manifest['sha256'] == checksum and set(int_columns) <= set(manifest.get('int_columns', [])):
+            print(f"Using cached data in {cache_dir} ({manifest['rows']:,} rows)")
+            return manifest
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        print(f"Error reading cache manifest, rebuilding: {str(e)}")
+
+    print(f"Building columnar cache from {csv_path}...")
+    os.makedirs(cache_dir, exist_ok=True)
+    rows = count_rows(csv_path)
+    columns = None
+    arrays = {}
+    offset = 0
+    for chunk in pd.read_csv(csv_path, chunksize=chunksize):
+        if columns is None:
+            columns = list(chunk.columns)
+            for column in columns:
+                if column == LABEL_COLUMN:
+                    dtype = np.int8
+                elif column in int_columns:
+                    dtype = np.int64
+                else:
+                    dtype = np.float32
+                arrays[column] = np.lib.format.open_memmap(
+                    os.path.join(cache_dir, f'{column}.npy'), mode='w+', dtype=dtype, shape=(rows,)
+                )
+        for column in columns:
+            arrays[column][offset:offset + len(chunk)] = chunk[column].to_numpy()
+        offset += len(chunk)
+
+    for array in arrays.values():
+        array.flush()
+    del arrays
+
+    manifest = {
+        'source': os.path.abspath(csv_path),
+        'sha256': checksum,
+        'rows': offset,
+        'columns': columns,
+        'int_columns': sorted(column for column in int_columns if column in columns),
+    }
+    # Manifest last, so an interrupted build is never mistaken for a complete cache
+    temp_path = manifest_path + '.tmp'
+    with open(temp_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(temp_path, manifest_path)
+    print(f"Cached {offset:,} rows in {cache_dir}")
+    return manifest
+
+
+def add_velocity_columns(cache_dir, entity_column, chunk_rows=100_000):
+    """
+    Replay the cached rows through a VelocityFeatureStore in time order and
+    cache the resulting velocity features as extra columns.
+
+    Args:
+        cache_dir (str): Cache built by build_cache
+        entity_column (str): Column holding integer card/account IDs, cached as int64
+        chunk_rows (int): Rows replayed per store update
+    """
+    manifest_path = os.path.join(cache_dir, MANIFEST_NAME)
+    with open(manifest_path, 'r') as f:
+        manifest = json.load(f)
+    if manifest.get('velocity_entity_column') == entity_column:
+        return manifest
+    if entity_column not in manifest['columns']:
+        raise ValueError(f"Entity column '{entity_column}' not in dataset")
+    if entity_column not in manifest.get('int_columns', []):
+        raise ValueError(f"Entity column '{entity_column}' is not cached as int64, "
+                         f"rebuild the cache with int_columns=['{entity_column}']")
+
+    print(f"Computing velocity features by '{entity_column}'...")
+    cache = load_cache(cache_dir)
+    rows = manifest['rows']
+    order = np.argsort(cache['Time'], kind='stable')
+    columns = {
+        name: np.lib.format.open_memmap(
+            os.path.join(cache_dir, f'{name}.npy'), mode='w+', dtype=np.float32, shape=(rows,)
+        )
+        for name in VELOCITY_FEATURES
+    }
+    store = VelocityFeatureStore(max_entities=rows)
+    for start in range(0, rows, chunk_rows):
+        chunk = order[start:start + chunk_rows]
+        features = store.update(cache[entity_column][chunk], cache['Time'][chunk], cache['Amount'][chunk])
+        for i, name in enumerate(VELOCITY_FEATURES):
+            columns[name][chunk] = features[:, i]
+    for array in columns.values():
+        array.flush()
+    del columns
+
+    manifest['columns'] = [column for column in manifest['columns'] if column not in VELOCITY_FEATURES]
+    manifest['columns'] += VELOCITY_FEATURES
+    manifest['velocity_entity_column'] = entity_column
+    temp_path = manifest_path + '.tmp'
+    with open(temp_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(temp_path, manifest_path)
+    return manifest
+
+
+def load_cache(cache_dir):
+    """Memory-map all cached columns, returning {column: array}."""
+    with open(os.path.join(cache_dir, MANIFEST_NAME), 'r') as f:
+        manifest = json.load(f)
+    return {
+        column: np.load(os.path.join(cache_dir, f'{column}.npy'), mmap_mode='r')
+        for column in manifest['columns']
+    }
+
+
+def split_indices(num_rows, test_size=0.2, seed=42):
+    """Shuffled train/test row indices."""
+    indices = np.random.default_rng(seed).permutation(num_rows)
+    split = int(num_rows * (1 - test_size))
+    return np.sort(indices[:split]), np.sort(indices[split:])
+
+
+def make_dataset(cache, vectorizer, indices, batch_size=128, chunk_rows=65_536,
+                 shuffle_buffer=100_000, fraud_fraction=0.0, training=True, seed=42):
+    """
+    Stream (features, label) batches from the cache through tf.data.
+
+    Row chunks are gathered from the memory-mapped columns and vectorized by
+    parallel map calls, then shuffled and prefetched. With fraud_fraction
+    set, fraud and legitimate rows are sampled from separate repeating streams
+    so each batch holds about that share of fraud.
+
+    Args:
+        cache (dict): Columns from load_cache
+        vectorizer (FeatureVectorizer): Fitted feature pipeline
+        indices (np.ndarray): Rows to use
+        batch_size (int): Training batch size
+        chunk_rows (int): Rows gathered per reader call
+        shuffle_buffer (int): Rows in the shuffle buffer
+        fraud_fraction (float): Target share of fraud rows, 0 for the natural distribution
+        training (bool): Shuffle (and repeat when resampling); False for evaluation
+        seed (int): Shuffle and sampling seed
+
+    Returns:
+        tf.data.Dataset
+    """
+    import tensorflow as tf
+
+    num_features = vectorizer.num_features
+
+    def read_chunk(chunk_indices):
+        chunk_indices = np.sort(chunk_indices)  # Sequential access into the memory maps
+        frame = {column: array[chunk_indices] for column, array in cache.items()}
+        features = vectorizer.transform_frame(frame)
+        labels = frame[LABEL_COLUMN].astype(np.float32)
+        return features, labels
+
+    def stream(row_indices, repeat):
+        chunks = [row_indices[i:i + chunk_rows] for i in range(0, len(row_indices), chunk_rows)]
+        dataset = tf.data.Dataset.range(len(chunks))
+        if training:
+            dataset = dataset.shuffle(len(chunks), seed=seed)
+        if repeat:
+            dataset = dataset.repeat()
+        dataset = dataset.map(
+            lambda i: tf.numpy_function(lambda j: read_chunk(chunks[j]), [i], (tf.float32, tf.float32)),
+            num_parallel_calls=tf.data.AUTOTUNE,
+            deterministic=not training
+        )
+        dataset = dataset.map(
+            lambda x, y: (tf.ensure_shape(x, [None, num_features]), tf.ensure_shape(y, [None]))
+        ).unbatch()
+        if training:
+            dataset = dataset.shuffle(shuffle_buffer, seed=seed)
+        return dataset
+
+    if training and fraud_fraction > 0:
+        labels = cache[LABEL_COLUMN][indices]
+        fraud = stream(indices[labels == 1], repeat=True)
+        legit = stream(indices[labels == 0], repeat=True)
+        dataset = tf.data.Dataset.sample_from_datasets(
+            [legit, fraud], weights=[1 - fraud_fraction, fraud_fraction], seed=seed
+        )
+    else:
+        dataset = stream(indices, repeat=False)
+
+    return dataset.batch(batch_size).prefetch(tf.data.AUTOTUNE)
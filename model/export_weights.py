@@ -0,0 +1,117 @@
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+from numpy_model import NumpyModel, export_weights
+
+# Get the absolute path to the project root directory
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+BENCHMARK_BATCH_SIZES = [1, 32, 512, 4096]
+
+
+def current_rss_mb():
+    """Return the resident set size of this process in MB."""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    # ru_maxrss is the peak, in KB on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def time_predict(model, features, repeats):
+    """Return the mean latency in milliseconds of one predict_on_batch call."""
+    model.predict_on_batch(features)  # Warm-up
+    start = time.perf_counter()
+    for _ in range(repeats):
+        model.predict_on_batch(features)
+    return (time.perf_counter() - start) / repeats * 1000
+
+
+def numpy_only_rss(npz_path):
+    """Measure the RSS of a fresh interpreter that only loads the NumPy engine."""
+    import subprocess
+    script = (
+        "import sys; sys.path.insert(0, sys.argv[1]);"
+        "from numpy_model import NumpyModel; from export_weights import current_rss_mb;"
+        "NumpyModel.load(sys.argv[2]); print(current_rss_mb())"
+    )
+    model_dir = os.path.dirname(os.path.abspath(__file__))
+    try:
+        output = subprocess.run(
+            [sys.executable, '-c', script, model_dir, npz_path],
+            capture_output=True, text=True, check=True
+        ).stdout
+        return float(output.strip().splitlines()[-1])
+    except Exception as e:
+        print(f"Error measuring NumPy engine memory: {str(e)}")
+        return float('nan')
+
+
+def main():
+    """Export fraud_model.h5 to .npz and compare the NumPy engine against Keras."""
+    parser = argparse.ArgumentParser(description="Export the fraud model for NumPy inference")
+    parser.add_argument('--model', default=os.path.join(project_root, 'model', 'fraud_model.h5'))
+    parser.add_argument('--output', default=os.path.join(project_root, 'model', 'fraud_model.npz'))
+    parser.add_argument('--samples', type=int, default=10000, help="Rows used for the parity check")
+    parser.add_argument('--tolerance', type=float, default=1e-5, help="Max allowed absolute difference")
+    parser.add_argument('--repeats', type=int, default=50, help="Timed calls per batch size")
+    args = parser.parse_args()
+
+    baseline_rss = current_rss_mb()
+
+    # Import TensorFlow lazily so its load cost can be measured
+    start = time.perf_counter()
+    import tensorflow as tf
+    keras_model = tf.keras.models.load_model(args.model)
+    keras_load = time.perf_counter() - start
+    keras_rss = current_rss_mb() - baseline_rss
+
+    export_weights(keras_model, args.output)
+    print(f"Weights exported to {args.output} ({os.path.getsize(args.output) / 1024:.1f} KB)")
+
+    # Cold start of the NumPy engine (its RSS is measured in a fresh process below)
+    start = time.perf_counter()
+    numpy_model = NumpyModel.load(args.output)
+    numpy_load = time.perf_counter() - start
+
+    # Parity check against Keras outputs
+    rng = np.random.default_rng(42)
+    features = rng.standard_normal((args.samples, numpy_model.input_dim)).astype(np.float32)
+    features[:, 0] = rng.integers(0, 24, args.samples)  # Hour
+    features[:, 1] = rng.uniform(0, 5000, args.samples)  # Amount
+    expected = keras_model.predict_on_batch(features).reshape(-1)
+    actual = numpy_model.predict_on_batch(features).reshape(-1)
+    max_diff = float(np.max(np.abs(expected - actual)))
+    print(f"Parity: max abs difference {max_diff:.2e} over {args.samples} rows")
+
+    # Latency comparison
+    print(f"\n{'batch':>8} {'keras ms':>10} {'numpy ms':>10} {'speedup':>8}")
+    for batch_size in BENCHMARK_BATCH_SIZES:
+        batch = features[:batch_size]
+        keras_ms = time_predict(keras_model, batch, args.repeats)
+        numpy_ms = time_predict(numpy_model, batch, args.repeats)
+        print(f"{batch_size:>8} {keras_ms:>10.3f} {numpy_ms:>10.3f} {keras_ms / numpy_ms:>7.1f}x")
+
+    # Memory and cold start comparison
+    numpy_rss = numpy_only_rss(args.output)
+    print(f"\nKeras: load {keras_load:.2f}s, +{keras_rss:.0f} MB RSS")
+    print(f"NumPy: load {numpy_load * 1000:.1f}ms, {numpy_rss:.0f} MB total process RSS")
+
+    if max_diff > args.tolerance:
+        print(f"❌ Parity check failed: {max_diff:.2e} > {args.tolerance:.0e}")
+        sys.exit(1)
+    print("✅ Parity check passed")
+
+
+if __name__ == "__main__":
+    main()
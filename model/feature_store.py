@@ -0,0 +1,223 @@
+import numpy as np
+
+# Velocity windows and the features computed for each, in model column order
+VELOCITY_WINDOWS = ['1m', '10m', '1h']
+VELOCITY_FEATURES = [
+    f'{aggregate}_{window}' for window in VELOCITY_WINDOWS for aggregate in ('count', 'sum', 'max')
+]
+
+# Per-entity ring buckets: 10 x 1 minute (1m and 10m windows), 6 x 10 minutes (1h window)
+FINE_BUCKETS = 10
+COARSE_BUCKETS = 6
+COARSE_MINUTES = 10
+
+# Entity ID 0 means "unknown" and is never stored
+UNKNOWN_ENTITY = 0
+
+# count (uint32) + sum + max (float32) per bucket, last minute (int32) and key (int64) per entity
+BYTES_PER_ENTITY = (FINE_BUCKETS + COARSE_BUCKETS) * 12 + 4 + 8
+
+
+class VelocityFeatureStore:
+    """
+    Sliding-window count/sum/max of transaction amounts per entity (card or account).
+
+    State lives in fixed-size NumPy arrays indexed by slot; a dict maps entity
+    IDs to slots and never holds more than `capacity` keys. Buckets are cleared
+    lazily as an entity's clock advances, so updates are O(1) amortized and
+    vectorized over a batch. Entities idle for longer than `ttl` seconds are
+    evicted, and when the store is full the least recently seen 1% is evicted.
+
+    Window granularity is one minute for 1m/10m and ten minutes for 1h.
+    """
+
+    def __init__(self, max_entities=1_000_000, ttl=3600, max_bytes=None):
+        capacity = max_entities
+        if max_bytes:
+            capacity = min(capacity, max_bytes // BYTES_PER_ENTITY)
+        self.capacity = int(capacity)
+        self.ttl_minutes = int(ttl // 60)
+
+        self.fine_count = np.zeros((self.capacity, FINE_BUCKETS), dtype=np.uint32)
+        self.fine_sum = np.zeros((self.capacity, FINE_BUCKETS), dtype=np.float32)
+        self.fine_max = np.zeros((self.capacity, FINE_BUCKETS), dtype=np.float32)
+        self.coarse_count = np.zeros((self.capacity, COARSE_BUCKETS), dtype=np.uint32)
+        self.coarse_sum = np.zeros((self.capacity, COARSE_BUCKETS), dtype=np.float32)
+        self.coarse_max = np.zeros((self.capacity, COARSE_BUCKETS), dtype=np.float32)
+        self.last_minute = np.zeros(self.capacity, dtype=np.int32)
+        self.slot_keys = np.full(self.capacity, UNKNOWN_ENTITY, dtype=np.int64)
+
+        self.slots = {}
+        self.free_slots = list(range(self.capacity - 1, -1, -1))
+        self.last_sweep = None
+        self.evicted = 0
+
+    def _evict(self, slots):
+        for slot in slots.tolist():
+            del self.slots[int(self.slot_keys[slot])]
+        self.slot_keys[slots] = UNKNOWN_ENTITY
+        self.free_slots.extend(slots.tolist())
+        self.evicted += len(slots)
+
+    def expire(self, now_minute):
+        """Evict entities not seen for more than the TTL."""
+        expired = np.flatnonzero(
+            (self.slot_keys != UNKNOWN_ENTITY) & (self.last_minute < now_minute - self.ttl_minutes)
+        )
+        if len(expired):
+            self._evict(expired)
+
+    def _make_room(self, now_minute, needed, protected):
+        """Free at least `needed` slots without evicting the entities in `protected`."""
+        self.expire(now_minute)
+        shortfall = needed - len(self.free_slots)
+        if shortfall > 0:
+            # Still full: evict the least recently seen 1% (or the shortfall, if larger)
+            used = np.flatnonzero(
+                (self.slot_keys != UNKNOWN_ENTITY) & ~np.isin(self.slot_keys, protected)
+            )
+            count = min(max(shortfall, self.capacity // 100, 1), len(used))
+            if count:
+                self._evict(used[np.argpartition(self.last_minute[used], count - 1)[:count]])
+
+    def _lookup(self, entities, minutes):
+        """
+        Slot per row, allocating slots for new entities (-1 for unknown entities).
+
+        Room for all of the batch's new entities is made before any slot is
+        assigned, so an eviction never takes a slot given to an earlier row of
+        the same batch. Should a batch hold more new entities than the store
+        can fit, the rest are treated as unknown.
+        """
+        batch_entities = np.unique(entities[entities != UNKNOWN_ENTITY])
+        new_entities = [entity for entity in batch_entities.tolist() if entity not in self.slots]
+        if len(new_entities) > len(self.free_slots):
+            self._make_room(int(minutes.max()), len(new_entities), batch_entities)
+
+        slots = np.full(len(entities), -1, dtype=np.int64)
+        for i, entity in enumerate(entities.tolist()):
+            if entity == UNKNOWN_ENTITY:
+                continue
+            slot = self.slots.get(entity)
+            if slot is None:
+                if not self.free_slots:
+                    continue
+                slot = self.free_slots.pop()
+                self.slots[entity] = slot
+                self.slot_keys[slot] = entity
+                self.last_minute[slot] = minutes[i]
+                self.fine_count[slot] = 0
+                self.fine_sum[slot] = 0
+                self.fine_max[slot] = 0
+                self.coarse_count[slot] = 0
+                self.coarse_sum[slot] = 0
+                self.coarse_max[slot] = 0
+            slots[i] = slot
+        return slots
+
+    def _step(self, slots, minutes, amounts, out):
+        """Advance, query and update a set of distinct slots."""
+        last = self.last_minute[slots].astype(np.int64)
+        new_last = np.maximum(last, minutes)
+
+        # Clear buckets that fell out of the window since each entity's last event
+        fine = np.arange(FINE_BUCKETS)
+        held = last[:, None] - ((last[:, None] - fine) % FINE_BUCKETS)
+        stale = held <= new_last[:, None] - FINE_BUCKETS
+        self.fine_count[slots] = np.where(stale, 0, self.fine_count[slots])
+        self.fine_sum[slots] = np.where(stale, 0, self.fine_sum[slots])
+        self.fine_max[slots] = np.where(stale, 0, self.fine_max[slots])
+
+        coarse = np.arange(COARSE_BUCKETS)
+        last_tens = last // COARSE_MINUTES
+        new_tens = new_last // COARSE_MINUTES
+        held = last_tens[:, None] - ((last_tens[:, None] - coarse) % COARSE_BUCKETS)
+        stale = held <= new_tens[:, None] - COARSE_BUCKETS
+        self.coarse_count[slots] = np.where(stale, 0, self.coarse_count[slots])
+        self.coarse_sum[slots] = np.where(stale, 0, self.coarse_sum[slots])
+        self.coarse_max[slots] = np.where(stale, 0, self.coarse_max[slots])
+
+        # Activity before this event
+        fine_bucket = minutes % FINE_BUCKETS
+        in_fine = minutes > new_last - FINE_BUCKETS
+        tens = minutes // COARSE_MINUTES
+        coarse_bucket = tens % COARSE_BUCKETS
+        in_coarse = tens > new_tens - COARSE_BUCKETS
+
+        out[:, 0] = np.where(in_fine, self.fine_count[slots, fine_bucket], 0)
+        out[:, 1] = np.where(in_fine, self.fine_sum[slots, fine_bucket], 0)
+        out[:, 2] = np.where(in_fine, self.fine_max[slots, fine_bucket], 0)
+        out[:, 3] = self.fine_count[slots].sum(axis=1)
+        out[:, 4] = self.fine_sum[slots].sum(axis=1)
+        out[:, 5] = self.fine_max[slots].max(axis=1)
+        out[:, 6] = self.coarse_count[slots].sum(axis=1)
+        out[:, 7] = self.coarse_sum[slots].sum(axis=1)
+        out[:, 8] = self.coarse_max[slots].max(axis=1)
+
+        # Add this event (late events outside the window are only counted where they still fit)
+        s, b, a = slots[in_fine], fine_bucket[in_fine], amounts[in_fine]
+        self.fine_count[s, b] += 1
+        self.fine_sum[s, b] += a
+        self.fine_max[s, b] = np.maximum(self.fine_max[s, b], a)
+        s, b, a = slots[in_coarse], coarse_bucket[in_coarse], amounts[in_coarse]
+        self.coarse_count[s, b] += 1
+        self.coarse_sum[s, b] += a
+        self.coarse_max[s, b] = np.maximum(self.coarse_max[s, b], a)
+
+        self.last_minute[slots] = new_last
+
+    def update(self, entities, timestamps, amounts):
+        """
+        Record a batch of transactions and return each one's velocity features.
+
+        Features describe the entity's activity before the transaction, in
+        VELOCITY_FEATURES order. Rows must be in event order per entity.
+
+        Args:
+            entities (np.ndarray): Integer entity IDs (0 for unknown)
+            timestamps (np.ndarray): Event times in seconds
+            amounts (np.ndarray): Transaction amounts
+
+        Returns:
+            np.ndarray: (n, len(VELOCITY_FEATURES)) float32
+        """
+        entities = np.asarray(entities, dtype=np.int64)
+        minutes = (np.asarray(timestamps) // 60).astype(np.int64)
+        amounts = np.asarray(amounts, dtype=np.float32)
+        features = np.zeros((len(entities), len(VELOCITY_FEATURES)), dtype=np.float32)
+        if len(entities) == 0:
+            return features
+
+        now_minute = int(minutes.max())
+        if self.last_sweep is None or now_minute > self.last_sweep:
+            self.expire(now_minute)
+            self.last_sweep = now_minute
+
+        slots = self._lookup(entities, minutes)
+        rows = np.flatnonzero(slots >= 0)
+        if len(rows) == 0:
+            return features
+
+        # Occurrence rank of each row within its entity; rank r rows are processed
+        # together in round r, so every round touches distinct slots
+        order = rows[np.argsort(slots[rows], kind='stable')]
+        sorted_slots = slots[order]
+        group_start = np.r_[0, np.flatnonzero(np.diff(sorted_slots)) + 1]
+        group_sizes = np.diff(np.r_[group_start, len(order)])
+        ranks = np.arange(len(order)) - np.repeat(group_start, group_sizes)
+
+        for rank in range(int(ranks.max()) + 1):
+            batch = order[ranks == rank]
+            out = np.empty((len(batch), len(VELOCITY_FEATURES)), dtype=np.float32)
+            self._step(slots[batch], minutes[batch], amounts[batch], out)
+            features[batch] = out
+        return features
+
+    def get_stats(self):
+        """Entity count, capacity, evictions and state size."""
+        return {
+            'entities': len(self.slots),
+            'capacity': self.capacity,
+            'evicted': self.evicted,
+            'state_bytes': self.capacity * BYTES_PER_ENTITY,
+        }
@@ -0,0 +1,142 @@
+import json
+from datetime import datetime
+
+import numpy as np
+
+from feature_store import VELOCITY_FEATURES
+
+V_COLUMNS = [f'V{i+1}' for i in range(28)]
+
+# Model input columns, in order
+FEATURE_COLUMNS = ['Hour', 'Amount'] + V_COLUMNS
+
+# Columns standardized with the training mean and standard deviation
+SCALED_COLUMNS = ['Amount'] + VELOCITY_FEATURES
+
+
+def local_hours(timestamp_us):
+    """Vectorized local hour of day for epoch-microsecond timestamps."""
+    if len(timestamp_us) == 0:
+        return np.empty(0, dtype=np.float32)
+    # One UTC offset per batch, taken from its first record
+    first = datetime.fromtimestamp(int(timestamp_us[0]) / 1_000_000).astimezone()
+    offset_us = int(first.utcoffset().total_seconds() * 1_000_000)
+    return ((timestamp_us + offset_us) // 3_600_000_000 % 24).astype(np.float32)
+
+
+class FeatureVectorizer:
+    """
+    Feature pipeline shared by training and serving.
+
+    Fitted on the training frame and saved next to the model, so serving
+    applies exactly the column order, scaling and missing-feature defaults
+    the model was trained with.
+
+    Models trained with per-entity velocity features list VELOCITY_FEATURES
+    after the base columns; their values come from a VelocityFeatureStore.
+    """
+
+    def __init__(self, columns=None, mean=None, scale=None, defaults=None):
+        self.columns = list(columns or FEATURE_COLUMNS)
+        self.velocity_columns = self.columns[len(FEATURE_COLUMNS):]
+        if self.columns[:len(FEATURE_COLUMNS)] != FEATURE_COLUMNS or any(
+                column not in VELOCITY_FEATURES for column in self.velocity_columns):
+            raise ValueError(f"Unsupported feature columns: {self.columns}")
+        n = len(self.columns)
+        # Unfitted vectorizers pass raw values through
+        self.mean = np.zeros(n, dtype=np.float32) if mean is None else np.asarray(mean, dtype=np.float32)
+        self.scale = np.ones(n, dtype=np.float32) if scale is None else np.asarray(scale, dtype=np.float32)
+        self.defaults = np.zeros(n, dtype=np.float32) if defaults is None else np.asarray(defaults, dtype=np.float32)
+
+    @property
+    def num_features(self):
+        return len(self.columns)
+
+    def _raw_column(self, frame, column):
+        if column == 'Hour':
+            return (np.asarray(frame['Time']) // 3600) % 24  # Hour of day, as served
+        return np.asarray(frame[column])
+
+    def raw_frame_matrix(self, frame):
+        """
+        Unscaled (n, num_features) float32 matrix in creditcard.csv layout.
+
+        Args:
+            frame: DataFrame or mapping of column name to array (e.g. a memory-mapped cache)
+        """
+        matrix = np.empty((len(frame['Time']), self.num_features), dtype=np.float32)
+        for i, column in enumerate(self.columns):
+            matrix[:, i] = self._raw_column(frame, column)
+        return matrix
+
+    def fit(self, frame):
+        """Fit scaling parameters and defaults one column at a time."""
+        n = self.num_features
+        self.defaults = np.zeros(n, dtype=np.float32)
+        self.mean = np.zeros(n, dtype=np.float32)
+        self.scale = np.ones(n, dtype=np.float32)
+        for i, column in enumerate(self.columns):
+            values = self._raw_column(frame, column)
+            self.defaults[i] = values.mean(dtype=np.float64)
+            if column in SCALED_COLUMNS:
+                std = values.std(dtype=np.float64)
+                self.mean[i] = self.defaults[i]
+                self.scale[i] = std if std > 0 else 1.0
+        return self
+
+    def transform_frame(self, frame):
+        """Scaled feature matrix for a frame in creditcard.csv layout."""
+        return self._scale(self.raw_frame_matrix(frame))
+
+    def transform(self, transactions, velocity=None):
+        """
+        Scaled float32 feature matrix for a batch of transactions.
+
+        Args:
+            transactions: List of transaction dicts or a RECORD_DTYPE record array
+            velocity (np.ndarray): (n, len(VELOCITY_FEATURES)) store output, required
+                when the model uses velocity features
+
+        Returns:
+            np.ndarray: (n, num_features) float32 matrix
+        """
+        base = len(FEATURE_COLUMNS)
+        matrix = np.empty((len(transactions), self.num_features), dtype=np.float32)
+        if isinstance(transactions, np.ndarray):
+            matrix[:, 0] = local_hours(transactions['timestamp_us'])
+            matrix[:, 1] = transactions['amount']
+            matrix[:, 2:base] = transactions['features']
+        elif len(transactions):
+            defaults = self.defaults[2:base].tolist()
+            matrix[:, :base] = [
+                [float(transaction['timestamp'][11:13]), transaction['amount']]
+                + [transaction['features'].get(name, default) for name, default in zip(V_COLUMNS, defaults)]
+                for transaction in transactions
+            ]
+        if self.velocity_columns:
+            if velocity is None:
+                raise ValueError("Model uses velocity features but no feature store output was given")
+            matrix[:, base:] = velocity[:, [VELOCITY_FEATURES.index(column) for column in self.velocity_columns]]
+        return self._scale(matrix)
+
+    def _scale(self, matrix):
+        matrix -= self.mean
+        matrix /= self.scale
+        return matrix
+
+    def save(self, path):
+        """Save the fitted pipeline as JSON."""
+        with open(path, 'w') as f:
+            json.dump({
+                'columns': self.columns,
+                'mean': self.mean.tolist(),
+                'scale': self.scale.tolist(),
+                'defaults': self.defaults.tolist(),
+            }, f, indent=2)
+
+    @classmethod
+    def load(cls, path):
+        """Load a pipeline saved by save()."""
+        with open(path, 'r') as f:
+            config = json.load(f)
+        return cls(config['columns'], config['mean'], config['scale'], config['defaults'])
@@ -0,0 +1,82 @@
+import numpy as np
+
+
+def _relu(x):
+    return np.maximum(x, 0, out=x)
+
+
+def _sigmoid(x):
+    # exp overflow for large negative logits correctly saturates to 0
+    with np.errstate(over='ignore'):
+        np.negative(x, out=x)
+        np.exp(x, out=x)
+        x += 1
+        return np.reciprocal(x, out=x)
+
+
+def _linear(x):
+    return x
+
+
+ACTIVATIONS = {
+    'relu': _relu,
+    'sigmoid': _sigmoid,
+    'linear': _linear,
+}
+
+
+def export_weights(keras_model, path):
+    """
+    Export the Dense layers of a Keras model to a compact .npz file.
+
+    Layers without weights (Dropout) are inference no-ops and are skipped.
+
+    Args:
+        keras_model: Trained Keras Sequential model of Dense/Dropout layers
+        path (str): Destination .npz file
+    """
+    arrays = {}
+    dense_layers = [layer for layer in keras_model.layers if layer.get_weights()]
+    for i, layer in enumerate(dense_layers):
+        activation = layer.get_config()['activation']
+        if activation not in ACTIVATIONS:
+            raise ValueError(f"Unsupported activation '{activation}' in layer {layer.name}")
+        kernel, bias = layer.get_weights()
+        arrays[f'kernel_{i}'] = kernel.astype(np.float32)
+        arrays[f'bias_{i}'] = bias.astype(np.float32)
+        arrays[f'activation_{i}'] = np.array(activation)
+    np.savez_compressed(path, num_layers=np.array(len(dense_layers)), **arrays)
+
+
+class NumpyModel:
+    """Float32 NumPy forward pass over weights exported by export_weights."""
+
+    def __init__(self, layers):
+        self.layers = layers
+        self.input_dim = layers[0][0].shape[0]
+
+    @classmethod
+    def load(cls, path):
+        """Load a model from an exported .npz file."""
+        with np.load(path) as data:
+            layers = []
+            for i in range(int(data['num_layers'])):
+                layers.append((
+                    np.ascontiguousarray(data[f'kernel_{i}'], dtype=np.float32),
+                    np.ascontiguousarray(data[f'bias_{i}'], dtype=np.float32),
+                    ACTIVATIONS[str(data[f'activation_{i}'])],
+                ))
+        return cls(layers)
+
+    def predict_on_batch(self, x):
+        """Score a (n, input_dim) batch, returning (n, 1) probabilities."""
+        x = np.asarray(x, dtype=np.float32)
+        for kernel, bias, activation in self.layers:
+            x = x @ kernel
+            x += bias
+            x = activation(x)
+        return x
+
+    def predict(self, x, verbose=0, batch_size=None):
+        """Keras-compatible alias of predict_on_batch."""
+        return self.predict_on_batch(x)
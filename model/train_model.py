@@ -1,50 +1,153 @@
-import pandas as pd
 import numpy as np
-from sklearn.preprocessing import StandardScaler
-from sklearn.model_selection import train_test_split
 import tensorflow as tf
 from tensorflow.keras.models import Sequential
 from tensorflow.keras.layers import Dense, Dropout
+import argparse
 import os
 
-# Create model directory if it doesn't exist
-os.makedirs('model', exist_ok=True)
+from data_cache import LABEL_COLUMN, add_velocity_columns, build_cache, load_cache, make_dataset, split_indices
+from feature_store import VELOCITY_FEATURES
+from features import FEATURE_COLUMNS, FeatureVectorizer
+from numpy_model import export_weights
+from prefilter import TARGET_RECALL, Prefilter
 
-# Load the dataset
-print("Loading dataset...")
-data = pd.read_csv("data/creditcard.csv")  # Changed path
+# Get the absolute path to the project root directory
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+model_dir = os.path.join(project_root, 'model')
 
-# Preprocess the data
-X = data.drop(['Class'], axis=1)  # Drop the target column 'Class'
-y = data['Class']  # 'Class' column is the target label
+def build_model(input_dim):
+    """Build the neural network model."""
+    model = Sequential([
+        Dense(64, input_dim=input_dim, activation='relu'),
+        Dropout(0.5),
+        Dense(32, activation='relu'),
+        Dense(1, activation='sigmoid')  # Output layer for binary classification (fraud/legit)
+    ])
+    model.compile(optimizer='adam', loss='binary_crossentropy', metrics=['accuracy'])
+    return model
 
-# Normalize 'Amount' feature
-scaler = StandardScaler()
-X['Amount'] = scaler.fit_transform(X[['Amount']])
+def feature_matrix(cache, vectorizer, indices, chunk_rows):
+    """Scaled serving features of the given rows, gathered chunk by chunk from the cache."""
+    features = np.empty((len(indices), vectorizer.num_features), dtype=np.float32)
+    for start in range(0, len(indices), chunk_rows):
+        rows = indices[start:start + chunk_rows]
+        features[start:start + len(rows)] = vectorizer.transform_frame(
+            {column: array[rows] for column, array in cache.items()}
+        )
+    return features
 
-# Split data into training and testing sets
-X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+def train_prefilter(model, cache, vectorizer, train_indices, test_indices, chunk_rows, target_recall, threshold):
+    """
+    Fit and calibrate the cascade's first stage, then compare the cascade with the full model on the test set.
 
-print("Building model...")
-# Build the neural network model
-model = Sequential([
-    Dense(64, input_dim=X_train.shape[1], activation='relu'),
-    Dropout(0.5),
-    Dense(32, activation='relu'),
-    Dense(1, activation='sigmoid')  # Output layer for binary classification (fraud/legit)
-])
+    Returns:
+        Prefilter: Calibrated prefilter
+    """
+    train_features = feature_matrix(cache, vectorizer, train_indices, chunk_rows)
+    train_labels = cache[LABEL_COLUMN][train_indices] == 1
+    prefilter = Prefilter.fit(train_features, train_labels, vectorizer.columns)
+    indices = prefilter.indices(vectorizer.columns)
+    prefilter.calibrate(prefilter.predict(train_features, indices), train_labels, target_recall)
+    del train_features
+    
+    # Test set: stage-one decisions plus full-model scores for the uncertain band, as served
+    test_features = feature_matrix(cache, vectorizer, test_indices, chunk_rows)
+    test_labels = cache[LABEL_COLUMN][test_indices] == 1
+    scores = prefilter.predict(test_features, indices)
+    full = model.predict(test_features, batch_size=4096, verbose=0).reshape(-1)
+    cleared, uncertain, decided_fraud = prefilter.band(scores)
+    cleared &= scores <= threshold
+    decided_fraud &= scores > threshold
+    uncertain = ~(cleared | decided_fraud)
+    cascade = np.where(uncertain, full, scores)
+    
+    full_flagged = full > threshold
+    cascade_flagged = cascade > threshold
+    print(f"Prefilter band: low={prefilter.low:.6f}, high={prefilter.high:.6f}")
+    print(f"Prefilter pass rate: {1 - cleared.mean():.2%} "
+          f"(full model scores {uncertain.mean():.2%} of rows, {decided_fraud.mean():.3%} decided fraud)")
+    if test_labels.any():
+        print(f"Recall vs labels: full model {full_flagged[test_labels].mean():.4f}, "
+              f"cascade {cascade_flagged[test_labels].mean():.4f}")
+    if full_flagged.any():
+        print(f"Recall vs full model: {(cascade_flagged & full_flagged).sum() / full_flagged.sum():.4f}")
+    return prefilter
 
-# Compile the model
-model.compile(optimizer='adam', loss='binary_crossentropy', metrics=['accuracy'])
+def main():
+    """Train the fraud model from the cached dataset and save it with its feature pipeline."""
+    parser = argparse.ArgumentParser(description="Train the fraud detection model")
+    parser.add_argument('--csv', default=os.path.join(project_root, 'data', 'creditcard.csv'))
+    parser.add_argument('--cache-dir', default=os.path.join(project_root, 'data', 'cache'),
+                        help="Columnar .npy cache, rebuilt when the CSV checksum changes")
+    parser.add_argument('--epochs', type=int, default=10)
+    parser.add_argument('--batch-size', type=int, default=128)
+    parser.add_argument('--chunk-rows', type=int, default=65536, help="Rows read from the cache per chunk")
+    parser.add_argument('--fraud-fraction', type=float, default=0.0,
+                        help="Resample training batches to this share of fraud, 0 keeps the natural distribution")
+    parser.add_argument('--prefilter-recall', type=float, default=TARGET_RECALL,
+                        help="Share of training fraud the cascade prefilter must pass to the full model")
+    parser.add_argument('--threshold', type=float, default=0.3, help="Serving fraud threshold (FRAUD_THRESHOLD)")
+    parser.add_argument('--entity-column',
+                        help="Card/account ID column; adds per-entity velocity features when the dataset has one")
+    args = parser.parse_args()
+    
+    # Create model directory if it doesn't exist
+    os.makedirs(model_dir, exist_ok=True)
+    
+    # Convert the CSV once, then memory-map it on every run
+    print("Loading dataset...")
+    # Entity IDs stay int64 so cards above 2^24 keep separate velocity state
+    manifest = build_cache(args.csv, args.cache_dir,
+                           int_columns=[args.entity_column] if args.entity_column else ())
+    columns = FEATURE_COLUMNS
+    if args.entity_column:
+        manifest = add_velocity_columns(args.cache_dir, args.entity_column)
+        columns = FEATURE_COLUMNS + VELOCITY_FEATURES
+    cache = load_cache(args.cache_dir)
+    
+    # Fit the feature pipeline used for serving
+    # (hour of day from 'Time', standardized 'Amount', V1-V28, optional velocity features)
+    vectorizer = FeatureVectorizer(columns).fit(cache)
+    
+    # Split data into training and testing sets
+    train_indices, test_indices = split_indices(manifest['rows'], test_size=0.2, seed=42)
+    train_ds = make_dataset(cache, vectorizer, train_indices, args.batch_size, args.chunk_rows,
+                            fraud_fraction=args.fraud_fraction, training=True)
+    test_ds = make_dataset(cache, vectorizer, test_indices, args.batch_size, args.chunk_rows, training=False)
+    
+    # Resampled streams repeat forever, so an epoch is one pass worth of batches
+    steps_per_epoch = None
+    if args.fraud_fraction > 0:
+        steps_per_epoch = int(np.ceil(len(train_indices) / args.batch_size))
+    
+    print("Building model...")
+    model = build_model(vectorizer.num_features)
+    
+    print("Training model...")
+    model.fit(train_ds, epochs=args.epochs, steps_per_epoch=steps_per_epoch, validation_data=test_ds)
+    
+    # Evaluate the model
+    loss, accuracy = model.evaluate(test_ds)
+    print(f"Test Accuracy: {accuracy:.4f}")
+    
+    # Save the trained model
+    model.save(os.path.join(model_dir, 'fraud_model.h5'))
+    print("Model saved as 'fraud_model.h5'")
+    
+    # Save the fitted feature pipeline next to the model
+    vectorizer.save(os.path.join(model_dir, 'feature_pipeline.json'))
+    print("Feature pipeline saved as 'feature_pipeline.json'")
+    
+    # Export weights for the TensorFlow-free NumPy inference engine
+    export_weights(model, os.path.join(model_dir, 'fraud_model.npz'))
+    print("Weights exported as 'fraud_model.npz'")
+    
+    # Cheap first stage of two-stage scoring
+    print("Training prefilter...")
+    prefilter = train_prefilter(model, cache, vectorizer, train_indices, test_indices, args.chunk_rows,
+                                args.prefilter_recall, args.threshold)
+    prefilter.save(os.path.join(model_dir, 'prefilter.json'))
+    print("Prefilter saved as 'prefilter.json'")
 
-print("Training model...")
-# Train the model
-model.fit(X_train, y_train, epochs=10, batch_size=128, validation_data=(X_test, y_test))
-
-# Evaluate the model
-loss, accuracy = model.evaluate(X_test, y_test)
-print(f"Test Accuracy: {accuracy:.4f}")
-
-# Save the trained model
-model.save('model/fraud_model.h5')
-print("Model saved as 'fraud_model.h5'") 
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,255 @@
+import bisect
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Stage latency buckets in seconds: 10µs to 10s, roughly x2.5 apart
+LATENCY_BUCKETS = (
+    0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+    0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{value}"' for key, value in labels.items()) + '}'
+
+
+class Counter:
+    """Monotonic counter."""
+
+    kind = 'counter'
+
+    def __init__(self, name, help_text, labels=None):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels or {}
+        self.value = 0
+        self.lock = threading.Lock()
+
+    def inc(self, n=1):
+        with self.lock:
+            self.value += n
+
+    def samples(self):
+        return [(self.name, self.labels, self.value)]
+
+
+class Gauge:
+    """Current value, either set by the caller or read from `function` at scrape time."""
+
+    kind = 'gauge'
+
+    def __init__(self, name, help_text, labels=None, function=None):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels or {}
+        self.function = function
+        self.value = 0
+
+    def set(self, value):
+        self.value = value
+
+    def get(self):
+        if self.function is None:
+            return self.value
+        try:
+            return self.function()
+        except Exception:
+            return float('nan')
+
+    def samples(self):
+        return [(self.name, self.labels, self.get())]
+
+
+class Histogram:
+    """
+    Fixed-bucket histogram.
+
+    observe() is a bisect over the bucket bounds and three additions, so
+    recording once per batch costs well under a microsecond per event.
+    """
+
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, buckets=LATENCY_BUCKETS, labels=None):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels or {}
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # Last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    def time(self):
+        """Context manager observing the elapsed seconds of its block."""
+        return _Timer(self)
+
+    def quantile(self, q):
+        """Estimate a quantile by linear interpolation within its bucket."""
+        with self.lock:
+            counts = list(self.counts)
+            total = self.count
+        if total == 0:
+            return 0.0
+        rank = q * total
+        cumulative = 0
+        for index, count in enumerate(counts):
+            if cumulative + count >= rank and count:
+                lower = self.buckets[index - 1] if index > 0 else 0.0
+                upper = self.buckets[index] if index < len(self.buckets) else self.buckets[-1]
+                return lower + (upper - lower) * (rank - cumulative) / count
+            cumulative += count
+        return self.buckets[-1]
+
+    def samples(self):
+        with self.lock:
+            counts = list(self.counts)
+            total, value_sum = self.count, self.sum
+        samples = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float('inf'),), counts):
+            cumulative += count
+            le = '+Inf' if bound == float('inf') else repr(bound)
+            samples.append((f'{self.name}_bucket', {**self.labels, 'le': le}, cumulative))
+        samples.append((f'{self.name}_sum', self.labels, value_sum))
+        samples.append((f'{self.name}_count', self.labels, total))
+        return samples
+
+
+class _Timer:
+    __slots__ = ('histogram', 'started')
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.started)
+        return False
+
+
+class Registry:
+    """Named metrics of one process, rendered in the Prometheus text format."""
+
+    def __init__(self):
+        self.metrics = {}
+        self.lock = threading.Lock()
+
+    def _get_or_create(self, cls, name, help_text, labels, **kwargs):
+        key = (name, tuple(sorted((labels or {}).items())))
+        with self.lock:
+            metric = self.metrics.get(key)
+            if metric is None:
+                metric = self.metrics[key] = cls(name, help_text, labels=labels, **kwargs)
+            return metric
+
+    def counter(self, name, help_text, labels=None):
+        return self._get_or_create(Counter, name, help_text, labels)
+
+    def gauge(self, name, help_text, labels=None, function=None):
+        gauge = self._get_or_create(Gauge, name, help_text, labels)
+        if function is not None:
+            gauge.function = function  # Latest owner wins, e.g. after a dashboard rerun
+        return gauge
+
+    def histogram(self, name, help_text, buckets=LATENCY_BUCKETS, labels=None):
+        return self._get_or_create(Histogram, name, help_text, labels, buckets=buckets)
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format."""
+        with self.lock:
+            metrics = sorted(self.metrics.values(), key=lambda metric: metric.name)
+        lines = []
+        described = set()
+        for metric in metrics:
+            if metric.name not in described:
+                lines.append(f'# HELP {metric.name} {metric.help_text}')
+                lines.append(f'# TYPE {metric.name} {metric.kind}')
+                described.add(metric.name)
+            for name, labels, value in metric.samples():
+                lines.append(f'{name}{_format_labels(labels)} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+# Process-wide registry
+registry = Registry()
+
+
+def stage_histogram(stage, component='consumer'):
+    """Latency histogram of one pipeline stage."""
+    return registry.histogram(
+        'fraud_stage_seconds', "Time spent per batch in each pipeline stage",
+        labels={'component': component, 'stage': stage}
+    )
+
+
+def stage_summary():
+    """Per-stage batch count, mean and estimated p50/p95/p99 in milliseconds, for the dashboard."""
+    with registry.lock:
+        histograms = [metric for metric in registry.metrics.values() if metric.name == 'fraud_stage_seconds']
+    return [
+        {
+            'component': histogram.labels['component'],
+            'stage': histogram.labels['stage'],
+            'batches': histogram.count,
+            'mean ms': histogram.sum / histogram.count * 1000 if histogram.count else 0.0,
+            'p50 ms': histogram.quantile(0.5) * 1000,
+            'p95 ms': histogram.quantile(0.95) * 1000,
+            'p99 ms': histogram.quantile(0.99) * 1000,
+        }
+        for histogram in histograms
+    ]
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] not in ('/', '/metrics'):
+            self.send_error(404)
+            return
+        body = registry.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass  # Scrapes are not worth a log line
+
+
+_servers = {}
+
+
+def start_metrics_server(port, host='0.0.0.0'):
+    """
+    Serve the registry on http://host:port/metrics from a daemon thread.
+
+    Starting the same port twice is a no-op, so scripts that rerun (Streamlit)
+    can call this unconditionally. Returns False if the port is unavailable.
+    """
+    if not port or port in _servers:
+        return port in _servers
+    try:
+        server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    except OSError as e:
+        print(f"⚠️ Metrics endpoint not started on port {port}: {str(e)}")
+        return False
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name=f'metrics-{port}', daemon=True).start()
+    _servers[port] = server
+    print(f"Metrics available at http://{host}:{port}/metrics (pid {os.getpid()})")
+    return True
@@ -1,6 +1,8 @@
 import pandas as pd
 import numpy as np
+import argparse
 import json
+import multiprocessing
 import time
 import os
 import sys
@@ -11,9 +13,19 @@ import uuid
 # Get the absolute path to the project root directory
 project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
-# Create transactions directory if it doesn't exist
-transactions_dir = os.path.join(project_root, 'transactions')
-os.makedirs(transactions_dir, exist_ok=True)
+# Add streaming module path (transports)
+streaming_path = os.path.join(project_root, 'streaming')
+if streaming_path not in sys.path:
+    sys.path.insert(0, streaming_path)
+
+# Add monitoring module path (metrics registry and endpoint)
+monitoring_path = os.path.join(project_root, 'monitoring')
+if monitoring_path not in sys.path:
+    sys.path.insert(0, monitoring_path)
+
+from metrics import registry, stage_histogram, start_metrics_server
+from records import RECORD_DTYPE, transactions_to_records, write_records
+from transport import TRANSPORT, create_transport
 
 # Transaction amount ranges
 AMOUNT_RANGES = {
@@ -31,6 +43,20 @@ FRAUD_PROBABILITIES = {
     'very_large': 0.7  # 70% chance of fraud for very large amounts
 }
 
+# Probability of each amount range, higher for smaller amounts
+RANGE_WEIGHTS = [0.5, 0.3, 0.15, 0.05]
+
+# Simulated cards; transactions carry an entity ID in 1..NUM_ENTITIES
+NUM_ENTITIES = int(os.getenv('NUM_ENTITIES', 10000))
+
+# Prometheus endpoint of the producer (0 disables it); load worker i serves on port + i
+PRODUCER_METRICS_PORT = int(os.getenv('PRODUCER_METRICS_PORT', 9101))
+
+GENERATE_SECONDS = stage_histogram('generate', component='producer')
+SEND_SECONDS = stage_histogram('send', component='producer')
+PRODUCED = registry.counter('fraud_produced_total', "Transactions sent by the producer")
+SEND_ERRORS = registry.counter('fraud_send_errors_total', "Transactions or batches the producer failed to send")
+
 def load_dataset():
     """Load and prepare the dataset."""
     try:
@@ -54,10 +80,9 @@ def load_dataset():
 def generate_realistic_amount():
     """Generate a realistic transaction amount."""
     # Select amount range based on probability
-    range_weights = [0.5, 0.3, 0.15, 0.05]  # Higher probability for smaller amounts
     amount_range = random.choices(
         list(AMOUNT_RANGES.keys()),
-        weights=range_weights,
+        weights=RANGE_WEIGHTS,
         k=1
     )[0]
     
@@ -96,6 +121,7 @@ def generate_transaction(df):
         transaction = {
             'id': str(uuid.uuid4()),
             'timestamp': current_time.isoformat(),
+            'entity_id': random.randint(1, NUM_ENTITIES),
             'amount': amount,
             'is_fraud': int(is_fraud),
             'features': features
@@ -106,66 +132,211 @@ def generate_transaction(df):
         print(f"Error generating transaction: {str(e)}")
         return None
 
-def save_transaction(transaction):
-    """Save transaction to a JSON file."""
+class LoadGenerator:
+    """
+    Vectorized transaction generator for capacity testing.
+
+    V1-V28 are extracted from the dataset once into a contiguous float32 array;
+    amounts, fraud labels, entities and feature rows are then drawn for a whole
+    batch at a time with the same distributions as generate_transaction.
+    """
+    
+    def __init__(self, df, seed=None):
+        self.features = np.ascontiguousarray(df[[f'V{i+1}' for i in range(28)]].to_numpy(dtype=np.float32))
+        self.rng = np.random.default_rng(seed)
+        range_names = list(AMOUNT_RANGES.keys())
+        self.range_weights = np.array(RANGE_WEIGHTS) / sum(RANGE_WEIGHTS)
+        self.range_min = np.array([AMOUNT_RANGES[name][0] for name in range_names])
+        self.range_max = np.array([AMOUNT_RANGES[name][1] for name in range_names])
+        self.fraud_probabilities = np.array([FRAUD_PROBABILITIES[name] for name in range_names])
+    
+    def generate_batch(self, n):
+        """Generate n transactions as a RECORD_DTYPE array."""
+        rng = self.rng
+        
+        # Amounts with 2 decimal places, 30% rounded to .99
+        ranges = rng.choice(len(self.range_weights), size=n, p=self.range_weights)
+        amounts = np.round(rng.uniform(self.range_min[ranges], self.range_max[ranges]), 2)
+        rounded = rng.random(n) < 0.3
+        amounts[rounded] = np.round(amounts[rounded]) - 0.01
+        
+        # Random UUID4 bytes
+        ids = rng.integers(0, 256, size=(n, 16), dtype=np.uint8)
+        ids[:, 6] = (ids[:, 6] & 0x0F) | 0x40
+        ids[:, 8] = (ids[:, 8] & 0x3F) | 0x80
+        
+        records = np.zeros(n, dtype=RECORD_DTYPE)
+        records['id'] = ids.view('V16').reshape(n)
+        records['timestamp_us'] = time.time_ns() // 1000
+        records['entity_id'] = rng.integers(1, NUM_ENTITIES + 1, size=n)
+        records['amount'] = amounts
+        records['is_fraud'] = rng.random(n) < self.fraud_probabilities[ranges]
+        records['features'] = self.features[rng.integers(0, len(self.features), size=n)]
+        return records
+
+def run_load(df, rate, batch_size, duration=0, seed=None, worker=0):
+    """
+    Send generated batches through the configured transport at a target rate.
+    
+    Args:
+        df (pd.DataFrame): Dataset to draw features from
+        rate (float): Target transactions per second
+        batch_size (int): Transactions generated and sent per batch
+        duration (float): Seconds to run, 0 to run until interrupted
+        seed (int): RNG seed for reproducible runs
+        worker (int): Worker index, used in progress output
+    """
+    generator = LoadGenerator(df, seed)
+    transport = create_transport()
+    start_metrics_server(PRODUCER_METRICS_PORT + worker if PRODUCER_METRICS_PORT else 0)
+    interval = batch_size / rate
+    start = time.time()
+    next_send = start
+    sent = 0
+    last_report = start
+    last_sent = 0
+    
     try:
-        if transaction is None:
-            return False
+        while duration <= 0 or time.time() - start < duration:
+            with GENERATE_SECONDS.time():
+                records = generator.generate_batch(batch_size)
+            with SEND_SECONDS.time():
+                ok = transport.send_records(records)
+            if ok:
+                PRODUCED.inc(batch_size)
+            else:
+                SEND_ERRORS.inc()
+            sent += batch_size
             
-        # Generate unique filename using transaction ID
-        filename = f'transaction_{transaction["id"]}.json'
-        filepath = os.path.join(transactions_dir, filename)
-        
-        # Save transaction
-        with open(filepath, 'w') as f:
-            json.dump(transaction, f)
+            # Pace batches to the target rate
+            next_send += interval
+            delay = next_send - time.time()
+            if delay > 0:
+                time.sleep(delay)
             
+            now = time.time()
+            if now - last_report >= 1.0:
+                print(f"[worker {worker}] {(sent - last_sent) / (now - last_report):,.0f} tx/s ({sent:,} sent)")
+                last_report = now
+                last_sent = sent
+                transport.cleanup()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        transport.flush()
+        transport.close()
+    
+    elapsed = time.time() - start
+    print(f"[worker {worker}] Sent {sent:,} transactions in {elapsed:.1f}s ({sent / elapsed:,.0f} tx/s)")
+
+def run_load_workers(df, rate, batch_size, duration, seed, processes):
+    """Fan load generation out over several processes, each with its own seed and share of the rate."""
+    if processes > 1 and TRANSPORT == 'segment':
+        print("Segment logs support a single writer, running one load process")
+        processes = 1
+    if processes <= 1:
+        run_load(df, rate, batch_size, duration, seed)
+        return
+    
+    workers = []
+    for worker in range(processes):
+        worker_seed = None if seed is None else seed + worker
+        process = multiprocessing.Process(
+            target=run_load,
+            args=(df, rate / processes, batch_size, duration, worker_seed, worker)
+        )
+        process.start()
+        workers.append(process)
+    try:
+        for process in workers:
+            process.join()
+    except KeyboardInterrupt:
+        for process in workers:
+            process.join()
+
+def save_transactions(transactions, path, record_format='binary'):
+    """
+    Write transactions to a file.
+
+    Args:
+        transactions (list): Transaction dicts
+        path (str): Destination file, appended to
+        record_format (str): 'binary' for fixed-width records, 'json' for newline-delimited JSON
+    """
+    try:
+        if record_format == 'binary':
+            write_records(path, transactions_to_records(transactions))
+        else:
+            with open(path, 'a') as f:
+                f.writelines(json.dumps(transaction) + '\n' for transaction in transactions)
         return True
     except Exception as e:
-        print(f"Error saving transaction: {str(e)}")
+        print(f"Error saving transactions: {str(e)}")
         return False
 
-def cleanup_old_files():
-    """Clean up old transaction files."""
-    try:
-        # Remove files older than 1 hour
-        current_time = time.time()
-        for file_path in os.listdir(transactions_dir):
-            if file_path.startswith('transaction_') and file_path.endswith('.json'):
-                full_path = os.path.join(transactions_dir, file_path)
-                try:
-                    if os.path.getmtime(full_path) < current_time - 3600:  # 1 hour
-                        os.remove(full_path)
-                except FileNotFoundError:
-                    continue  # Skip if file was already deleted
-                except Exception as e:
-                    print(f"Error removing file {file_path}: {str(e)}")
-    except Exception as e:
-        print(f"Error cleaning up old files: {str(e)}")
+def dump_transactions(df, path, count, record_format):
+    """Generate count transactions into a record file, e.g. for replay."""
+    transactions = [generate_transaction(df) for _ in range(count)]
+    transactions = [transaction for transaction in transactions if transaction]
+    if save_transactions(transactions, path, record_format):
+        print(f"Wrote {len(transactions)} {record_format} transactions to {path}")
 
 def main():
-    """Main function to generate and save transactions."""
+    """Main function to generate and send transactions."""
+    parser = argparse.ArgumentParser(description="Generate simulated transactions")
+    parser.add_argument('--dump', metavar='PATH', help="Write --count transactions to a file and exit")
+    parser.add_argument('--count', type=int, default=10000, help="Transactions to write with --dump")
+    parser.add_argument('--format', choices=['binary', 'json'], default='binary', help="Record format for --dump")
+    parser.add_argument('--mode', choices=['stream', 'load'], default='stream',
+                        help="'stream' sends paced single transactions, 'load' sends vectorized batches at --rate")
+    parser.add_argument('--rate', type=float, default=50000, help="Target transactions per second in load mode")
+    parser.add_argument('--batch-size', type=int, default=1000, help="Transactions per batch in load mode")
+    parser.add_argument('--duration', type=float, default=0, help="Seconds to run in load mode, 0 for no limit")
+    parser.add_argument('--seed', type=int, help="RNG seed for reproducible load runs")
+    parser.add_argument('--processes', type=int, default=1, help="Load generator processes")
+    args = parser.parse_args()
+    
     print("Loading dataset...")
     df = load_dataset()
     print("Dataset loaded successfully!")
     
+    if args.dump:
+        dump_transactions(df, args.dump, args.count, args.format)
+        return
+    
+    if args.mode == 'load':
+        print(f"\nGenerating load at {args.rate:,.0f} tx/s in batches of {args.batch_size}...")
+        print("Press Ctrl+C to stop")
+        run_load_workers(df, args.rate, args.batch_size, args.duration, args.seed, args.processes)
+        return
+    
     print("\nStarting transaction generation...")
     print("Generating transactions with realistic amounts and fraud patterns...")
     print("Press Ctrl+C to stop")
     
+    # File drops, Kafka or in-memory, selected by TRANSPORT
+    transport = create_transport()
+    start_metrics_server(PRODUCER_METRICS_PORT)
+    
     try:
         while True:
             # Generate transaction
-            transaction = generate_transaction(df)
+            with GENERATE_SECONDS.time():
+                transaction = generate_transaction(df)
             
             if transaction:
-                # Save transaction
-                if save_transaction(transaction):
+                # Send transaction
+                with SEND_SECONDS.time():
+                    ok = transport.send(transaction)
+                if not ok:
+                    SEND_ERRORS.inc()
+                else:
+                    PRODUCED.inc()
                     status = "🚨 FRAUD" if transaction['is_fraud'] else "✅ LEGIT"
                     print(f"Generated {status} transaction: ${transaction['amount']:.2f} (ID: {transaction['id'][:8]})")
             
-            # Cleanup old files
-            cleanup_old_files()
+            # Cleanup old transactions
+            transport.cleanup()
             
             # Shorter delay for more frequent transactions
             time.sleep(random.uniform(0.2, 0.5))  # Random delay between 0.2 and 0.5 seconds
@@ -175,6 +346,7 @@ def main():
     except Exception as e:
         print(f"Error in main loop: {str(e)}")
     finally:
+        transport.close()
         print("Transaction generation stopped.")
 
 if __name__ == "__main__":
@@ -0,0 +1,221 @@
+import math
+import os
+import time
+import uuid
+from collections import deque
+
+import numpy as np
+
+from metrics import registry
+
+# Deduplication index configuration
+DEDUP_RETENTION = float(os.getenv('DEDUP_RETENTION', 3600))  # Seconds a transaction ID is remembered
+DEDUP_MAX_BYTES = int(os.getenv('DEDUP_MAX_BYTES', 64 * 1024 * 1024))  # Memory cap of the index
+DEDUP_FP_RATE = float(os.getenv('DEDUP_FP_RATE', 0))  # 0 keeps exact IDs, > 0 uses Bloom filters
+DEDUP_FALLBACK_FP_RATE = float(os.getenv('DEDUP_FALLBACK_FP_RATE', 0.001))  # Bloom rate once exact IDs hit the cap, 0 to disable
+
+# Approximate memory of one exact entry: a 128-bit int object plus its set slot
+EXACT_ENTRY_BYTES = 80
+
+
+def uuid_keys(ids):
+    """(n, 2) uint64 keys of UUID strings, the little-endian halves of the 16 UUID bytes."""
+    packed = b''.join(uuid.UUID(transaction_id).bytes for transaction_id in ids)
+    return np.frombuffer(packed, dtype='<u8').reshape(-1, 2)
+
+
+def transaction_keys(transactions):
+    """(n, 2) uint64 keys of a batch of transaction dicts or binary records."""
+    if isinstance(transactions, np.ndarray):
+        return np.ascontiguousarray(transactions['id']).view('<u8').reshape(-1, 2)
+    return uuid_keys(transaction['id'] for transaction in transactions)
+
+
+class ExactGeneration:
+    """IDs added during one time bucket, as a set of 128-bit ints."""
+
+    def __init__(self, max_bytes):
+        self.ids = set()
+        self.capacity = max_bytes // EXACT_ENTRY_BYTES
+
+    @staticmethod
+    def _ints(keys):
+        return [int(low) | (int(high) << 64) for low, high in keys.tolist()]
+
+    def contains(self, keys):
+        ids = self.ids
+        return np.fromiter((key in ids for key in self._ints(keys)), dtype=bool, count=len(keys))
+
+    def add(self, keys):
+        self.ids.update(self._ints(keys))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def nbytes(self):
+        return len(self.ids) * EXACT_ENTRY_BYTES
+
+    def full(self):
+        return len(self.ids) >= self.capacity
+
+
+class BloomGeneration:
+    """
+    Bloom filter of the IDs added during one time bucket.
+
+    UUIDs are already uniformly random, so the k bit positions come straight
+    from the two key halves by double hashing instead of a hash function.
+    """
+
+    def __init__(self, num_bits, fp_rate):
+        self.num_bits = np.uint64(num_bits)
+        self.bits = np.zeros((num_bits + 7) // 8, dtype=np.uint8)
+        self.num_hashes = max(1, round(-math.log2(fp_rate)))
+        # Elements that fit before the false-positive rate exceeds fp_rate
+        self.capacity = int(num_bits * math.log(2) ** 2 / -math.log(fp_rate))
+        self.count = 0
+        self.hash_steps = np.arange(self.num_hashes, dtype=np.uint64)
+
+    def _positions(self, keys):
+        low, high = keys[:, 0], keys[:, 1] | np.uint64(1)
+        return (low[:, None] + self.hash_steps[None, :] * high[:, None]) % self.num_bits
+
+    def contains(self, keys):
+        positions = self._positions(keys)
+        bits = (self.bits[positions >> np.uint64(3)] >> (positions & np.uint64(7)).astype(np.uint8)) & 1
+        return bits.all(axis=1)
+
+    def add(self, keys):
+        positions = self._positions(keys)
+        np.bitwise_or.at(
+            self.bits, positions >> np.uint64(3),
+            np.left_shift(1, positions & np.uint64(7)).astype(np.uint8)
+        )
+        self.count += len(keys)
+
+    def __len__(self):
+        return self.count
+
+    def nbytes(self):
+        return self.bits.nbytes
+
+    def full(self):
+        return self.count >= self.capacity
+
+
+class DedupIndex:
+    """
+    Memory-bounded index of recently seen transaction IDs.
+
+    IDs are kept in `num_buckets` generations covering `retention` seconds;
+    the oldest generation is dropped whole when a new one starts, so expiry
+    costs nothing per ID. With fp_rate=0 generations are exact sets of
+    128-bit ints (~80 bytes per ID); with fp_rate > 0 they are Bloom filters
+    of a few bytes per ID. Each generation gets 1/num_buckets of max_bytes
+    and a full one starts the next generation early. In exact mode an exact
+    generation that fills before its bucket ends is followed by a Bloom
+    generation at fallback_fp_rate, holding far more IDs in the same bytes;
+    exact sets resume once a generation lasts its whole bucket. Traffic
+    beyond even that shortens the retention actually covered instead of
+    exceeding the cap.
+    """
+
+    def __init__(self, retention=DEDUP_RETENTION, max_bytes=DEDUP_MAX_BYTES, fp_rate=DEDUP_FP_RATE,
+                 num_buckets=12, name='consumer', fallback_fp_rate=DEDUP_FALLBACK_FP_RATE):
+        if not 0 <= fp_rate < 1:
+            raise ValueError(f"fp_rate must be in [0, 1): {fp_rate}")
+        if not 0 <= fallback_fp_rate < 1:
+            raise ValueError(f"fallback_fp_rate must be in [0, 1): {fallback_fp_rate}")
+        self.retention = retention
+        self.max_bytes = max_bytes
+        self.fp_rate = fp_rate
+        self.fallback_fp_rate = fallback_fp_rate
+        self.num_buckets = num_buckets
+        self.bucket_seconds = retention / num_buckets
+        self.generations = deque()  # (start time, generation), oldest first
+        self.early_rotations = 0
+        self.hit_count = 0
+        self.miss_count = 0
+        self.hits = registry.counter('fraud_dedup_hits_total', "Duplicate transactions dropped",
+                                     labels={'index': name})
+        self.misses = registry.counter('fraud_dedup_misses_total', "Transactions checked and not seen before",
+                                       labels={'index': name})
+        registry.gauge('fraud_dedup_bytes', "Approximate memory of the dedup index", labels={'index': name},
+                       function=self.nbytes)
+        registry.gauge('fraud_dedup_entries', "Transaction IDs held by the dedup index", labels={'index': name},
+                       function=lambda: sum(len(generation) for _, generation in self.generations))
+        self._rotate(time.time())
+
+    def _new_generation(self, overflowed=False):
+        fp_rate = self.fp_rate or (self.fallback_fp_rate if overflowed else 0)
+        if fp_rate > 0:
+            # Each generation gets its share of the cap and of the overall false-positive rate
+            return BloomGeneration(self.max_bytes * 8 // self.num_buckets, fp_rate / self.num_buckets)
+        return ExactGeneration(self.max_bytes // self.num_buckets)
+
+    def _rotate(self, now):
+        current = self.generations[-1] if self.generations else None
+        if current is None or now - current[0] >= self.bucket_seconds or current[1].full():
+            overflowed = current is not None and current[1].full()
+            if overflowed:
+                self.early_rotations += 1
+            self.generations.append((now, self._new_generation(overflowed)))
+        while len(self.generations) > self.num_buckets or (
+            len(self.generations) > 1 and now - self.generations[1][0] >= self.retention
+        ):
+            self.generations.popleft()
+
+    def nbytes(self):
+        """Approximate memory held by all generations."""
+        return sum(generation.nbytes() for _, generation in self.generations)
+
+    def seen(self, keys):
+        """
+        Flag keys that were added before or repeat earlier in the same batch.
+
+        Args:
+            keys (np.ndarray): (n, 2) uint64 keys from transaction_keys() or uuid_keys()
+
+        Returns:
+            np.ndarray: Boolean mask, True for duplicates
+        """
+        keys = np.ascontiguousarray(keys, dtype=np.uint64).reshape(-1, 2)
+        duplicates = np.zeros(len(keys), dtype=bool)
+        if not len(keys):
+            return duplicates
+        for _, generation in self.generations:
+            duplicates |= generation.contains(keys)
+
+        # Repeats within the batch: everything but the first occurrence of each key
+        _, first = np.unique(keys.view('V16').reshape(-1), return_index=True)
+        repeated = np.ones(len(keys), dtype=bool)
+        repeated[first] = False
+        duplicates |= repeated
+
+        hits = int(duplicates.sum())
+        self.hit_count += hits
+        self.miss_count += len(keys) - hits
+        self.hits.inc(hits)
+        self.misses.inc(len(keys) - hits)
+        return duplicates
+
+    def add(self, keys):
+        """Remember keys, typically once their batch has been processed."""
+        keys = np.ascontiguousarray(keys, dtype=np.uint64).reshape(-1, 2)
+        self._rotate(time.time())
+        if len(keys):
+            self.generations[-1][1].add(keys)
+
+    def get_stats(self):
+        """Mode, entries, memory, hit/miss counts and the retention actually covered."""
+        now = time.time()
+        return {
+            'mode': 'exact' if isinstance(self.generations[-1][1], ExactGeneration) else 'bloom',
+            'entries': sum(len(generation) for _, generation in self.generations),
+            'bytes': self.nbytes(),
+            'generations': len(self.generations),
+            'covered_seconds': now - self.generations[0][0] if self.generations else 0.0,
+            'early_rotations': self.early_rotations,
+            'hits': self.hit_count,
+            'misses': self.miss_count,
+        }
@@ -0,0 +1,86 @@
+import os
+import uuid
+from datetime import datetime
+
+import numpy as np
+
+NUM_V_FEATURES = 28
+
+# Fixed-width little-endian transaction record (152 bytes).
+# The padding keeps the float32 feature block 4-byte aligned.
+RECORD_DTYPE = np.dtype([
+    ('id', 'V16'),                             # UUID bytes
+    ('timestamp_us', '<i8'),                   # Epoch microseconds
+    ('entity_id', '<i8'),                      # Card/account ID, 0 if unknown
+    ('amount', '<f4'),
+    ('is_fraud', 'u1'),                        # Label
+    ('_pad', 'V3'),
+    ('features', '<f4', (NUM_V_FEATURES,)),    # V1-V28
+])
+
+
+def transactions_to_records(transactions):
+    """Convert transaction dicts to a structured record array."""
+    records = np.zeros(len(transactions), dtype=RECORD_DTYPE)
+    if not len(transactions):
+        return records
+    # Whole columns at once; per-row structured assignment costs more than the parsing
+    feature_names = [f'V{i+1}' for i in range(NUM_V_FEATURES)]
+    records['id'] = np.frombuffer(b''.join(uuid.UUID(t['id']).bytes for t in transactions), dtype='V16')
+    records['timestamp_us'] = [
+        round(datetime.fromisoformat(t['timestamp']).timestamp() * 1_000_000) for t in transactions
+    ]
+    records['entity_id'] = [t.get('entity_id', 0) for t in transactions]
+    records['amount'] = [t['amount'] for t in transactions]
+    records['is_fraud'] = [t['is_fraud'] for t in transactions]
+    records['features'] = [
+        [features.get(name, 0.0) for name in feature_names]
+        for features in (t.get('features', {}) for t in transactions)
+    ]
+    return records
+
+
+def records_to_transactions(records):
+    """Convert a record array back to transaction dicts (JSON debug/interop format)."""
+    transactions = []
+    for record in records:
+        transactions.append({
+            'id': str(uuid.UUID(bytes=bytes(record['id']))),
+            'timestamp': datetime.fromtimestamp(int(record['timestamp_us']) / 1_000_000).isoformat(),
+            'entity_id': int(record['entity_id']),
+            'amount': float(record['amount']),
+            'is_fraud': int(record['is_fraud']),
+            'features': {f'V{i+1}': float(value) for i, value in enumerate(record['features'])},
+        })
+    return transactions
+
+
+def write_records(path, records):
+    """Append records to a binary record file."""
+    with open(path, 'ab') as f:
+        f.write(np.ascontiguousarray(records, dtype=RECORD_DTYPE).tobytes())
+
+
+def count_records(path):
+    """Number of complete records in a file (a trailing partial record is ignored)."""
+    return os.path.getsize(path) // RECORD_DTYPE.itemsize
+
+
+def read_records(path, start=0, count=None):
+    """
+    Memory-map complete records of a binary record file.
+
+    Args:
+        path (str): Record file
+        start (int): Index of the first record
+        count (int): Number of records, all remaining complete records if None
+
+    Returns:
+        np.memmap: Read-only structured array view over the file
+    """
+    available = count_records(path) - start
+    count = available if count is None else min(count, available)
+    if count <= 0:
+        return np.empty(0, dtype=RECORD_DTYPE)
+    return np.memmap(path, dtype=RECORD_DTYPE, mode='r',
+                     offset=start * RECORD_DTYPE.itemsize, shape=(count,))
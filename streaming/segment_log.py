@@ -0,0 +1,292 @@
+import glob
+import json
+import os
+import time
+
+import numpy as np
+
+from records import RECORD_DTYPE, read_records
+
+# Segment file suffixes: newline-delimited JSON or fixed-width binary records
+JSON_SUFFIX = '.log'
+RECORD_SUFFIX = '.rec'
+
+
+def list_segments(directory, suffix=JSON_SUFFIX):
+    """Return segment paths, oldest first (names sort by creation time)."""
+    return sorted(glob.glob(os.path.join(directory, f'segment_*{suffix}')))
+
+
+def expire_segments(directory, max_age, suffix=JSON_SUFFIX):
+    """
+    Delete whole segments last written more than max_age seconds ago.
+
+    The newest segment is never deleted since a writer may still append to it.
+
+    Returns:
+        int: Number of segments removed
+    """
+    removed = 0
+    cutoff = time.time() - max_age
+    for segment_path in list_segments(directory, suffix)[:-1]:
+        try:
+            if os.path.getmtime(segment_path) < cutoff:
+                os.remove(segment_path)
+                removed += 1
+        except FileNotFoundError:
+            continue  # Skip if segment was already deleted
+        except Exception as e:
+            print(f"Error removing segment {segment_path}: {str(e)}")
+    return removed
+
+
+class SegmentWriter:
+    """
+    Appends records to rotating segment files.
+
+    A directory has a single writer; a segment is complete once the writer has
+    moved on to a newer one.
+    """
+
+    def __init__(self, directory, max_segment_bytes=64 * 1024 * 1024, max_segment_age=300,
+                 suffix=JSON_SUFFIX):
+        self.directory = directory
+        self.suffix = suffix
+        self.max_segment_bytes = max_segment_bytes
+        self.max_segment_age = max_segment_age
+        self.file = None
+        self.segment_bytes = 0
+        self.segment_started = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def _open_segment(self):
+        self.segment_started = time.time()
+        segment_path = os.path.join(self.directory, f'segment_{time.time_ns():020d}{self.suffix}')
+        self.file = open(segment_path, 'ab')
+        self.segment_bytes = 0
+
+    def rotate(self):
+        """Seal the current segment and start a new one."""
+        if self.file is not None:
+            self.file.flush()
+            self.file.close()
+        self._open_segment()
+
+    def append(self, lines):
+        """Append encoded records (bytes without trailing newline) with a single write."""
+        self.append_bytes(b'\n'.join(lines) + b'\n')
+
+    def append_bytes(self, data):
+        """Append complete records that are already encoded, e.g. fixed-width binary records."""
+        if self.file is None:
+            self._open_segment()
+        elif (self.segment_bytes >= self.max_segment_bytes
+              or time.time() - self.segment_started >= self.max_segment_age):
+            self.rotate()
+        self.file.write(data)
+        self.segment_bytes += len(data)
+
+    def flush(self):
+        """Make appended records visible to readers."""
+        if self.file is not None:
+            self.file.flush()
+
+    def close(self):
+        """Flush and close the current segment."""
+        if self.file is not None:
+            self.file.flush()
+            self.file.close()
+            self.file = None
+
+
+class SegmentReader:
+    """
+    Tails segment files from a persisted (segment, byte offset) position.
+
+    Reads happen in bulk chunks and only complete records are consumed, so a
+    record being written concurrently is picked up on the next read.
+    """
+
+    def __init__(self, directory, offset_path, read_bytes=1024 * 1024, suffix=JSON_SUFFIX):
+        self.directory = directory
+        self.suffix = suffix
+        self.offset_path = offset_path
+        self.read_bytes = read_bytes
+        self.segment = None
+        self.position = 0
+        self.file = None
+        self.bytes_read = 0
+        self.lines_read = 0
+        os.makedirs(directory, exist_ok=True)
+        self._load_offset()
+        self.committed = (self.segment, self.position)
+
+    def _load_offset(self):
+        try:
+            with open(self.offset_path, 'r') as f:
+                offset = json.load(f)
+            self.segment = offset['segment']
+            self.position = offset['position']
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"Error loading segment offset {self.offset_path}: {str(e)}")
+
+    def _open(self, segment):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+        try:
+            self.file = open(os.path.join(self.directory, segment), 'rb')
+            return True
+        except FileNotFoundError:
+            return False
+
+    def _newer_segment(self):
+        """Oldest segment after the current one, None if the writer has not rotated."""
+        for segment_path in list_segments(self.directory, self.suffix):
+            segment = os.path.basename(segment_path)
+            if self.segment is None or segment > self.segment:
+                return segment
+        return None
+
+    def _next_segment(self):
+        """Move to the oldest segment after the current one, if any."""
+        segment = self._newer_segment()
+        if segment is None:
+            return False
+        self.segment = segment
+        self.position = 0
+        return True
+
+    def _ensure_open(self):
+        while self.file is None:
+            if self.segment is None and not self._next_segment():
+                return False
+            if self._open(self.segment):
+                return True
+            # Segment expired before it was fully read
+            print(f"Segment {self.segment} no longer exists, skipping ahead")
+            if not self._next_segment():
+                return False
+        return True
+
+    def read(self, max_records):
+        """
+        Read up to max_records complete lines from the current position.
+
+        Returns:
+            list: Raw record lines (bytes)
+        """
+        lines = []
+        rechecked = False
+        while len(lines) < max_records and self._ensure_open():
+            self.file.seek(self.position)
+            chunk = self.file.read(self.read_bytes)
+            end = chunk.rfind(b'\n')
+            if end == -1:
+                if len(chunk) >= self.read_bytes:
+                    # A single record is larger than the read size
+                    self.read_bytes *= 2
+                    continue
+                # End of segment. A newer one means the writer sealed it, but the sealing flush
+                # may have landed after the read above, so read it once more before moving on
+                if not rechecked:
+                    rechecked = self._newer_segment() is not None
+                    if rechecked:
+                        continue
+                elif self._next_segment():
+                    self._open(self.segment)
+                    rechecked = False
+                    continue
+                break
+            chunk_lines = chunk[:end].split(b'\n')[:max_records - len(lines)]
+            consumed = sum(len(line) + 1 for line in chunk_lines)
+            self.position += consumed
+            self.bytes_read += consumed
+            self.lines_read += len(chunk_lines)
+            lines.extend(line for line in chunk_lines if line)
+        return lines
+
+    def read_records(self, max_records):
+        """
+        Read up to max_records complete fixed-width records from the current position.
+
+        Returns:
+            np.ndarray: RECORD_DTYPE array copied out of the memory-mapped segments
+        """
+        batches = []
+        remaining = max_records
+        rechecked = False
+        while remaining > 0 and self._ensure_open():
+            segment_path = os.path.join(self.directory, self.segment)
+            try:
+                mapped = read_records(segment_path, self.position // RECORD_DTYPE.itemsize, remaining)
+            except FileNotFoundError:
+                mapped = np.empty(0, dtype=RECORD_DTYPE)
+            if len(mapped) == 0:
+                # End of segment. A newer one means the writer sealed it, but the sealing flush
+                # may have landed after the read above, so read it once more before moving on
+                if not rechecked:
+                    rechecked = self._newer_segment() is not None
+                    if rechecked:
+                        continue
+                elif self._next_segment():
+                    self._open(self.segment)
+                    rechecked = False
+                    continue
+                break
+            # Copy so the batch outlives segment expiry
+            batches.append(np.array(mapped))
+            self.position += len(mapped) * RECORD_DTYPE.itemsize
+            remaining -= len(mapped)
+        if not batches:
+            return np.empty(0, dtype=RECORD_DTYPE)
+        return batches[0] if len(batches) == 1 else np.concatenate(batches)
+
+    def backlog_records(self):
+        """
+        Estimated records between the current position and the end of the log.
+
+        Exact for fixed-width records; JSON lines are estimated from the
+        average line length read so far.
+        """
+        remaining = 0
+        for segment_path in list_segments(self.directory, self.suffix):
+            segment = os.path.basename(segment_path)
+            if self.segment is not None and segment < self.segment:
+                continue
+            try:
+                remaining += os.path.getsize(segment_path)
+            except FileNotFoundError:
+                continue
+            if segment == self.segment:
+                remaining -= self.position
+        if self.suffix == RECORD_SUFFIX:
+            return remaining // RECORD_DTYPE.itemsize
+        if self.lines_read == 0:
+            return 0 if remaining == 0 else 1
+        return int(remaining / (self.bytes_read / self.lines_read))
+
+    def commit(self):
+        """Persist the current position atomically."""
+        if self.segment is None:
+            return
+        temp_path = self.offset_path + '.tmp'
+        with open(temp_path, 'w') as f:
+            json.dump({'segment': self.segment, 'position': self.position}, f)
+        os.replace(temp_path, self.offset_path)
+        self.committed = (self.segment, self.position)
+
+    def rewind(self):
+        """Move back to the last committed position, so uncommitted records are read again."""
+        if self.segment != self.committed[0] and self.file is not None:
+            self.file.close()
+            self.file = None
+        self.segment, self.position = self.committed
+
+    def close(self):
+        """Close the current segment."""
+        if self.file is not None:
+            self.file.close()
+            self.file = None
@@ -0,0 +1,610 @@
+import glob
+import json
+import os
+import threading
+import time
+import uuid
+import zlib
+
+import numpy as np
+
+from dedup import DedupIndex
+from metrics import registry
+from records import RECORD_DTYPE, records_to_transactions, transactions_to_records
+from segment_log import JSON_SUFFIX, RECORD_SUFFIX, SegmentReader, SegmentWriter, expire_segments
+
+# Get the absolute path to the project root directory
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Transport configuration
+TRANSPORT = os.getenv('TRANSPORT', 'file')  # 'file', 'segment', 'kafka' or 'memory'
+SEGMENT_MAX_BYTES = int(os.getenv('SEGMENT_MAX_BYTES', 64 * 1024 * 1024))  # Rotate segments at this size
+SEGMENT_MAX_AGE = float(os.getenv('SEGMENT_MAX_AGE', 300))  # Rotate segments after this many seconds
+SEGMENT_RETENTION = float(os.getenv('SEGMENT_RETENTION', 3600))  # Delete segments older than this
+RECORD_FORMAT = os.getenv('RECORD_FORMAT', 'json')  # Segment record format: 'json' or 'binary'
+KAFKA_BOOTSTRAP_SERVERS = os.getenv('KAFKA_BOOTSTRAP_SERVERS', 'localhost:9092')
+KAFKA_TOPIC = os.getenv('KAFKA_TOPIC', 'transactions')
+KAFKA_GROUP_ID = os.getenv('KAFKA_GROUP_ID', 'fraud-consumer')
+KAFKA_PARTITIONS = os.getenv('KAFKA_PARTITIONS')  # e.g. "0,1" to pin partitions, unset for group assignment
+KAFKA_COMPRESSION = os.getenv('KAFKA_COMPRESSION', 'gzip')
+KAFKA_LINGER_MS = int(os.getenv('KAFKA_LINGER_MS', 20))
+KAFKA_BATCH_BYTES = int(os.getenv('KAFKA_BATCH_BYTES', 64 * 1024))
+
+
+PARSE_ERRORS = registry.counter('fraud_parse_errors_total', "Transactions that could not be read or parsed")
+
+
+def partition_for(key, num_partitions):
+    """Map a transaction key to a partition with a stable hash."""
+    return zlib.crc32(key.encode('utf-8')) % num_partitions
+
+
+class FileTransport:
+    """
+    One JSON file per transaction in a shared directory.
+
+    Polled files are deleted on commit, so a transaction is only dropped once
+    its batch has been scored. Committed IDs are remembered in a bounded
+    dedup index, so a file that could not be removed or is written again is
+    not read twice.
+    """
+
+    def __init__(self, directory, max_age=3600):
+        self.directory = directory
+        self.max_age = max_age
+        self.processed = DedupIndex(retention=max_age, name='file')
+        self.pending_files = []
+        self.unread_files = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def send(self, transaction):
+        """Save a transaction to its own JSON file."""
+        try:
+            file_path = os.path.join(self.directory, f'transaction_{transaction["id"]}.json')
+            # Written under a name the consumer does not glob, then renamed into place,
+            # so a file is never read half-written
+            temp_path = os.path.join(self.directory, f'.transaction_{transaction["id"]}.json.tmp')
+            with open(temp_path, 'w') as f:
+                json.dump(transaction, f)
+            os.replace(temp_path, file_path)
+            return True
+        except Exception as e:
+            print(f"Error saving transaction: {str(e)}")
+            return False
+
+    def send_records(self, records):
+        """Save each record of a RECORD_DTYPE array as its own JSON file."""
+        return all([self.send(transaction) for transaction in records_to_transactions(records)])
+
+    def flush(self):
+        """Files are written synchronously, nothing to flush."""
+
+    def poll(self, max_records, timeout):
+        """Collect up to max_records new transactions, waiting at most timeout seconds."""
+        batch = []
+        pending = set(self.pending_files)
+        deadline = time.time() + timeout
+
+        while True:
+            file_paths = glob.glob(os.path.join(self.directory, 'transaction_*.json'))
+            new_paths = [file_path for file_path in file_paths if file_path not in pending]
+            start = 0
+            while len(batch) < max_records and start < len(new_paths):
+                # Check only as many files as the batch still has room for
+                chunk = new_paths[start:start + max_records - len(batch)]
+                start += len(chunk)
+                for file_path, duplicate in zip(chunk, self.processed.seen(self._keys(chunk))):
+                    if duplicate:
+                        self._remove(file_path)  # Already scored, e.g. written again by a retrying producer
+                        continue
+                    try:
+                        with open(file_path, 'r') as f:
+                            batch.append(json.load(f))
+                        self.pending_files.append(file_path)
+                        pending.add(file_path)
+                    except Exception as e:
+                        PARSE_ERRORS.inc()
+                        print(f"Error processing file {file_path}: {str(e)}")
+
+            # Stop once the batch is full or the wait budget is spent
+            if len(batch) >= max_records or time.time() >= deadline:
+                self.unread_files = max(0, len(file_paths) - len(pending))
+                return batch
+            time.sleep(0.01)
+
+    @staticmethod
+    def _keys(file_paths):
+        """Dedup keys of transaction_<id>.json paths; IDs that are not UUIDs are hashed into one."""
+        packed = []
+        for file_path in file_paths:
+            transaction_id = os.path.basename(file_path)[len('transaction_'):-len('.json')]
+            try:
+                packed.append(uuid.UUID(transaction_id).bytes)
+            except ValueError:
+                packed.append(uuid.uuid5(uuid.NAMESPACE_OID, transaction_id).bytes)
+        return np.frombuffer(b''.join(packed), dtype='<u8').reshape(-1, 2)
+
+    @staticmethod
+    def _remove(file_path):
+        try:
+            os.remove(file_path)
+        except FileNotFoundError:
+            pass  # Skip if file was already deleted
+        except Exception as e:
+            print(f"Error removing processed file {file_path}: {str(e)}")
+
+    def backlog(self):
+        """Transaction files left unread by the last poll."""
+        return self.unread_files
+
+    def commit(self):
+        """Mark polled files as processed and remove them."""
+        self.processed.add(self._keys(self.pending_files))
+        for file_path in self.pending_files:
+            self._remove(file_path)
+        self.pending_files = []
+
+    def rollback(self):
+        """Forget polled files without removing them, so the next poll reads them again."""
+        self.pending_files = []
+
+    def cleanup(self):
+        """Remove transaction files older than max_age seconds."""
+        try:
+            current_time = time.time()
+            for file_path in glob.glob(os.path.join(self.directory, 'transaction_*.json')):
+                try:
+                    if os.path.getmtime(file_path) < current_time - self.max_age:
+                        os.remove(file_path)
+                except FileNotFoundError:
+                    continue  # Skip if file was already deleted
+                except Exception as e:
+                    print(f"Error removing file {file_path}: {str(e)}")
+        except Exception as e:
+            print(f"Error cleaning up old files: {str(e)}")
+
+    def close(self):
+        """Nothing to release for the file transport."""
+
+
+class SegmentTransport:
+    """
+    Records in rotating, append-only segment files.
+
+    The producer appends to the newest segment and the consumer tails the log
+    from a byte offset persisted on commit. Expiry deletes whole segments.
+    With record_format='binary' segments hold fixed-width RECORD_DTYPE records
+    and poll returns a structured array instead of transaction dicts.
+    """
+
+    def __init__(self, directory, max_segment_bytes=64 * 1024 * 1024, max_segment_age=300,
+                 retention=3600, linger=0.05, record_format='json'):
+        if record_format not in ('json', 'binary'):
+            raise ValueError(f"Unknown record format: {record_format}")
+        self.directory = directory
+        self.record_format = record_format
+        self.suffix = RECORD_SUFFIX if record_format == 'binary' else JSON_SUFFIX
+        self.retention = retention
+        self.linger = linger
+        self.max_segment_bytes = max_segment_bytes
+        self.max_segment_age = max_segment_age
+        self.writer = None
+        self.reader = None
+        self.last_flush = time.time()
+
+    def _get_writer(self):
+        if self.writer is None:
+            self.writer = SegmentWriter(self.directory, self.max_segment_bytes, self.max_segment_age, self.suffix)
+        return self.writer
+
+    def send(self, transaction):
+        """Append a transaction, flushing at most every linger seconds."""
+        try:
+            if self.record_format == 'binary':
+                self._get_writer().append_bytes(transactions_to_records([transaction]).tobytes())
+            else:
+                self._get_writer().append([json.dumps(transaction).encode('utf-8')])
+            if time.time() - self.last_flush >= self.linger:
+                self.flush()
+            return True
+        except Exception as e:
+            print(f"Error appending transaction: {str(e)}")
+            return False
+
+    def send_records(self, records):
+        """Append a RECORD_DTYPE array with a single write."""
+        try:
+            if self.record_format == 'binary':
+                self._get_writer().append_bytes(np.ascontiguousarray(records, dtype=RECORD_DTYPE).tobytes())
+            else:
+                self._get_writer().append([
+                    json.dumps(transaction).encode('utf-8') for transaction in records_to_transactions(records)
+                ])
+            if time.time() - self.last_flush >= self.linger:
+                self.flush()
+            return True
+        except Exception as e:
+            print(f"Error appending records: {str(e)}")
+            return False
+
+    def flush(self):
+        """Make appended transactions visible to the consumer."""
+        if self.writer is not None:
+            self.writer.flush()
+        self.last_flush = time.time()
+
+    def poll(self, max_records, timeout):
+        """
+        Read up to max_records transactions, waiting at most timeout seconds.
+
+        Returns:
+            list of transaction dicts, or a RECORD_DTYPE array for binary segments
+        """
+        if self.reader is None:
+            self.reader = SegmentReader(
+                self.directory, os.path.join(self.directory, f'consumer{self.suffix}.offset'), suffix=self.suffix
+            )
+        read = self.reader.read_records if self.record_format == 'binary' else self.reader.read
+        deadline = time.time() + timeout
+        while True:
+            records = read(max_records)
+            if len(records) or time.time() >= deadline:
+                break
+            time.sleep(0.01)
+
+        if self.record_format == 'binary':
+            return records
+
+        batch = []
+        for line in records:
+            try:
+                batch.append(json.loads(line))
+            except Exception as e:
+                PARSE_ERRORS.inc()
+                print(f"Error parsing segment record: {str(e)}")
+        return batch
+
+    def backlog(self):
+        """Estimated records not yet read from the log."""
+        if self.reader is None:
+            return 0
+        return self.reader.backlog_records()
+
+    def commit(self):
+        """Persist the read position of the polled batches."""
+        if self.reader is not None:
+            self.reader.commit()
+
+    def rollback(self):
+        """Rewind to the committed position, so the polled batches are read again."""
+        if self.reader is not None:
+            self.reader.rewind()
+
+    def cleanup(self):
+        """Delete segments older than the retention period."""
+        expire_segments(self.directory, self.retention, self.suffix)
+
+    def close(self):
+        """Flush and close open segments."""
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+        if self.reader is not None:
+            self.reader.close()
+            self.reader = None
+
+
+class KafkaTransport:
+    """
+    Kafka topic transport built on kafka-python.
+
+    The producer batches, compresses and lingers sends keyed by transaction ID.
+    The consumer polls bounded batches with auto-commit disabled and commits
+    offsets only after the caller has scored the batch.
+    """
+
+    def __init__(self, bootstrap_servers, topic, group_id, partitions=None,
+                 compression_type='gzip', linger_ms=20, batch_bytes=64 * 1024):
+        try:
+            import kafka
+        except ImportError:
+            raise ImportError("kafka-python is required for TRANSPORT=kafka (pip install kafka-python)")
+        self.kafka = kafka
+        self.bootstrap_servers = bootstrap_servers
+        self.topic = topic
+        self.group_id = group_id
+        self.partitions = partitions
+        self.compression_type = compression_type
+        self.linger_ms = linger_ms
+        self.batch_bytes = batch_bytes
+        self.producer = None
+        self.consumer = None
+        self.pending_offsets = {}
+        self.rewind_offsets = {}
+
+    def _get_producer(self):
+        if self.producer is None:
+            self.producer = self.kafka.KafkaProducer(
+                bootstrap_servers=self.bootstrap_servers,
+                key_serializer=lambda key: key.encode('utf-8'),
+                value_serializer=lambda value: json.dumps(value).encode('utf-8'),
+                compression_type=self.compression_type,
+                linger_ms=self.linger_ms,
+                batch_size=self.batch_bytes,
+                acks='all'
+            )
+        return self.producer
+
+    def _get_consumer(self, max_records):
+        if self.consumer is None:
+            self.consumer = self.kafka.KafkaConsumer(
+                bootstrap_servers=self.bootstrap_servers,
+                group_id=self.group_id,
+                enable_auto_commit=False,
+                auto_offset_reset='earliest',
+                max_poll_records=max_records
+            )
+            if self.partitions:
+                # Explicit assignment, e.g. one consumer per partition
+                self.consumer.assign([
+                    self.kafka.TopicPartition(self.topic, partition) for partition in self.partitions
+                ])
+            else:
+                # Group-managed assignment balances partitions across consumers
+                self.consumer.subscribe([self.topic])
+        return self.consumer
+
+    def send(self, transaction):
+        """Queue a transaction; kafka-python batches and compresses in the background."""
+        try:
+            self._get_producer().send(self.topic, key=transaction['id'], value=transaction)
+            return True
+        except Exception as e:
+            print(f"Error sending transaction: {str(e)}")
+            return False
+
+    def send_records(self, records):
+        """Queue each record of a RECORD_DTYPE array as a JSON message."""
+        return all([self.send(transaction) for transaction in records_to_transactions(records)])
+
+    def flush(self):
+        """Block until all queued sends are acknowledged."""
+        if self.producer is not None:
+            self.producer.flush()
+
+    def poll(self, max_records, timeout):
+        """Poll up to max_records transactions across the assigned partitions."""
+        consumer = self._get_consumer(max_records)
+        records = consumer.poll(timeout_ms=int(timeout * 1000), max_records=max_records)
+
+        batch = []
+        for topic_partition, partition_records in records.items():
+            # Decoded here rather than by a value_deserializer, so a malformed message is skipped and
+            # committed with its batch instead of failing every poll of the partition
+            for record in partition_records:
+                try:
+                    batch.append(json.loads(record.value))
+                except Exception as e:
+                    PARSE_ERRORS.inc()
+                    print(f"Error parsing message at {topic_partition.topic}[{topic_partition.partition}] "
+                          f"offset {record.offset}: {str(e)}")
+            # First uncommitted record of each partition, where rollback() seeks back to
+            self.rewind_offsets.setdefault(topic_partition, partition_records[0].offset)
+            # The committed offset is the next record to read
+            self.pending_offsets[topic_partition] = self.kafka.OffsetAndMetadata(
+                partition_records[-1].offset + 1, None
+            )
+        return batch
+
+    def backlog(self):
+        """Records between the read position and the last known high watermark of each partition."""
+        if self.consumer is None:
+            return 0
+        lag = 0
+        for topic_partition in self.consumer.assignment():
+            highwater = self.consumer.highwater(topic_partition)
+            if highwater is not None:
+                lag += max(0, highwater - self.consumer.position(topic_partition))
+        return lag
+
+    def commit(self):
+        """Commit the offsets of all polled batches."""
+        if self.consumer is not None and self.pending_offsets:
+            self.consumer.commit(offsets=self.pending_offsets)
+            self.pending_offsets = {}
+            self.rewind_offsets = {}
+
+    def rollback(self):
+        """Seek back to the first uncommitted record of each partition, so the polled batches are redelivered."""
+        if self.consumer is not None:
+            for topic_partition, offset in self.rewind_offsets.items():
+                self.consumer.seek(topic_partition, offset)
+        self.pending_offsets = {}
+        self.rewind_offsets = {}
+
+    def cleanup(self):
+        """Retention is handled by the broker."""
+
+    def close(self):
+        """Flush pending sends and close the Kafka clients."""
+        if self.producer is not None:
+            self.producer.flush()
+            self.producer.close()
+            self.producer = None
+        if self.consumer is not None:
+            self.consumer.close()
+            self.consumer = None
+
+
+class FakeBroker:
+    """
+    In-process stand-in for a Kafka cluster.
+
+    Topics are lists of partitions and committed offsets are tracked per
+    consumer group, which is enough to exercise the pipeline offline.
+    """
+
+    def __init__(self, num_partitions=4):
+        self.num_partitions = num_partitions
+        self.topics = {}
+        self.committed = {}
+        self.condition = threading.Condition()
+
+    def _partitions(self, topic):
+        if topic not in self.topics:
+            self.topics[topic] = [[] for _ in range(self.num_partitions)]
+        return self.topics[topic]
+
+    def append(self, topic, key, value):
+        """Append a record to the partition chosen by its key."""
+        with self.condition:
+            partitions = self._partitions(topic)
+            partitions[partition_for(key, len(partitions))].append(value)
+            self.condition.notify_all()
+
+    def fetch(self, topic, positions, max_records, timeout):
+        """
+        Read up to max_records from the given {partition: offset} positions.
+
+        Returns:
+            list: (partition, offset, value) tuples
+        """
+        deadline = time.time() + timeout
+        with self.condition:
+            while True:
+                partitions = self._partitions(topic)
+                records = []
+                for partition, offset in positions.items():
+                    available = partitions[partition][offset:offset + max_records - len(records)]
+                    records.extend((partition, offset + i, value) for i, value in enumerate(available))
+                    if len(records) >= max_records:
+                        break
+                remaining = deadline - time.time()
+                if records or remaining <= 0:
+                    return records
+                self.condition.wait(remaining)
+
+    def end_offset(self, topic, partition):
+        """Offset the next record appended to a partition will get."""
+        with self.condition:
+            return len(self._partitions(topic)[partition])
+
+    def commit(self, group_id, topic, offsets):
+        """Store committed {partition: next offset} positions for a group."""
+        with self.condition:
+            for partition, offset in offsets.items():
+                self.committed[(group_id, topic, partition)] = offset
+
+    def committed_offset(self, group_id, topic, partition):
+        """Return the committed offset of a partition, 0 if none."""
+        with self.condition:
+            return self.committed.get((group_id, topic, partition), 0)
+
+
+# Shared broker for TRANSPORT=memory within one process
+default_broker = FakeBroker()
+
+
+class MemoryTransport:
+    """Transport backed by a FakeBroker, with the same commit semantics as Kafka."""
+
+    def __init__(self, broker, topic, group_id, partitions=None):
+        self.broker = broker
+        self.topic = topic
+        self.group_id = group_id
+        self.partitions = partitions if partitions else list(range(broker.num_partitions))
+        self.positions = None
+        self.pending_offsets = {}
+
+    def send(self, transaction):
+        """Append a transaction to the fake topic."""
+        self.broker.append(self.topic, transaction['id'], transaction)
+        return True
+
+    def send_records(self, records):
+        """Append each record of a RECORD_DTYPE array to the fake topic."""
+        for transaction in records_to_transactions(records):
+            self.send(transaction)
+        return True
+
+    def flush(self):
+        """Appends are synchronous, nothing to flush."""
+
+    def poll(self, max_records, timeout):
+        """Fetch up to max_records transactions from the assigned partitions."""
+        if self.positions is None:
+            # Resume from the group's committed offsets
+            self.positions = {
+                partition: self.broker.committed_offset(self.group_id, self.topic, partition)
+                for partition in self.partitions
+            }
+        records = self.broker.fetch(self.topic, self.positions, max_records, timeout)
+        for partition, offset, _ in records:
+            self.positions[partition] = offset + 1
+            self.pending_offsets[partition] = offset + 1
+        return [value for _, _, value in records]
+
+    def backlog(self):
+        """Records appended to the assigned partitions but not yet polled."""
+        if self.positions is None:
+            return 0
+        return sum(
+            self.broker.end_offset(self.topic, partition) - position
+            for partition, position in self.positions.items()
+        )
+
+    def commit(self):
+        """Commit the offsets of all polled batches."""
+        if self.pending_offsets:
+            self.broker.commit(self.group_id, self.topic, self.pending_offsets)
+            self.pending_offsets = {}
+
+    def rollback(self):
+        """Resume from the committed offsets, so the polled batches are fetched again."""
+        self.positions = None
+        self.pending_offsets = {}
+
+    def cleanup(self):
+        """The fake broker keeps everything in memory."""
+
+    def close(self):
+        """Nothing to release for the memory transport."""
+
+
+def create_transport(kind=None, transactions_dir=None):
+    """
+    Create the transport selected by the TRANSPORT environment variable.
+
+    Args:
+        kind (str): Override for TRANSPORT ('file', 'segment', 'kafka' or 'memory')
+        transactions_dir (str): Directory for the file and segment transports
+
+    Returns:
+        Transport with send/send_records/flush/poll/backlog/commit/rollback/cleanup/close
+    """
+    kind = kind or TRANSPORT
+    transactions_dir = transactions_dir or os.path.join(project_root, 'transactions')
+    if kind == 'file':
+        return FileTransport(transactions_dir)
+    if kind == 'segment':
+        return SegmentTransport(
+            os.path.join(transactions_dir, 'segments'),
+            max_segment_bytes=SEGMENT_MAX_BYTES,
+            max_segment_age=SEGMENT_MAX_AGE,
+            retention=SEGMENT_RETENTION,
+            record_format=RECORD_FORMAT
+        )
+    if kind == 'kafka':
+        partitions = None
+        if KAFKA_PARTITIONS:
+            partitions = [int(partition) for partition in KAFKA_PARTITIONS.split(',')]
+        return KafkaTransport(
+            KAFKA_BOOTSTRAP_SERVERS, KAFKA_TOPIC, KAFKA_GROUP_ID,
+            partitions=partitions,
+            compression_type=KAFKA_COMPRESSION,
+            linger_ms=KAFKA_LINGER_MS,
+            batch_bytes=KAFKA_BATCH_BYTES
+        )
+    if kind == 'memory':
+        return MemoryTransport(default_broker, KAFKA_TOPIC, KAFKA_GROUP_ID)
+    raise ValueError(f"Unknown transport: {kind}")
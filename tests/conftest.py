@@ -0,0 +1,63 @@
+import os
+import sys
+import uuid
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+# Get the absolute path to the project root directory
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Offline defaults, set before the consumer modules read their configuration
+os.environ.setdefault('ALERT_SENDER', 'stub')
+os.environ.setdefault('MODEL_BACKEND', 'numpy')
+os.environ.setdefault('METRICS_PORT', '0')
+os.environ.setdefault('CASCADE', '0')
+os.environ.setdefault('HISTORY_DB', '')
+os.environ.setdefault('SHED_LOG', '')
+os.environ.setdefault('SCORING_WORKERS', '0')
+
+# Modules are imported the way the scripts import them
+for module_dir in ('alerting', 'consumer', 'model', 'monitoring', 'producer', 'streaming'):
+    module_path = os.path.join(project_root, module_dir)
+    if module_path not in sys.path:
+        sys.path.insert(0, module_path)
+
+
+def make_transactions(n, amounts=None, start=None, seed=0):
+    """n transaction dicts shaped like the producer's, one second apart."""
+    rng = np.random.default_rng(seed)
+    start = start or datetime.now()
+    transactions = []
+    for i in range(n):
+        features = {f'V{j + 1}': float(value) for j, value in enumerate(rng.standard_normal(28))}
+        amount = float(amounts[i]) if amounts is not None else float(round(rng.uniform(1, 500), 2))
+        features['Amount'] = amount
+        transactions.append({
+            'id': str(uuid.UUID(int=int(rng.integers(1 << 62)) << 64 | i)),
+            'timestamp': (start + timedelta(seconds=i)).isoformat(),
+            'entity_id': int(rng.integers(1, 1000)),
+            'amount': amount,
+            'is_fraud': 0,
+            'features': features,
+        })
+    return transactions
+
+
+@pytest.fixture
+def model_dir(tmp_path):
+    """Model directory with an unfitted feature pipeline and a small random NumPy model."""
+    from features import FeatureVectorizer
+
+    vectorizer = FeatureVectorizer()
+    vectorizer.save(str(tmp_path / 'feature_pipeline.json'))
+    rng = np.random.default_rng(42)
+    np.savez(
+        tmp_path / 'fraud_model.npz',
+        num_layers=np.array(1),
+        kernel_0=(rng.standard_normal((vectorizer.num_features, 1)) * 0.01).astype(np.float32),
+        bias_0=np.full(1, -3.0, dtype=np.float32),
+        activation_0=np.array('sigmoid'),
+    )
+    return str(tmp_path)
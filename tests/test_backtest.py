@@ -0,0 +1,14 @@
+import numpy as np
+
+from backtest import sweep
+
+
+def test_served_alerts_add_labelled_rows_the_model_misses():
+    scores = np.array([0.9, 0.1, 0.8, 0.2, 0.05], dtype=np.float32)
+    labels = np.array([True, True, False, False, False])
+    results = sweep(scores, labels, [0.5])
+
+    assert results['alerts'][0] == 2
+    assert results['true_positives'][0] == 1
+    # Serving also alerts on the labelled row scored 0.1
+    assert results['served_alerts'][0] == 3
@@ -0,0 +1,104 @@
+import os
+
+import numpy as np
+
+from cascade import CascadeModel, cascade_summary
+from conftest import make_transactions
+from features import FEATURE_COLUMNS
+from prediction_cache import PredictionCache
+from prefilter import Prefilter
+from scoring import FRAUD_THRESHOLD, load_model, load_vectorizer, model_files, score_batch
+
+
+class RecordingModel:
+    """Full model returning a fixed probability and recording the rows it was sent."""
+
+    def __init__(self, probability):
+        self.probability = probability
+        self.calls = []
+
+    def predict_on_batch(self, features):
+        self.calls.append(features.copy())
+        return np.full((len(features), 1), self.probability, dtype=np.float32)
+
+
+def cascade(model, audit_rate=0.0, seed=0):
+    # Prefilter probability is sigmoid(Amount): below 0.4 cleared, above 0.9 fraud
+    prefilter = Prefilter(['Amount'], [1.0], 0.0, low=0.4, high=0.9)
+    return CascadeModel(model, prefilter, FEATURE_COLUMNS, FRAUD_THRESHOLD, audit_rate=audit_rate, seed=seed)
+
+
+def features_with_logits(logits):
+    features = np.zeros((len(logits), len(FEATURE_COLUMNS)), dtype=np.float32)
+    features[:, FEATURE_COLUMNS.index('Amount')] = logits
+    return features
+
+
+def test_rows_are_routed_by_band_and_threshold():
+    model = RecordingModel(0.8)
+    cascade_model = cascade(model)
+    # Cleared; in the legit band but above the serving threshold; uncertain; decided fraud
+    features = features_with_logits([-3.0, -0.6, 0.5, 5.0])
+    predictions = cascade_model.predict_on_batch(features)
+
+    assert len(model.calls) == 1
+    assert model.calls[0][:, FEATURE_COLUMNS.index('Amount')].tolist() == [np.float32(-0.6), np.float32(0.5)]
+    assert predictions[0] == np.float32(1 / (1 + np.exp(3.0)))
+    assert predictions[1:3].tolist() == [np.float32(0.8)] * 2
+    assert predictions[3] > 0.99
+    assert cascade_model.counts == {
+        'rows': 4, 'cleared': 1, 'decided_fraud': 1, 'model_rows': 2, 'model_flagged': 2,
+        'audited': 0, 'audit_flagged': 0,
+    }
+
+
+def test_audit_sample_counts_and_recall_estimate():
+    model = RecordingModel(0.8)
+    cascade_model = cascade(model, audit_rate=0.25, seed=7)
+    logits = np.r_[np.full(800, -3.0), np.full(200, 0.5)]
+    cascade_model.predict_on_batch(features_with_logits(logits))
+
+    counts = cascade_model.counts
+    assert 100 < counts['audited'] < 300
+    assert counts['cleared'] + counts['audited'] == 800
+    assert counts['model_rows'] == 200 + counts['audited']
+    assert counts['model_flagged'] == 200
+    # The full model flags every audited row, so each one stands for cleared / audited missed frauds
+    assert counts['audit_flagged'] == counts['audited']
+    summary = cascade_summary(counts)
+    caught = 200 + counts['audit_flagged']
+    assert summary['estimated_recall'] == caught / (caught + counts['cleared'])
+    assert summary['prefilter_pass_rate'] == (1000 - counts['cleared']) / 1000
+
+
+def test_cached_batches_are_still_counted_by_every_stage():
+    model = RecordingModel(0.8)
+    cascade_model = cascade(model)
+    cache = PredictionCache([], max_entries=100)
+    features = features_with_logits([-3.0, 0.5, 0.6, 5.0])
+
+    first = cascade_model.predict_on_batch(features, cache)
+    second = cascade_model.predict_on_batch(features, cache)
+
+    np.testing.assert_array_equal(first, second)
+    assert len(model.calls) == 1  # The repeat was served from the cache
+    assert cache.get_stats()['hits'] == 2
+    assert cascade_model.counts['rows'] == 8
+    assert cascade_model.counts['cleared'] == 2
+    assert cascade_model.counts['decided_fraud'] == 2
+    assert cascade_model.counts['model_rows'] == 4
+
+
+def test_score_batch_puts_the_cache_behind_the_prefilter(model_dir):
+    Prefilter(['Amount'], [0.01], -2.0, low=0.1, high=0.9).save(os.path.join(model_dir, 'prefilter.json'))
+    model = load_model(model_dir, 'numpy', cascade=True)
+    cache = PredictionCache(model_files(model_dir, 'numpy'), max_entries=1000)
+    transactions = make_transactions(100)
+
+    first = score_batch(model, load_vectorizer(model_dir), transactions, cache=cache)
+    second = score_batch(model, load_vectorizer(model_dir), transactions, cache=cache)
+
+    np.testing.assert_array_equal(first, second)
+    assert model.counts['rows'] == 200
+    assert model.counts['model_rows'] > 0
+    assert cache.get_stats()['misses'] == model.counts['model_rows'] // 2
@@ -0,0 +1,25 @@
+import numpy as np
+
+from dashboard_state import WindowCounters
+
+
+def test_old_out_of_order_event_does_not_reset_live_bucket():
+    windows = WindowCounters(horizon=3600)
+    now = 1_700_000_000.0
+    windows.add(np.array([now, now]), np.array([10.0, 20.0]), np.array([False, True]), now=now)
+
+    # Maps to the same slot as `now`, one horizon earlier
+    windows.add(np.array([now - 3600]), np.array([99.0]), np.array([True]), now=now)
+
+    assert windows.totals(60, now) == (2, 1, 30.0, 20.0)
+    assert windows.late == 1
+
+
+def test_batch_mixing_live_and_expired_events():
+    windows = WindowCounters(horizon=3600)
+    now = 1_700_000_000.0
+    timestamps = np.array([now - 7200, now - 10, now - 3600, now])
+    windows.add(timestamps, np.array([1.0, 2.0, 4.0, 8.0]), np.array([True, False, True, False]), now=now)
+
+    assert windows.totals(3600, now) == (2, 0, 10.0, 0.0)
+    assert windows.late == 2
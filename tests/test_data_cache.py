@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+
+from data_cache import add_velocity_columns, build_cache, load_cache
+
+# Adjacent IDs that round to the same float32
+LARGE_IDS = [2**24, 2**24 + 1]
+
+
+def write_csv(path, entities):
+    with open(path, 'w') as f:
+        f.write('Time,Amount,card_id,Class\n')
+        for i, entity in enumerate(entities):
+            f.write(f'{i},{10.0 * (i + 1)},{entity},0\n')
+
+
+def test_entity_ids_above_float32_precision_stay_distinct(tmp_path):
+    csv_path = tmp_path / 'data.csv'
+    cache_dir = str(tmp_path / 'cache')
+    write_csv(csv_path, LARGE_IDS * 2)
+
+    build_cache(str(csv_path), cache_dir, int_columns=['card_id'])
+    cache = load_cache(cache_dir)
+    assert cache['card_id'].dtype == np.int64
+    assert cache['card_id'].tolist() == LARGE_IDS * 2
+
+    add_velocity_columns(cache_dir, 'card_id')
+    cache = load_cache(cache_dir)
+    # Each card's second transaction sees only that card's first one
+    assert cache['count_1m'].tolist() == [0, 0, 1, 1]
+    assert cache['sum_1m'].tolist() == [0.0, 0.0, 10.0, 20.0]
+
+
+def test_float_entity_column_is_rejected_and_rebuilt(tmp_path):
+    csv_path = tmp_path / 'data.csv'
+    cache_dir = str(tmp_path / 'cache')
+    write_csv(csv_path, LARGE_IDS)
+
+    build_cache(str(csv_path), cache_dir)
+    with pytest.raises(ValueError):
+        add_velocity_columns(cache_dir, 'card_id')
+
+    manifest = build_cache(str(csv_path), cache_dir, int_columns=['card_id'])
+    assert manifest['int_columns'] == ['card_id']
+    assert load_cache(cache_dir)['card_id'].dtype == np.int64
@@ -0,0 +1,127 @@
+import numpy as np
+
+import dedup
+from conftest import make_transactions
+from dedup import EXACT_ENTRY_BYTES, BloomGeneration, DedupIndex, ExactGeneration, transaction_keys
+from dispatcher import AlertDispatcher, StubSender
+from records import transactions_to_records
+from scoring_service import ScoringService
+from transport import FakeBroker, MemoryTransport
+
+
+class Clock:
+    """Stand-in for the time module, advanced by hand."""
+
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def time(self):
+        return self.now
+
+
+def random_keys(n, seed):
+    return np.random.default_rng(seed).integers(0, 2 ** 63, size=(n, 2), dtype=np.uint64)
+
+
+def test_exact_index_flags_seen_and_repeated_ids():
+    index = DedupIndex(fp_rate=0, name='test-exact')
+    transactions = make_transactions(20)
+    keys = transaction_keys(transactions)
+    # Dicts and records of the same transactions share keys
+    assert np.array_equal(keys, transaction_keys(transactions_to_records(transactions)))
+
+    assert not index.seen(keys[:10]).any()
+    index.add(keys[:10])
+    batch = np.concatenate([keys[5:15], keys[12:13]])
+    assert index.seen(batch).tolist() == [True] * 5 + [False] * 5 + [True]
+
+    stats = index.get_stats()
+    assert stats['mode'] == 'exact'
+    assert stats['entries'] == 10
+    assert (stats['hits'], stats['misses']) == (6, 15)
+
+
+def test_generations_expire_after_retention(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(dedup, 'time', clock)
+    index = DedupIndex(retention=60, num_buckets=6, name='test-expiry')
+    old, recent = random_keys(50, 1), random_keys(50, 2)
+
+    index.add(old)
+    clock.now += 30
+    index.add(recent)
+    assert index.seen(old).all() and index.seen(recent).all()
+
+    # Once the generation after it is a full retention old, the first is dropped whole
+    clock.now += 29
+    index.add(random_keys(1, 3))
+    assert index.seen(old).all()
+    clock.now += 36
+    index.add(random_keys(1, 3))
+    assert not index.seen(old).any()
+    assert index.seen(recent).all()
+    assert index.get_stats()['generations'] <= 6
+
+
+def test_exact_index_falls_back_to_bloom_at_the_memory_cap(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(dedup, 'time', clock)
+    # 100 exact IDs fit in each of the 4 generations
+    index = DedupIndex(retention=3600, max_bytes=4 * 100 * EXACT_ENTRY_BYTES, num_buckets=4,
+                       fallback_fp_rate=0.01, name='test-fallback')
+    first, burst = random_keys(100, 1), random_keys(1000, 2)
+
+    index.add(first)
+    index.add(burst)
+    assert isinstance(index.generations[0][1], ExactGeneration)
+    assert isinstance(index.generations[-1][1], BloomGeneration)
+    assert index.get_stats()['mode'] == 'bloom'
+    assert index.get_stats()['early_rotations'] == 1
+    # Nothing seen is forgotten and the cap holds, where exact sets would have needed 10 more generations
+    assert index.seen(first).all() and index.seen(burst).all()
+    assert index.nbytes() <= index.max_bytes
+    assert index.seen(random_keys(1000, 3)).mean() < 0.05
+
+    # A generation that lasts its whole bucket goes back to exact IDs
+    clock.now += index.bucket_seconds
+    index.add(random_keys(10, 4))
+    assert isinstance(index.generations[-1][1], ExactGeneration)
+
+
+def test_duplicates_redelivered_after_a_rollback_are_skipped(model_dir, tmp_path):
+    broker = FakeBroker()
+    producer = MemoryTransport(broker, 'transactions', 'test')
+    for transaction in make_transactions(300, amounts=[5000.0] * 300):
+        producer.send(transaction)
+    consumer = MemoryTransport(broker, 'transactions', 'test')
+    sender = StubSender()
+    service = ScoringService(
+        transport=consumer, alert_dispatcher=AlertDispatcher(sender), model_directory=model_dir,
+        cascade=False, checkpoint_dir=str(tmp_path / 'checkpoints'), history_db=None
+    )
+    process_batch = service.process_batch
+
+    def fail_after_scoring(transactions, columns):
+        # Scored, logged and alerted, then the step fails before its commit
+        service.process_batch = process_batch
+        process_batch(transactions, columns)
+        raise RuntimeError("lost the broker before the commit")
+
+    service.process_batch = fail_after_scoring
+    try:
+        try:
+            service.step()
+            assert False, "step error was swallowed"
+        except RuntimeError:
+            pass
+        scored = service.state['total_transactions']
+        assert scored > 0
+
+        # The transport redelivers the rolled-back batch; dedup drops it instead of rescoring it
+        for _ in range(10):
+            service.step()
+        assert consumer.backlog() == 0
+        assert service.state['total_transactions'] == 300
+        assert service.dedup.get_stats()['hits'] == scored
+    finally:
+        service.close()
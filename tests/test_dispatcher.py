@@ -0,0 +1,51 @@
+import queue
+
+from dispatcher import AlertDispatcher, StubSender
+
+
+def paused_dispatcher(max_queue, policy='drop_oldest'):
+    """Dispatcher whose background thread is stopped, so the queue only changes through submit()."""
+    dispatcher = AlertDispatcher(StubSender(), max_queue=max_queue, policy=policy)
+    dispatcher.running = False
+    dispatcher.thread.join()
+    return dispatcher
+
+
+def alert(i):
+    return {'id': str(i), 'amount': float(i), 'timestamp': '2024-01-01T00:00:00', 'prediction': 0.9}
+
+
+def test_drop_oldest_queue_full_counts_each_lost_alert_once():
+    dispatcher = paused_dispatcher(max_queue=2)
+    results = [dispatcher.submit(alert(i)) for i in range(5)]
+    assert results == [True] * 5
+    stats = dispatcher.get_stats()
+    assert stats['submitted'] == 5
+    assert stats['dropped'] == 3
+    assert [dispatcher.queue.get_nowait()['id'] for _ in range(2)] == ['3', '4']
+    dispatcher.executor.shutdown()
+
+
+class RacingQueue(queue.Queue):
+    """Full for put_nowait, but already drained by the time submit() tries to evict."""
+
+    def put_nowait(self, item):
+        raise queue.Full
+
+    def get_nowait(self):
+        raise queue.Empty
+
+
+def test_drop_oldest_counts_only_the_new_alert_when_nothing_was_evicted():
+    dispatcher = paused_dispatcher(max_queue=1)
+    dispatcher.queue = RacingQueue()
+    assert dispatcher.submit(alert(0)) is False
+    assert dispatcher.get_stats()['dropped'] == 1
+    dispatcher.executor.shutdown()
+
+
+def test_drop_newest_queue_full():
+    dispatcher = paused_dispatcher(max_queue=2, policy='drop_newest')
+    assert [dispatcher.submit(alert(i)) for i in range(4)] == [True, True, False, False]
+    assert dispatcher.get_stats()['dropped'] == 2
+    dispatcher.executor.shutdown()
@@ -0,0 +1,70 @@
+import numpy as np
+
+from feature_store import VELOCITY_FEATURES, VelocityFeatureStore
+
+
+def features_by_name(row):
+    return dict(zip(VELOCITY_FEATURES, row.tolist()))
+
+
+def test_windows_count_activity_before_each_event():
+    store = VelocityFeatureStore(max_entities=100)
+    timestamps = np.array([0, 30, 90, 700, 3000, 4000])
+    amounts = np.array([10, 20, 5, 7, 1, 3])
+    features = store.update(np.full(len(timestamps), 7), timestamps, amounts)
+
+    first, same_minute, next_minute, later, end_of_hour, next_hour = map(features_by_name, features)
+    assert set(first.values()) == {0}
+    # Same minute: in every window
+    assert (same_minute['count_1m'], same_minute['sum_1m'], same_minute['max_1m']) == (1, 10, 10)
+    assert (same_minute['count_1h'], same_minute['sum_1h']) == (1, 10)
+    # A minute later: out of the 1m window, still in 10m and 1h
+    assert next_minute['count_1m'] == 0
+    assert (next_minute['count_10m'], next_minute['sum_10m'], next_minute['max_10m']) == (2, 30, 20)
+    assert (later['count_10m'], later['count_1h'], later['sum_1h'], later['max_1h']) == (0, 3, 35, 20)
+    assert (end_of_hour['count_1h'], end_of_hour['sum_1h']) == (4, 42)
+    # The first ten minutes have left the 1h window
+    assert (next_hour['count_1h'], next_hour['sum_1h'], next_hour['max_1h']) == (2, 8, 7)
+
+
+def test_entities_are_independent_and_unknown_entities_get_no_features():
+    store = VelocityFeatureStore(max_entities=100)
+    features = store.update(np.array([1, 2, 1, 0, 0]), np.full(5, 60), np.array([5, 6, 7, 8, 9]))
+    assert features[:, VELOCITY_FEATURES.index('count_1m')].tolist() == [0, 0, 1, 0, 0]
+    assert store.get_stats()['entities'] == 2
+
+
+def test_full_store_evicts_least_recently_seen_outside_the_batch():
+    store = VelocityFeatureStore(max_entities=4)
+    store.update(np.array([1]), np.array([600]), np.array([1.0]))
+    store.update(np.array([2, 3, 4]), np.array([1200, 1200, 1200]), np.array([1.0, 1.0, 1.0]))
+
+    # Entity 1 is the least recently seen but is in the batch, so one of the others makes way
+    features = store.update(np.array([1, 5]), np.array([1800, 1800]), np.array([1.0, 1.0]))
+    assert features[0, VELOCITY_FEATURES.index('count_1h')] == 1
+    assert 1 in store.slots and 5 in store.slots
+    assert store.get_stats()['evicted'] == 1
+
+
+def test_new_entities_of_one_batch_never_share_a_slot():
+    store = VelocityFeatureStore(max_entities=4)
+    store.update(np.array([1, 2, 3, 4]), np.full(4, 6000), np.ones(4))
+
+    # Entity 5's late event makes it the least recently seen as soon as it has a slot;
+    # entity 6 must not evict it and inherit its buckets
+    features = store.update(np.array([5, 6]), np.array([3000, 6000]), np.array([50.0, 1.0]))
+    assert not features.any()
+    assert store.slots[5] != store.slots[6]
+    assert len(store.slots) == store.capacity == 4
+
+    features = store.update(np.array([5, 6]), np.array([6000, 6000]), np.array([1.0, 1.0]))
+    assert features_by_name(features[0])['sum_1h'] == 50
+    assert features_by_name(features[1])['sum_1h'] == 1
+
+
+def test_batch_with_more_new_entities_than_capacity_keeps_the_rest_unknown():
+    store = VelocityFeatureStore(max_entities=4)
+    entities = np.array([1, 2, 3, 4, 5, 6, 1, 6])
+    features = store.update(entities, np.full(8, 60), np.ones(8))
+    assert len(store.slots) == 4
+    assert features[:, VELOCITY_FEATURES.index('count_1m')].tolist() == [0, 0, 0, 0, 0, 0, 1, 0]
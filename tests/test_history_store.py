@@ -0,0 +1,105 @@
+import sqlite3
+import time
+
+import numpy as np
+import pytest
+
+from conftest import make_transactions
+from dedup import transaction_keys
+from history_store import HistoryReader, HistoryWriter
+
+
+def scored_batch(n, timestamps, amounts, is_fraud, seed=0):
+    """Arguments of HistoryWriter.submit() for n scored transactions."""
+    keys = transaction_keys(make_transactions(n, seed=seed))
+    return (keys, np.asarray(timestamps, dtype=np.float64), np.asarray(amounts, dtype=np.float64),
+            np.full(n, 0.5, dtype=np.float32), np.asarray(is_fraud, dtype=bool), np.zeros(n, dtype=bool))
+
+
+@pytest.fixture
+def history_path(tmp_path):
+    return str(tmp_path / 'history.db')
+
+
+def test_minute_rollup_matches_raw_rows(history_path):
+    rng = np.random.default_rng(1)
+    start = 1_700_000_000.0
+    writer = HistoryWriter(history_path, retention=0)
+    batches = []
+    for seed in range(5):
+        n = 400
+        batches.append(scored_batch(
+            n, start + rng.uniform(0, 600, n), rng.uniform(1, 500, n).round(2), rng.random(n) < 0.1, seed=seed
+        ))
+        writer.submit(*batches[-1])
+    # A redelivered batch: its IDs are already stored, so its minutes are recounted from the table
+    writer.submit(*batches[2])
+    writer.close()
+    assert writer.get_stats()['written'] == 6 * 400
+
+    connection = sqlite3.connect(history_path)
+    raw = connection.execute(
+        'SELECT CAST(timestamp / 60 AS INTEGER), COUNT(*), SUM(is_fraud), SUM(amount), SUM(amount * is_fraud) '
+        'FROM scored GROUP BY 1 ORDER BY 1'
+    ).fetchall()
+    rollup = connection.execute('SELECT * FROM minute_stats ORDER BY minute').fetchall()
+    connection.close()
+    assert [row[:3] for row in rollup] == [row[:3] for row in raw]
+    np.testing.assert_allclose([row[3:] for row in rollup], [row[3:] for row in raw], rtol=1e-9)
+
+    timestamps, amounts, is_fraud = (np.concatenate([batch[i] for batch in batches]) for i in (1, 2, 4))
+    reader = HistoryReader(history_path)
+    try:
+        count, fraud_count, amount, fraud_amount = reader.totals(start, start + 660)
+        assert (count, fraud_count) == (2000, int(is_fraud.sum()))
+        assert amount == pytest.approx(amounts.sum())
+        assert fraud_amount == pytest.approx(amounts[is_fraud].sum())
+        rates = reader.fraud_rate_per_minute(hours=1, now=start + 660)
+        assert rates['count'].sum() == 2000
+    finally:
+        reader.close()
+
+
+def test_top_amounts_are_largest_first_within_the_window(history_path):
+    now = time.time()
+    rng = np.random.default_rng(2)
+    n = 500
+    timestamps = now - rng.uniform(0, 48 * 3600, n)
+    amounts = rng.uniform(1, 1000, n).round(2)
+    is_fraud = rng.random(n) < 0.2
+    # The largest amount of all is outside the 24 hour window
+    timestamps[0], amounts[0] = now - 30 * 3600, 10_000.0
+    writer = HistoryWriter(history_path, retention=0)
+    writer.submit(*scored_batch(n, timestamps, amounts, is_fraud))
+    writer.close()
+
+    in_window = timestamps >= now - 24 * 3600
+    reader = HistoryReader(history_path)
+    try:
+        top = [row['amount'] for row in reader.top_amounts(n=10, hours=24, now=now)]
+        assert top == sorted(amounts[in_window], reverse=True)[:10]
+        assert 10_000.0 not in top
+
+        fraud_rows = reader.top_amounts(n=5, hours=24, fraud_only=True, now=now)
+        assert [row['amount'] for row in fraud_rows] == sorted(amounts[in_window & is_fraud], reverse=True)[:5]
+        assert all(row['status'] == '🚨 FRAUD' for row in fraud_rows)
+
+        assert len(reader.top_amounts(n=10, hours=48, now=now)) == 10
+        assert reader.top_amounts(n=10, hours=48, now=now)[0]['amount'] == 10_000.0
+    finally:
+        reader.close()
+
+
+def test_full_queue_drops_and_counts_batches(history_path):
+    writer = HistoryWriter(history_path, max_queue=2, retention=0)
+    writer.close()  # Writer stopped, so nothing drains the queue
+
+    assert writer.submit(*scored_batch(10, np.full(10, 1e9), np.ones(10), np.zeros(10), seed=1))
+    assert writer.submit(*scored_batch(20, np.full(20, 1e9), np.ones(20), np.zeros(20), seed=2))
+    assert not writer.submit(*scored_batch(30, np.full(30, 1e9), np.ones(30), np.zeros(30), seed=3))
+    assert not writer.submit(*scored_batch(5, np.full(5, 1e9), np.ones(5), np.zeros(5), seed=4))
+
+    stats = writer.get_stats()
+    assert stats['dropped'] == 35
+    assert stats['queue_depth'] == 2
+    assert stats['written'] == 0
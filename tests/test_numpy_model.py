@@ -0,0 +1,81 @@
+import numpy as np
+import pytest
+
+from numpy_model import NumpyModel, export_weights
+
+
+class FakeLayer:
+    """The parts of a Keras layer export_weights reads."""
+
+    def __init__(self, name, weights=(), activation=None):
+        self.name = name
+        self.weights = list(weights)
+        self.activation = activation
+
+    def get_weights(self):
+        return self.weights
+
+    def get_config(self):
+        return {'activation': self.activation}
+
+
+class FakeModel:
+    def __init__(self, layers):
+        self.layers = layers
+
+
+def reference_forward(x, layers):
+    """Float64 forward pass of (kernel, bias, activation name) layers."""
+    x = x.astype(np.float64)
+    for kernel, bias, activation in layers:
+        x = x @ kernel + bias
+        if activation == 'relu':
+            x = np.maximum(x, 0)
+        elif activation == 'sigmoid':
+            x = 1 / (1 + np.exp(-x))
+    return x
+
+
+def test_npz_round_trip(tmp_path):
+    rng = np.random.default_rng(0)
+    spec = [(30, 64, 'relu'), (64, 32, 'relu'), (32, 1, 'sigmoid')]
+    weights = [
+        ((rng.standard_normal((n_in, n_out)) / np.sqrt(n_in)).astype(np.float32),
+         (rng.standard_normal(n_out) * 0.1).astype(np.float32), activation)
+        for n_in, n_out, activation in spec
+    ]
+    layers = [FakeLayer('dense_0', weights[0][:2], 'relu'), FakeLayer('dropout')]
+    layers += [FakeLayer(f'dense_{i}', w[:2], w[2]) for i, w in enumerate(weights[1:], start=1)]
+    path = tmp_path / 'fraud_model.npz'
+    export_weights(FakeModel(layers), str(path))
+
+    model = NumpyModel.load(str(path))
+    assert len(model.layers) == 3  # Dropout has no weights and is dropped
+    for (kernel, bias, _), (expected_kernel, expected_bias, _) in zip(model.layers, weights):
+        np.testing.assert_array_equal(kernel, expected_kernel)
+        np.testing.assert_array_equal(bias, expected_bias)
+
+    x = rng.standard_normal((256, 30)).astype(np.float32)
+    predictions = model.predict(x)
+    assert predictions.shape == (256, 1) and predictions.dtype == np.float32
+    np.testing.assert_allclose(predictions, reference_forward(x, weights), atol=1e-5)
+
+
+def test_unsupported_activation_is_rejected(tmp_path):
+    layer = FakeLayer('dense', (np.ones((2, 1), np.float32), np.zeros(1, np.float32)), 'tanh')
+    with pytest.raises(ValueError):
+        export_weights(FakeModel([layer]), str(tmp_path / 'model.npz'))
+
+
+def test_matches_keras_on_random_input(tmp_path):
+    tf = pytest.importorskip('tensorflow')
+    from train_model import build_model
+
+    tf.keras.utils.set_random_seed(0)
+    keras_model = build_model(30)
+    path = tmp_path / 'fraud_model.npz'
+    export_weights(keras_model, str(path))
+
+    x = np.random.default_rng(1).standard_normal((10_000, 30)).astype(np.float32) * 3
+    expected = keras_model.predict_on_batch(x)
+    np.testing.assert_allclose(NumpyModel.load(str(path)).predict_on_batch(x), expected, atol=1e-5)
@@ -0,0 +1,59 @@
+import os
+
+import numpy as np
+
+from conftest import make_transactions
+from dispatcher import AlertDispatcher, StubSender
+from features import FeatureVectorizer
+from prediction_cache import PredictionCache
+from scoring import load_model, model_files
+from scoring_service import ScoringService
+from transport import FakeBroker, MemoryTransport
+
+
+def touch(path):
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+def test_cache_is_invalidated_by_every_model_file(model_dir):
+    for name in ('fraud_model.npz', 'feature_pipeline.json'):
+        cache = PredictionCache(model_files(model_dir, 'numpy'), check_interval=0)
+        seed = cache.seed
+        cache.predict(load_model(model_dir, 'numpy'), np.zeros((4, 30), dtype=np.float32))
+        touch(os.path.join(model_dir, name))
+        assert cache.check_model()
+        assert cache.seed != seed
+        assert len(cache.entries) == 0
+
+    # A prefilter appearing changes the version too
+    cache = PredictionCache(model_files(model_dir, 'numpy'), check_interval=0)
+    with open(os.path.join(model_dir, 'prefilter.json'), 'w') as f:
+        f.write('{}')
+    assert cache.check_model()
+
+
+def test_reload_serves_new_feature_pipeline_with_new_weights(model_dir, tmp_path):
+    broker = FakeBroker()
+    producer = MemoryTransport(broker, 'transactions', 'test')
+    service = ScoringService(
+        transport=MemoryTransport(broker, 'transactions', 'test'), alert_dispatcher=AlertDispatcher(StubSender()),
+        model_directory=model_dir, cascade=False, checkpoint_dir=None, history_db=None
+    )
+    service.prediction_cache = PredictionCache(model_files(model_dir, 'numpy'), check_interval=0)
+    try:
+        # A retrain rewrites the feature pipeline next to the weights
+        vectorizer = FeatureVectorizer(mean=np.full(30, 0.5), scale=np.full(30, 2.0))
+        vectorizer.save(os.path.join(model_dir, 'feature_pipeline.json'))
+
+        transactions = make_transactions(50)
+        for transaction in transactions:
+            producer.send(transaction)
+        while service.state['total_transactions'] < len(transactions):
+            service.step()
+
+        # The pipeline change alone triggered the reload, before the first batch was scored
+        np.testing.assert_array_equal(service.vectorizer.scale, vectorizer.scale)
+        np.testing.assert_array_equal(service.vectorizer.mean, vectorizer.mean)
+    finally:
+        service.close()
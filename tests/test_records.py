@@ -0,0 +1,49 @@
+import numpy as np
+
+from conftest import make_transactions
+from feature_store import VELOCITY_FEATURES
+from features import FEATURE_COLUMNS, FeatureVectorizer
+from records import RECORD_DTYPE, read_records, records_to_transactions, transactions_to_records, write_records
+
+
+def test_json_to_records_and_back(tmp_path):
+    assert RECORD_DTYPE.itemsize == 152
+    transactions = make_transactions(50)
+    transactions[0]['is_fraud'] = 1
+    del transactions[1]['entity_id']
+
+    records = transactions_to_records(transactions)
+    path = str(tmp_path / 'batch.rec')
+    write_records(path, records)
+    with open(path, 'ab') as f:
+        f.write(b'\0' * 100)  # Partial record of an interrupted write
+    assert len(read_records(path)) == 50
+    restored = records_to_transactions(read_records(path))
+
+    for original, copy in zip(transactions, restored):
+        assert copy['id'] == original['id']
+        assert copy['timestamp'] == original['timestamp']
+        assert copy['entity_id'] == original.get('entity_id', 0)
+        assert copy['is_fraud'] == original['is_fraud']
+        assert np.isclose(copy['amount'], original['amount'], rtol=1e-6)
+        assert list(copy['features']) == [f'V{i + 1}' for i in range(28)]
+        np.testing.assert_allclose(
+            [copy['features'][name] for name in copy['features']],
+            [original['features'][name] for name in copy['features']], rtol=1e-6
+        )
+    assert restored[1]['entity_id'] == 0
+
+
+def test_vectorizer_record_path_matches_json_path():
+    columns = FEATURE_COLUMNS + VELOCITY_FEATURES
+    rng = np.random.default_rng(3)
+    vectorizer = FeatureVectorizer(
+        columns, mean=rng.normal(size=len(columns)), scale=rng.uniform(0.5, 2, size=len(columns))
+    )
+    transactions = make_transactions(200)
+    velocity = rng.uniform(0, 100, size=(200, len(VELOCITY_FEATURES))).astype(np.float32)
+
+    from_json = vectorizer.transform(transactions, velocity)
+    from_records = vectorizer.transform(transactions_to_records(transactions), velocity)
+    assert from_records.shape == (200, len(columns))
+    np.testing.assert_allclose(from_records, from_json, rtol=1e-5, atol=1e-5)
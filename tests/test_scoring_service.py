@@ -0,0 +1,146 @@
+import json
+from datetime import datetime, timedelta
+
+from backpressure import BackpressureController
+from conftest import make_transactions
+from dispatcher import AlertDispatcher, StubSender
+from scoring_service import ScoringService
+from transport import FakeBroker, MemoryTransport
+
+
+class FailingModel:
+    """Model whose every call raises, like a backend that lost its device."""
+
+    def predict_on_batch(self, features):
+        raise RuntimeError("model unavailable")
+
+
+def committed(broker, transport):
+    return sum(broker.committed_offset(transport.group_id, transport.topic, p) for p in transport.partitions)
+
+
+def test_scoring_failure_does_not_commit(model_dir, tmp_path):
+    broker = FakeBroker()
+    producer = MemoryTransport(broker, 'transactions', 'test')
+    for transaction in make_transactions(300):
+        producer.send(transaction)
+    consumer = MemoryTransport(broker, 'transactions', 'test')
+    service = ScoringService(
+        transport=consumer, alert_dispatcher=AlertDispatcher(StubSender()), model_directory=model_dir,
+        cascade=False, checkpoint_dir=str(tmp_path / 'checkpoints'), history_db=None
+    )
+    working_model = service.model
+    service.model = FailingModel()
+    try:
+        try:
+            service.step()
+            assert False, "scoring error was swallowed"
+        except RuntimeError:
+            pass
+        assert committed(broker, consumer) == 0
+        assert service.state['total_transactions'] == 0
+
+        # Once the model recovers the same transactions are redelivered and scored
+        service.model = working_model
+        for _ in range(10):
+            service.step()
+        assert committed(broker, consumer) == 300
+        assert service.state['total_transactions'] == 300
+        assert consumer.backlog() == 0
+    finally:
+        service.close()
+
+
+def overloaded_service(model_dir, tmp_path, amounts, **controller_options):
+    """Service behind a backlog starting an hour ago, scoring 100-row base batches and polling up to 400."""
+    broker = FakeBroker(num_partitions=1)  # One partition, so transactions are polled in the order sent
+    producer = MemoryTransport(broker, 'transactions', 'test')
+    transactions = make_transactions(len(amounts), amounts=amounts, start=datetime.now() - timedelta(hours=1))
+    for transaction in transactions:
+        producer.send(transaction)
+    consumer = MemoryTransport(broker, 'transactions', 'test')
+    service = ScoringService(
+        transport=consumer, alert_dispatcher=AlertDispatcher(StubSender()), model_directory=model_dir,
+        cascade=False, checkpoint_dir=str(tmp_path / 'checkpoints'), history_db=None,
+        shed_log=str(tmp_path / 'shed.jsonl')
+    )
+    service.backpressure = BackpressureController(100, 400, priority_amount=1000.01, **controller_options)
+    return broker, consumer, service, transactions
+
+
+def test_overloaded_high_amounts_are_scored_before_earlier_low_amounts(model_dir, tmp_path):
+    amounts = [10.0] * 1995 + [5000.0] * 5
+    broker, consumer, service, transactions = overloaded_service(
+        model_dir, tmp_path, amounts, shed_lag=0, max_defer_steps=10
+    )
+
+    # Step in which each transaction was scored
+    scored_at = {}
+    process_batch = service.process_batch
+
+    def recording_process_batch(batch, columns):
+        process_batch(batch, columns)
+        for transaction in batch:
+            assert transaction['id'] not in scored_at
+            scored_at[transaction['id']] = step
+
+    service.process_batch = recording_process_batch
+    try:
+        for step in range(100):
+            service.step()
+            if step == 3:
+                # Rows held back keep every poll after the first (scored whole) uncommitted
+                assert service.backpressure.get_stats()['deferred'] > 0
+                assert committed(broker, consumer) == 100
+            if len(scored_at) == len(transactions):
+                break
+
+        high = [scored_at[t['id']] for t in transactions[-5:]]
+        earlier_low = [scored_at[t['id']] for t in transactions[-300:-5]]
+        assert max(high) < min(earlier_low)
+        assert committed(broker, consumer) == len(transactions)
+        assert service.state['total_transactions'] == len(transactions)
+    finally:
+        service.close()
+
+
+def test_shed_transactions_are_logged_before_commit(model_dir, tmp_path):
+    amounts = [10.0] * 495 + [5000.0] * 5
+    broker, consumer, service, transactions = overloaded_service(model_dir, tmp_path, amounts, shed_lag=60)
+    try:
+        for _ in range(10):
+            service.step()
+        shed = service.backpressure.get_stats()['shed']
+        assert shed > 0
+        assert service.state['total_transactions'] + shed == len(transactions)
+        assert committed(broker, consumer) == len(transactions)
+
+        with open(tmp_path / 'shed.jsonl', 'r') as f:
+            logged = [json.loads(line) for line in f]
+        assert len(logged) == shed
+        assert {t['id'] for t in logged} <= {t['id'] for t in transactions[:-5]}
+    finally:
+        service.close()
+
+
+def test_sustained_overload_keeps_committing_and_snapshotting(model_dir, tmp_path):
+    broker, consumer, service, _ = overloaded_service(model_dir, tmp_path, [], shed_lag=0)
+    producer = MemoryTransport(broker, 'transactions', 'test')
+    service.checkpoint.interval = 0  # Snapshot whenever the state is committed
+    snapshots = []
+    snapshot = service.checkpoint.snapshot
+    service.checkpoint.snapshot = lambda state: (snapshots.append(1), snapshot(state))
+    start = datetime.now() - timedelta(hours=6)  # Still hours behind after the last step
+    try:
+        for step in range(100):
+            for transaction in make_transactions(150, start=start + timedelta(seconds=150 * step), seed=step):
+                producer.send(transaction)
+            service.step()
+
+        scored = service.state['total_transactions']
+        assert scored > 14_000
+        # At most one drain cycle of rows is ever uncommitted
+        assert committed(broker, consumer) >= scored - service.backpressure.max_batch - 150
+        assert len(snapshots) >= 100 // (service.backpressure.max_defer_steps + 1) - 1
+    finally:
+        service.close()
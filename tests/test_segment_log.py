@@ -0,0 +1,43 @@
+import json
+
+import pytest
+
+import segment_log
+from conftest import make_transactions
+from records import transactions_to_records
+from segment_log import JSON_SUFFIX, RECORD_SUFFIX, SegmentReader, SegmentWriter
+
+
+@pytest.mark.parametrize('suffix', [JSON_SUFFIX, RECORD_SUFFIX])
+def test_tail_flushed_by_rotation_is_not_skipped(tmp_path, monkeypatch, suffix):
+    directory = str(tmp_path / 'segments')
+    writer = SegmentWriter(directory, suffix=suffix)
+    reader = SegmentReader(directory, str(tmp_path / 'offset.json'), suffix=suffix)
+    transactions = make_transactions(6)
+
+    def append(rows):
+        if suffix == RECORD_SUFFIX:
+            writer.append_bytes(transactions_to_records(rows).tobytes())
+        else:
+            writer.append([json.dumps(t).encode('utf-8') for t in rows])
+
+    def read():
+        return len(reader.read_records(100) if suffix == RECORD_SUFFIX else reader.read(100))
+
+    append(transactions[:3])
+    writer.flush()
+    assert read() == 3
+
+    # The tail is still in the writer's buffer; it rotates (flushing the tail) just after
+    # the reader's empty read of the current segment, before the reader looks for a newer one
+    append(transactions[3:])
+    list_segments = segment_log.list_segments
+
+    def rotating_list_segments(*args):
+        if writer.segment_bytes:
+            writer.rotate()
+        return list_segments(*args)
+
+    monkeypatch.setattr(segment_log, 'list_segments', rotating_list_segments)
+    assert read() == 3
+    assert read() == 0
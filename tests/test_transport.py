@@ -0,0 +1,63 @@
+import json
+
+from conftest import make_transactions
+from transport import SegmentTransport
+
+
+def test_segment_rollback_redelivers_uncommitted(tmp_path):
+    directory = str(tmp_path / 'segments')
+    producer = SegmentTransport(directory)
+    for transaction in make_transactions(20):
+        producer.send(transaction)
+    producer.flush()
+
+    consumer = SegmentTransport(directory)
+    first = consumer.poll(20, 0.1)
+    assert len(first) == 20
+    consumer.rollback()
+    again = consumer.poll(20, 0.1)
+    assert [t['id'] for t in again] == [t['id'] for t in first]
+
+    consumer.commit()
+    consumer.rollback()
+    assert consumer.poll(20, 0.1) == []
+    with open(consumer.reader.offset_path, 'r') as f:
+        assert json.load(f)['position'] > 0
+    producer.close()
+    consumer.close()
+
+
+def test_kafka_poll_skips_malformed_messages(monkeypatch):
+    import sys
+    import types
+    from collections import namedtuple
+
+    from transport import KafkaTransport, PARSE_ERRORS
+
+    TopicPartition = namedtuple('TopicPartition', 'topic partition')
+    Record = namedtuple('Record', 'offset value')
+    partition = TopicPartition('transactions', 0)
+    messages = [Record(0, b'{"id": "a"}'), Record(1, b'{not json'), Record(2, b'{"id": "b"}')]
+
+    class FakeConsumer:
+        def __init__(self, **config):
+            assert 'value_deserializer' not in config
+
+        def assign(self, partitions):
+            pass
+
+        def poll(self, timeout_ms, max_records):
+            return {partition: messages}
+
+    kafka = types.SimpleNamespace(
+        KafkaConsumer=FakeConsumer, TopicPartition=TopicPartition,
+        OffsetAndMetadata=lambda offset, metadata: offset
+    )
+    monkeypatch.setitem(sys.modules, 'kafka', kafka)
+
+    transport = KafkaTransport('localhost:9092', 'transactions', 'test', partitions=[0])
+    errors = PARSE_ERRORS.value
+    assert transport.poll(10, 0.1) == [{'id': 'a'}, {'id': 'b'}]
+    assert PARSE_ERRORS.value == errors + 1
+    # The bad message is acknowledged with its batch, so it is not redelivered forever
+    assert transport.pending_offsets[partition] == 3
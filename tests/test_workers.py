@@ -0,0 +1,19 @@
+import numpy as np
+
+from conftest import make_transactions
+from records import transactions_to_records
+from scoring import load_model, load_vectorizer, score_batch
+from workers import ScoringCoordinator
+
+
+def test_pool_scores_dicts_as_records_in_input_order(model_dir):
+    transactions = make_transactions(200)
+    expected = score_batch(load_model(model_dir, 'numpy'), load_vectorizer(model_dir), transactions)
+
+    coordinator = ScoringCoordinator(model_dir, num_workers=2, backend='numpy')
+    try:
+        np.testing.assert_allclose(coordinator.score(transactions), expected, rtol=1e-6)
+        np.testing.assert_allclose(coordinator.score(transactions_to_records(transactions)), expected, rtol=1e-6)
+        assert coordinator.get_stats()['scored'] == 400
+    finally:
+        coordinator.close()